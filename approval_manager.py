@@ -0,0 +1,129 @@
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ApprovalState(Enum):
+    PENDING = "pending"
+    APPROVED = "approved"
+    IGNORED = "ignored"
+    APPLYING = "applying"
+    DONE = "done"
+    EXPIRED = "expired"
+
+
+# Allowed transitions; DONE, IGNORED and EXPIRED requests are removed right away
+TRANSITIONS = {
+    ApprovalState.PENDING: {ApprovalState.APPROVED, ApprovalState.IGNORED, ApprovalState.EXPIRED},
+    ApprovalState.APPROVED: {ApprovalState.APPLYING},
+    ApprovalState.APPLYING: {ApprovalState.DONE},
+}
+
+
+@dataclass
+class ApprovalRequest:
+    """An IPO alert waiting for the owner's decision"""
+    ipo: Dict
+    expires_at: float
+    state: ApprovalState = ApprovalState.PENDING
+    requested_at: float = field(default_factory=time.time)
+
+    @property
+    def ipo_id(self) -> str:
+        return str(self.ipo['id'])
+
+    def matches(self, reply: str) -> bool:
+        """Same loose match as the old reply handling: part of the id or the company name"""
+        return reply in self.ipo_id.lower() or reply in self.ipo['company_name'].lower()
+
+
+class ApprovalManager:
+    """Pending approval requests keyed by IPO id; replies resolve them in any order"""
+
+    def __init__(self):
+        self._requests: Dict[str, ApprovalRequest] = {}
+        self._lock = threading.Lock()
+
+    def _transition(self, request: ApprovalRequest, state: ApprovalState) -> None:
+        if state not in TRANSITIONS.get(request.state, ()):
+            raise ValueError(f"Approval for IPO {request.ipo_id} can't go from {request.state.value} to {state.value}")
+        logger.info(f"🗳️ Approval for IPO {request.ipo_id}: {request.state.value} → {state.value}")
+        request.state = state
+        if state in (ApprovalState.DONE, ApprovalState.IGNORED, ApprovalState.EXPIRED):
+            del self._requests[request.ipo_id]
+
+    def request(self, ipos: List[Dict]) -> List[ApprovalRequest]:
+        """Open a request for every IPO without one; returns only the new ones (to alert about)"""
+        created = []
+        with self._lock:
+            for ipo in ipos:
+                existing = self._requests.get(str(ipo['id']))
+                if existing:
+                    if existing.state == ApprovalState.PENDING:
+                        existing.ipo = ipo  # keep the unfilled users current
+                    continue
+                request = ApprovalRequest(ipo, time.time() + config.APPROVAL_TIMEOUT_MINUTES * 60)
+                self._requests[request.ipo_id] = request
+                created.append(request)
+        return created
+
+    def pending(self) -> List[ApprovalRequest]:
+        with self._lock:
+            return [request for request in self._requests.values() if request.state == ApprovalState.PENDING]
+
+    def resolve_reply(self, text: str) -> Optional[Tuple[ApprovalState, ApprovalRequest]]:
+        """
+        Apply an owner reply to the pending set: 'ignore <name/id>' or 'skip <name/id>' ignores,
+        anything else approves the first pending IPO it matches. Returns (new state, request),
+        or None when no pending request matches.
+        """
+        reply = text.strip().lower()
+        state = ApprovalState.APPROVED
+        if reply.startswith('ignore ') or reply.startswith('skip '):
+            _, reply = reply.split(maxsplit=1)
+            state = ApprovalState.IGNORED
+
+        with self._lock:
+            for request in list(self._requests.values()):
+                if request.state == ApprovalState.PENDING and request.matches(reply):
+                    self._transition(request, state)
+                    return state, request
+        return None
+
+    def take_approved(self) -> List[ApprovalRequest]:
+        """Claim approved requests for applying"""
+        with self._lock:
+            approved = [request for request in self._requests.values() if request.state == ApprovalState.APPROVED]
+            for request in approved:
+                self._transition(request, ApprovalState.APPLYING)
+            return approved
+
+    def finish(self, request: ApprovalRequest) -> None:
+        with self._lock:
+            self._transition(request, ApprovalState.DONE)
+
+    def expire(self, now: float = None) -> List[ApprovalRequest]:
+        """Drop pending requests nobody answered in time"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            expired = [request for request in self._requests.values()
+                       if request.state == ApprovalState.PENDING and request.expires_at <= now]
+            for request in expired:
+                self._transition(request, ApprovalState.EXPIRED)
+            return expired
+
+    def get_approval_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {state.value: 0 for state in (ApprovalState.PENDING, ApprovalState.APPROVED, ApprovalState.APPLYING)}
+            for request in self._requests.values():
+                stats[request.state.value] += 1
+            return stats
+
+# Global approval manager instance
+approval_manager = ApprovalManager()
@@ -0,0 +1,243 @@
+import fnmatch
+import queue
+import threading
+import time
+import logging
+from typing import Callable, Dict, Any, List, Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.common.exceptions import WebDriverException
+from config import config
+from metrics import browser_launch_seconds, browser_launches_total
+
+logger = logging.getLogger(__name__)
+
+
+def lean_blocked_url_patterns() -> List[str]:
+    """Deny-list patterns for lean mode, minus anything the allow-list exempts"""
+    return [
+        pattern for pattern in config.LEAN_BLOCK_PATTERNS
+        if not any(fnmatch.fnmatch(pattern, allowed) for allowed in config.LEAN_ALLOW_PATTERNS)
+    ]
+
+
+def create_chrome_driver(lean: bool = None, capture_network: bool = False) -> WebDriver:
+    """Launch a headless Chrome with the bot's standard options"""
+    lean = config.LEAN_PAGE_LOAD if lean is None else lean
+
+    chrome_options = Options()
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    if lean:
+        # Hand control back at DOMContentLoaded; explicit waits cover the Angular components
+        chrome_options.page_load_strategy = 'eager'
+    # Console messages stay buffered in chromedriver until a flight recorder incident reads them
+    logging_prefs = {'browser': 'ALL'}
+    if capture_network:
+        logging_prefs['performance'] = 'ALL'
+    chrome_options.set_capability('goog:loggingPrefs', logging_prefs)
+
+    driver = webdriver.Chrome(options=chrome_options)
+
+    if lean:
+        blocked = lean_blocked_url_patterns()
+        if blocked:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked})
+            logger.debug("Lean page load blocking %d URL patterns", len(blocked))
+    return driver
+
+
+class BrowserPool:
+    """Bounded pool of warm WebDriver instances shared across user sessions"""
+
+    def __init__(self, factory: Callable[[], WebDriver] = create_chrome_driver,
+                 size: int = None, max_uses: int = None):
+        self.factory = factory
+        self.size = max(1, size if size is not None else config.BROWSER_POOL_SIZE)
+        self.max_uses = max_uses if max_uses is not None else config.BROWSER_MAX_USES
+        self._idle = queue.LifoQueue()
+        self._uses: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._total = 0
+        self._closed = False
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'launches': 0,
+            'launch_failures': 0,
+            'recycled': 0,
+            'total_launch_time': 0.0,
+            'max_launch_time': 0.0,
+        }
+
+    def _launch(self) -> WebDriver:
+        """Start a new browser and record how long the cold start took"""
+        start = time.time()
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._lock:
+                self._total -= 1
+                self._stats['launch_failures'] += 1
+            browser_launches_total.inc(result='failed')
+            raise
+        elapsed = time.time() - start
+        browser_launch_seconds.observe(elapsed)
+        browser_launches_total.inc(result='ok')
+        with self._lock:
+            self._uses[id(driver)] = 0
+            self._stats['launches'] += 1
+            self._stats['total_launch_time'] += elapsed
+            self._stats['max_launch_time'] = max(self._stats['max_launch_time'], elapsed)
+        logger.info(f"🌐 Launched browser in {elapsed:.2f}s ({self._total}/{self.size} in pool)")
+        return driver
+
+    def warm(self, count: int = None) -> int:
+        """Pre-launch browsers so the first users don't pay the cold start"""
+        count = min(count if count is not None else self.size, self.size)
+        warmed = 0
+        while warmed < count:
+            with self._lock:
+                if self._total >= self.size:
+                    break
+                self._total += 1
+            try:
+                self._idle.put(self._launch())
+                warmed += 1
+            except Exception as e:
+                logger.error(f"Failed to warm browser: {e}")
+                break
+        logger.info(f"🔥 Browser pool warmed with {warmed} browser(s)")
+        return warmed
+
+    def acquire(self, timeout: Optional[float] = None) -> WebDriver:
+        """Hand out an idle browser, launching one if the pool has spare capacity"""
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = None
+
+            if driver is None:
+                with self._lock:
+                    can_launch = self._total < self.size
+                    if can_launch:
+                        self._total += 1
+                        self._stats['misses'] += 1
+                if can_launch:
+                    return self._launch()
+
+                # Pool exhausted, wait for another user to hand a browser back
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No browser available within {timeout}s")
+                try:
+                    driver = self._idle.get(timeout=1.0 if remaining is None else min(1.0, remaining))
+                except queue.Empty:
+                    continue
+
+            if self._is_alive(driver):
+                with self._lock:
+                    self._stats['hits'] += 1
+                return driver
+            self._discard(driver)
+
+    def release(self, driver: WebDriver, crashed: bool = False) -> None:
+        """Return a browser to the pool, recycling it when worn out or broken"""
+        if driver is None:
+            return
+
+        with self._lock:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            uses = self._uses[id(driver)]
+
+        if self._closed or crashed or uses >= self.max_uses:
+            if not self._closed:
+                reason = "crash" if crashed else f"{uses} uses"
+                logger.info(f"♻️ Recycling browser after {reason}")
+                with self._lock:
+                    self._stats['recycled'] += 1
+            self._discard(driver)
+            return
+
+        try:
+            self._reset(driver)
+        except WebDriverException as e:
+            logger.warning(f"Failed to reset browser, recycling it: {e}")
+            with self._lock:
+                self._stats['recycled'] += 1
+            self._discard(driver)
+            return
+
+        self._idle.put(driver)
+
+    def _reset(self, driver: WebDriver) -> None:
+        """Wipe all per-account state so the next user starts logged out"""
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except WebDriverException as e:
+            # Pages such as about:blank have no storage, nothing to clear there
+            logger.debug("Could not clear web storage: %s", e)
+        driver.delete_all_cookies()
+        # Leave the Angular app so no in-memory auth state survives
+        driver.get("about:blank")
+
+    def _is_alive(self, driver: WebDriver) -> bool:
+        """Cheap liveness probe for an idle browser"""
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            logger.warning("Idle browser is no longer responding, recycling it")
+            with self._lock:
+                self._stats['recycled'] += 1
+            return False
+
+    def _discard(self, driver: WebDriver) -> None:
+        """Quit a browser and free its slot in the pool"""
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._total -= 1
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug("Error quitting discarded browser: %s", e)
+
+    def shutdown(self) -> None:
+        """Quit every idle browser and refuse further acquisitions"""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+        logger.info("Browser pool shut down")
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get hit/miss and launch-time statistics for the pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            launches = stats['launches']
+            stats['avg_launch_time'] = round(stats['total_launch_time'] / launches, 3) if launches else 0.0
+            stats['total_launch_time'] = round(stats['total_launch_time'], 3)
+            stats['max_launch_time'] = round(stats['max_launch_time'], 3)
+            stats['size'] = self.size
+            stats['open_browsers'] = self._total
+            stats['idle_browsers'] = self._idle.qsize()
+        return stats
+
+# Global browser pool instance
+browser_pool = BrowserPool()
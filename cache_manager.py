@@ -1,110 +1,276 @@
-import json
 import os
+import sqlite3
+import threading
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Any, Tuple
 import logging
 from config import config
+from cache_storage import CacheStorage, create_cache_storage
+from metrics import registry
 
 logger = logging.getLogger(__name__)
 
+
+class _Flight:
+    """A computation in progress that concurrent callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[Exception] = None
+
+
 class CacheManager:
-    """Manages caching for IPO data and other frequently accessed information"""
-    
-    def __init__(self, cache_dir: str = "cache"):
+    """
+    Manages caching for IPO data and other frequently accessed information.
+    A bounded in-process LRU tier sits in front of a persistent CacheStorage backend
+    (CACHE_BACKEND): reads are served from memory when possible and lazily loaded from
+    storage on a miss, writes go through to both tiers. Each key gets its own TTL from CACHE_TTLS.
+    """
+
+    def __init__(self, cache_dir: str = "cache", max_memory_entries: int = None, storage: CacheStorage = None):
         self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries or config.CACHE_MAX_MEMORY_ENTRIES
+        # key -> (expires_at epoch seconds, data), least recently used first
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'expirations': 0,
+            'evictions': 0,
+            'writes': 0,
+            'stale_hits': 0,
+            'background_refreshes': 0,
+            'coalesced': 0,
+            'negative_hits': 0,
+            'compute_failures': 0,
+        }
+        # key -> computation in progress, and key -> (retry_after epoch seconds, exception)
+        self._inflight: Dict[str, _Flight] = {}
+        self._failures: Dict[str, Tuple[float, Exception]] = {}
         self.ensure_cache_dir()
-        
+        self.storage = storage or create_cache_storage(config.CACHE_BACKEND, cache_dir)
+
     def ensure_cache_dir(self):
         """Ensure cache directory exists"""
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
-            
-    def _get_cache_file_path(self, key: str) -> str:
-        """Get the file path for a cache key"""
-        return os.path.join(self.cache_dir, f"{key}.json")
-        
+
+    def ttl_for(self, key: str) -> float:
+        """TTL in seconds for a key: exact CACHE_TTLS match, then longest prefix, then the global default"""
+        ttls = config.CACHE_TTLS
+        if key in ttls:
+            return ttls[key]
+        prefixes = [prefix for prefix in ttls if key.startswith(prefix)]
+        if prefixes:
+            return ttls[max(prefixes, key=len)]
+        return config.CACHE_DURATION_MINUTES * 60
+
+    def _remember(self, key: str, expires_at: float, data: Any) -> None:
+        """Put an entry in the memory tier, evicting the least recently used if full"""
+        with self._lock:
+            self._memory[key] = (expires_at, data)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                evicted, _ = self._memory.popitem(last=False)
+                self._stats['evictions'] += 1
+                logger.debug("Evicted cache key from memory: %s", evicted)
+
+    def _lookup(self, key: str) -> Optional[Tuple[float, Any, str]]:
+        """Find an entry regardless of expiry, returning (expires_at, data, tier) or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry[0], entry[1], 'memory_hits'
+
+        entry = self.storage.read(key)
+        if entry is None:
+            return None
+        self._remember(key, entry[0], entry[1])
+        return entry[0], entry[1], 'disk_hits'
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
     def get(self, key: str) -> Optional[Any]:
         """Retrieve data from cache if it exists and is not expired"""
         if not config.ENABLE_CACHING:
             return None
-            
-        cache_file = self._get_cache_file_path(key)
-        
-        if not os.path.exists(cache_file):
+
+        now = time.time()
+        entry = self._lookup(key)
+        if entry is None:
+            self._count('misses')
             return None
-            
-        try:
-            with open(cache_file, 'r') as f:
-                cached_data = json.load(f)
-                
-            # Check if cache is expired
-            cache_time = datetime.fromisoformat(cached_data['timestamp'])
-            expiry_time = cache_time + timedelta(minutes=config.CACHE_DURATION_MINUTES)
-            
-            if datetime.now() > expiry_time:
-                logger.info(f"Cache expired for key: {key}")
+
+        expires_at, data, tier = entry
+        if now > expires_at:
+            logger.info(f"Cache expired for key: {key}")
+            with self._lock:
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+            # Expired entries stay around for a while as stale values for get_or_compute
+            if now > expires_at + config.CACHE_STALE_SECONDS:
                 self.delete(key)
-                return None
-                
-            logger.info(f"Cache hit for key: {key}")
-            return cached_data['data']
-            
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
-            logger.warning(f"Error reading cache for key {key}: {e}")
-            self.delete(key)
             return None
-            
-    def set(self, key: str, data: Any) -> None:
-        """Store data in cache with timestamp"""
+
+        self._count(tier)
+        logger.debug("Cache hit for key: %s (%s)", key, tier[:-5])
+        return data
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: float = None,
+                       stale_while_revalidate: bool = True,
+                       should_cache: Callable[[Any], bool] = None) -> Any:
+        """
+        Return the cached value for `key`, computing and storing it on a miss.
+
+        - Concurrent misses on the same key share one call to `compute`.
+        - With `stale_while_revalidate`, a value expired less than CACHE_STALE_SECONDS ago
+          is returned immediately while a single background thread refreshes it.
+        - A failed `compute` is remembered for CACHE_NEGATIVE_TTL_SECONDS; callers in that
+          window get the same exception without calling `compute` again.
+        - Values for which `should_cache(value)` is False are returned but not stored.
+        """
         if not config.ENABLE_CACHING:
-            return
-            
-        cache_file = self._get_cache_file_path(key)
-        
+            return compute()
+
+        now = time.time()
+        entry = self._lookup(key)
+        if entry is not None:
+            expires_at, data, tier = entry
+            if now <= expires_at:
+                self._count(tier)
+                return data
+            if stale_while_revalidate and now <= expires_at + config.CACHE_STALE_SECONDS:
+                self._count('stale_hits')
+                logger.debug("Serving stale cache for key: %s", key)
+                self._refresh_in_background(key, compute, ttl, should_cache)
+                return data
+            self._count('expirations')
+
+        self._count('misses')
+        return self._compute_coalesced(key, compute, ttl, should_cache)
+
+    def _compute_coalesced(self, key: str, compute: Callable[[], Any], ttl: Optional[float],
+                           should_cache: Optional[Callable[[Any], bool]]) -> Any:
+        """Run `compute` once per key at a time; other callers wait for and share its outcome"""
+        with self._lock:
+            failure = self._failures.get(key)
+            if failure and failure[0] > time.time():
+                self._stats['negative_hits'] += 1
+                raise failure[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
         try:
-            cache_data = {
-                'data': data,
-                'timestamp': datetime.now().isoformat(),
-                'expires_in_minutes': config.CACHE_DURATION_MINUTES
-            }
-            
-            with open(cache_file, 'w') as f:
-                json.dump(cache_data, f, indent=2)
-                
-            logger.info(f"Cached data for key: {key}")
-            
+            flight.value = compute()
+            if should_cache is None or should_cache(flight.value):
+                self.set(key, flight.value, ttl)
+            with self._lock:
+                self._failures.pop(key, None)
         except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._failures[key] = (time.time() + config.CACHE_NEGATIVE_TTL_SECONDS, e)
+                self._stats['compute_failures'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+        return flight.value
+
+    def _refresh_in_background(self, key: str, compute: Callable[[], Any], ttl: Optional[float],
+                               should_cache: Optional[Callable[[Any], bool]]) -> None:
+        """Start a refresh thread unless one is already running or the key recently failed"""
+        with self._lock:
+            failure = self._failures.get(key)
+            if key in self._inflight or (failure and failure[0] > time.time()):
+                return
+            self._stats['background_refreshes'] += 1
+
+        def refresh():
+            try:
+                self._compute_coalesced(key, compute, ttl, should_cache)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for key {key}: {e}")
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{key}", daemon=True).start()
+
+    def set(self, key: str, data: Any, ttl: float = None) -> None:
+        """Store data in both tiers; `ttl` (seconds) overrides the configured TTL for this key"""
+        if not config.ENABLE_CACHING:
+            return
+
+        ttl = ttl if ttl is not None else self.ttl_for(key)
+        now = time.time()
+        expires_at = now + ttl
+        self._remember(key, expires_at, data)
+        with self._lock:
+            self._stats['writes'] += 1
+
+        try:
+            self.storage.write(key, expires_at, data)
+            logger.info(f"Cached data for key: {key} (ttl {int(ttl)}s)")
+        except (OSError, ValueError, sqlite3.Error) as e:
             logger.error(f"Error writing cache for key {key}: {e}")
-            
+
     def delete(self, key: str) -> None:
         """Delete a specific cache entry"""
-        cache_file = self._get_cache_file_path(key)
-        if os.path.exists(cache_file):
-            os.remove(cache_file)
-            logger.info(f"Deleted cache for key: {key}")
-            
+        with self._lock:
+            self._memory.pop(key, None)
+            self._failures.pop(key, None)
+        self.storage.delete(key)
+        logger.info(f"Deleted cache for key: {key}")
+
     def clear_all(self) -> None:
         """Clear all cache entries"""
-        if os.path.exists(self.cache_dir):
-            for file in os.listdir(self.cache_dir):
-                if file.endswith('.json'):
-                    os.remove(os.path.join(self.cache_dir, file))
-            logger.info("Cleared all cache entries")
-            
+        with self._lock:
+            self._memory.clear()
+            self._failures.clear()
+        self.storage.clear()
+        logger.info("Cleared all cache entries")
+
+    def get_event_counts(self) -> Dict[str, int]:
+        """Hit, miss and maintenance counters only"""
+        with self._lock:
+            return dict(self._stats)
+
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get statistics about the cache"""
-        if not os.path.exists(self.cache_dir):
-            return {'total_files': 0, 'total_size': 0}
-            
-        files = [f for f in os.listdir(self.cache_dir) if f.endswith('.json')]
-        total_size = sum(os.path.getsize(os.path.join(self.cache_dir, f)) for f in files)
-        
-        return {
-            'total_files': len(files),
-            'total_size': total_size,
-            'cache_dir': self.cache_dir
-        }
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        stats.update(self.storage.stats())
+        return stats
 
 # Global cache manager instance
-cache_manager = CacheManager() 
\ No newline at end of file
+cache_manager = CacheManager()
+
+
+def _cache_sizes() -> Dict[str, int]:
+    stats = cache_manager.get_cache_stats()
+    return {'memory_entries': stats['memory_entries'], 'storage_entries': stats['total_files'],
+            'storage_bytes': stats['total_size']}
+
+registry.collector('ipo_bot_cache_events_total', 'Cache hits, misses and maintenance events',
+                   'event', cache_manager.get_event_counts)
+registry.collector('ipo_bot_cache_size', 'Cache entries in memory and storage, and storage bytes',
+                   'kind', _cache_sizes, kind='gauge')
@@ -0,0 +1,268 @@
+import hashlib
+from abc import ABC, abstractmethod
+import marshal
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import threading
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Entry layout: magic, format version, Python major/minor, expiry (little-endian double), then the
+# marshalled (key, data) pair. marshal is only guaranteed readable by the interpreter version that
+# wrote it, so entries from another version read as misses instead of garbage.
+MAGIC = b'IPOC'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sBBBd')
+_PYTHON_TAG = tuple(sys.version_info[:2])
+
+
+class CacheEntryError(ValueError):
+    """Raised when a stored entry can't be decoded"""
+
+
+def encode_entry(key: str, expires_at: float, data: Any) -> bytes:
+    """Serialize an entry; raises ValueError for data marshal can't represent"""
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, *_PYTHON_TAG, expires_at) + marshal.dumps((key, data))
+
+
+def decode_entry(blob: bytes) -> Tuple[str, float, Any]:
+    """Inverse of encode_entry, returning (key, expires_at, data)"""
+    try:
+        magic, version, major, minor, expires_at = _HEADER.unpack_from(blob)
+        if magic != MAGIC or version != FORMAT_VERSION or (major, minor) != _PYTHON_TAG:
+            raise CacheEntryError("unknown cache entry format")
+        key, data = marshal.loads(blob[_HEADER.size:])
+    except (struct.error, EOFError, TypeError, ValueError) as e:
+        raise CacheEntryError(str(e)) from e
+    return key, expires_at, data
+
+
+class CacheStorage(ABC):
+    """Persistent tier behind CacheManager's in-memory LRU"""
+
+    name = "base"
+
+    @abstractmethod
+    def read(self, key: str) -> Optional[Tuple[float, Any]]:
+        """Return (expires_at, data) or None if missing or unreadable"""
+
+    @abstractmethod
+    def write(self, key: str, expires_at: float, data: Any) -> None:
+        """Store an entry; raises OSError/ValueError/sqlite3.Error on failure"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove one entry if present"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and size from in-memory counters, without touching the disk"""
+
+    def close(self) -> None:
+        pass
+
+
+class FileCacheStorage(CacheStorage):
+    """
+    One file per entry under `<cache_dir>/entries`, named by the SHA-256 of the key.
+    Writes go to a temp file that is atomically renamed over the entry, so a crash
+    never leaves a half-written entry behind.
+    """
+
+    name = "file"
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, "entries")
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+        self._total_size = 0
+        os.makedirs(self.entries_dir, exist_ok=True)
+        self._remove_leftovers()
+        self._load_index()
+
+    def _remove_leftovers(self):
+        """Remove JSON entries from before the binary format and directories an interrupted clear() left"""
+        for file in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, file)
+            if file.endswith('.json'):
+                os.remove(path)
+            elif file.endswith('.trash'):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _load_index(self):
+        """Size every entry once at startup so stats never scan the directory again"""
+        for file in os.listdir(self.entries_dir):
+            path = os.path.join(self.entries_dir, file)
+            if file.endswith('.tmp'):
+                os.remove(path)  # left over from a crash mid-write
+            elif file.endswith('.cache'):
+                self._sizes[file[:-len('.cache')]] = os.path.getsize(path)
+        self._total_size = sum(self._sizes.values())
+
+    @staticmethod
+    def _digest(key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.entries_dir, f"{digest}.cache")
+
+    def read(self, key: str) -> Optional[Tuple[float, Any]]:
+        digest = self._digest(key)
+        try:
+            with open(self._path(digest), 'rb') as f:
+                stored_key, expires_at, data = decode_entry(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, CacheEntryError) as e:
+            logger.warning(f"Error reading cache for key {key}: {e}")
+            self.delete(key)
+            return None
+        if stored_key != key:
+            return None
+        return expires_at, data
+
+    def write(self, key: str, expires_at: float, data: Any) -> None:
+        blob = encode_entry(key, expires_at, data)
+        digest = self._digest(key)
+        path = self._path(digest)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._total_size += len(blob) - self._sizes.get(digest, 0)
+            self._sizes[digest] = len(blob)
+
+    def delete(self, key: str) -> None:
+        digest = self._digest(key)
+        with self._lock:
+            self._total_size -= self._sizes.pop(digest, 0)
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """Swap in an empty directory and delete the old one in the background"""
+        with self._lock:
+            trash_dir = f"{self.entries_dir}.{os.getpid()}.{threading.get_ident()}.trash"
+            os.replace(self.entries_dir, trash_dir)
+            os.makedirs(self.entries_dir)
+            self._sizes.clear()
+            self._total_size = 0
+        threading.Thread(target=shutil.rmtree, args=(trash_dir, True), daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': self.name,
+                'total_files': len(self._sizes),
+                'total_size': self._total_size,
+                'cache_dir': self.cache_dir,
+            }
+
+
+class SqliteCacheStorage(CacheStorage):
+    """All entries in a single SQLite file in WAL mode"""
+
+    name = "sqlite"
+
+    def __init__(self, cache_dir: str, filename: str = "cache.sqlite3"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, filename)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()
+        self._count = count
+        self._size = size
+
+    def read(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            _, expires_at, data = decode_entry(row[0])
+        except CacheEntryError as e:
+            logger.warning(f"Error reading cache for key {key}: {e}")
+            self.delete(key)
+            return None
+        return expires_at, data
+
+    def write(self, key: str, expires_at: float, data: Any) -> None:
+        blob = encode_entry(key, expires_at, data)
+        with self._lock:
+            previous = self._conn.execute("SELECT LENGTH(value) FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, sqlite3.Binary(blob))
+            )
+            if previous is None:
+                self._count += 1
+            else:
+                self._size -= previous[0]
+            self._size += len(blob)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            previous = self._conn.execute("SELECT LENGTH(value) FROM entries WHERE key = ?", (key,)).fetchone()
+            if previous is None:
+                return
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count -= 1
+            self._size -= previous[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._count = 0
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': self.name,
+                'total_files': self._count,
+                'total_size': self._size,
+                'cache_dir': self.cache_dir,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+STORAGE_BACKENDS = {
+    FileCacheStorage.name: FileCacheStorage,
+    SqliteCacheStorage.name: SqliteCacheStorage,
+}
+
+
+def create_cache_storage(backend: str, cache_dir: str) -> CacheStorage:
+    """Build the configured backend, falling back to per-entry files for unknown names"""
+    storage_class = STORAGE_BACKENDS.get(backend)
+    if storage_class is None:
+        logger.warning(f"Unknown CACHE_BACKEND '{backend}', using file storage")
+        storage_class = FileCacheStorage
+    return storage_class(cache_dir)
@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 class Config:
     """Configuration class for IPO Bot settings"""
@@ -11,30 +11,182 @@ class Config:
         # Caching settings
         self.ENABLE_CACHING = os.getenv('ENABLE_CACHING', 'true').lower() == 'true'
         self.CACHE_DURATION_MINUTES = int(os.getenv('CACHE_DURATION_MINUTES', '5'))
+        # Persistent cache tier: 'file' (one atomically replaced file per entry) or 'sqlite' (single WAL file)
+        self.CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file').lower()
+        self.CACHE_MAX_MEMORY_ENTRIES = int(os.getenv('CACHE_MAX_MEMORY_ENTRIES', '256'))
+        # get_or_compute serves values up to CACHE_STALE_SECONDS past expiry while refreshing them,
+        # and remembers failed computations for CACHE_NEGATIVE_TTL_SECONDS
+        self.CACHE_STALE_SECONDS = int(os.getenv('CACHE_STALE_SECONDS', '600'))
+        self.CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv('CACHE_NEGATIVE_TTL_SECONDS', '30'))
+        # Per-key TTLs in seconds as "key=seconds" pairs, matched exactly first and then by longest prefix.
+        # Keys not listed fall back to CACHE_DURATION_MINUTES.
+        self.CACHE_TTLS = self._get_ttls('CACHE_TTLS', {
+            'investment_opportunities': 30,
+            'open_issues_': 300,
+            'meroshare_capitals': 86400,
+        })
         
         # Screenshot settings
         self.ENABLE_SCREENSHOTS = os.getenv('ENABLE_SCREENSHOTS', 'true').lower() == 'true'
         self.SCREENSHOT_DIR = os.getenv('SCREENSHOT_DIR', 'screenshots')
+        # Captured in memory and written by a background thread, downsized and re-encoded when Pillow is installed
+        self.SCREENSHOT_FORMAT = os.getenv('SCREENSHOT_FORMAT', 'webp').lower()  # webp, jpeg or png
+        self.SCREENSHOT_MAX_WIDTH = int(os.getenv('SCREENSHOT_MAX_WIDTH', '960'))
+        self.SCREENSHOT_QUALITY = int(os.getenv('SCREENSHOT_QUALITY', '60'))
+        self.SCREENSHOT_MAX_FILES = int(os.getenv('SCREENSHOT_MAX_FILES', '300'))
+        self.SCREENSHOT_MAX_MB = int(os.getenv('SCREENSHOT_MAX_MB', '50'))
+        self.SCREENSHOT_QUEUE_SIZE = int(os.getenv('SCREENSHOT_QUEUE_SIZE', '16'))
+
+        # Flight recorder: the last N browser steps of a session, written as one gzip bundle per failure
+        self.FLIGHT_RECORDER_DIR = os.getenv('FLIGHT_RECORDER_DIR', 'incidents')
+        self.FLIGHT_RECORDER_STEPS = int(os.getenv('FLIGHT_RECORDER_STEPS', '25'))
+        self.FLIGHT_RECORDER_DOM_CHARS = int(os.getenv('FLIGHT_RECORDER_DOM_CHARS', '2000'))  # 0 skips per-step DOM capture
+        self.FLIGHT_RECORDER_SCREENSHOT = os.getenv('FLIGHT_RECORDER_SCREENSHOT', 'true').lower() == 'true'
+        self.FLIGHT_RECORDER_MAX_BUNDLES = int(os.getenv('FLIGHT_RECORDER_MAX_BUNDLES', '50'))
         
         # Logging settings
         self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
         self.LOG_FILE = os.getenv('LOG_FILE', 'ipo_bot.log')
+        self.LOG_JSON_FILE = os.getenv('LOG_JSON_FILE', '')  # e.g. ipo_bot.jsonl; empty disables the JSON-lines sink
         
+        # IPO status and ignore store
+        # State lives in memory; mutations reach the journal in batches and the SQLite snapshot on compaction
+        self.STATUS_DB_FILE = os.getenv('STATUS_DB_FILE', 'ipo_status.sqlite3')
+        self.STATUS_JOURNAL_FILE = os.getenv('STATUS_JOURNAL_FILE', 'ipo_status.journal')
+        self.STATUS_FLUSH_SECONDS = int(os.getenv('STATUS_FLUSH_SECONDS', '30'))
+        self.STATUS_FLUSH_BATCH = int(os.getenv('STATUS_FLUSH_BATCH', '50'))
+        self.STATUS_COMPACT_OPS = int(os.getenv('STATUS_COMPACT_OPS', '500'))
+
+        # Closed IPOs move to monthly gzip archives once every user is resolved or the grace period ends
+        self.ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+        self.ARCHIVE_GRACE_DAYS = int(os.getenv('ARCHIVE_GRACE_DAYS', '7'))
+
         # Application settings
         self.APPLY_TIME = os.getenv('APPLY_TIME', '11:30')
         self.CHECK_INTERVAL_SECONDS = int(os.getenv('CHECK_INTERVAL_SECONDS', '60'))
+
+        # Scheduler settings (times are Asia/Kathmandu)
+        self.MARKET_OPEN_TIME = os.getenv('MARKET_OPEN_TIME', '10:00')
+        self.IPO_CLOSE_TIME = os.getenv('IPO_CLOSE_TIME', '17:00')
+        self.FAST_POLL_SECONDS = int(os.getenv('FAST_POLL_SECONDS', '15'))
+        self.FAST_POLL_WINDOW_MINUTES = int(os.getenv('FAST_POLL_WINDOW_MINUTES', '10'))
+        self.IDLE_POLL_SECONDS = int(os.getenv('IDLE_POLL_SECONDS', '1800'))
+        self.SYNC_INTERVAL_MINUTES = int(os.getenv('SYNC_INTERVAL_MINUTES', '60'))
+        self.CLEANUP_INTERVAL_MINUTES = int(os.getenv('CLEANUP_INTERVAL_MINUTES', '60'))
+        self.STATS_INTERVAL_MINUTES = int(os.getenv('STATS_INTERVAL_MINUTES', '15'))
+
+        # IPO feed settings
+        self.IPO_FEED_URL = os.getenv('IPO_FEED_URL', 'https://www.nepalipaisa.com/api/GetIpos')
+        self.IPO_FEED_PAGE_SIZE = int(os.getenv('IPO_FEED_PAGE_SIZE', '30'))
+        self.IPO_FEED_MAX_PAGES = int(os.getenv('IPO_FEED_MAX_PAGES', '20'))
+        self.IPO_FEED_MAX_RETRIES = int(os.getenv('IPO_FEED_MAX_RETRIES', '3'))
+
+        # Wait engine settings: explicit waits poll quickly and adapt timeouts to the observed p95
+        self.WAIT_POLL_INTERVAL = float(os.getenv('WAIT_POLL_INTERVAL', '0.1'))
+        self.WAIT_MIN_TIMEOUT = float(os.getenv('WAIT_MIN_TIMEOUT', '5'))
+        self.WAIT_TIMEOUT_MULTIPLIER = float(os.getenv('WAIT_TIMEOUT_MULTIPLIER', '3'))
+        self.WAIT_MIN_SAMPLES = int(os.getenv('WAIT_MIN_SAMPLES', '10'))
+
+        # Meroshare backend used for read-only status sync: 'api' or 'selenium'
+        self.SYNC_BACKEND = os.getenv('SYNC_BACKEND', 'api').lower()
+        self.MEROSHARE_API_URL = os.getenv('MEROSHARE_API_URL', 'https://webbackend.cdsc.com.np/api/meroShare/')
+
+        # Authenticated session reuse (SESSION_STORE_KEY is a Fernet key, never logged)
+        self.ENABLE_SESSION_REUSE = os.getenv('ENABLE_SESSION_REUSE', 'true').lower() == 'true'
+        self.SESSION_STORE_DIR = os.getenv('SESSION_STORE_DIR', 'sessions')
+        self.SESSION_STORE_KEY = os.getenv('SESSION_STORE_KEY')
+        self.SESSION_TTL_MINUTES = int(os.getenv('SESSION_TTL_MINUTES', '15'))
+
+        # Telegram API base (point at a local fake server for testing). Setting TELEGRAM_WEBHOOK_URL
+        # (public URL of TELEGRAM_WEBHOOK_PATH) switches from polling to webhook mode; the secret is required.
+        self.TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+        self.TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL')
+        self.TELEGRAM_WEBHOOK_PATH = os.getenv('TELEGRAM_WEBHOOK_PATH', '/telegram/webhook')
+        self.TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET')
+
+        # Telegram client: long-poll duration, spacing between outbound messages and 429 retries
+        self.TELEGRAM_LONG_POLL_SECONDS = int(os.getenv('TELEGRAM_LONG_POLL_SECONDS', '50'))
+        self.TELEGRAM_MIN_SEND_INTERVAL = float(os.getenv('TELEGRAM_MIN_SEND_INTERVAL', '1.0'))
+        self.TELEGRAM_MAX_SEND_RETRIES = int(os.getenv('TELEGRAM_MAX_SEND_RETRIES', '3'))
+        # How long an IPO alert waits for an approve/ignore reply before it is re-sent
+        self.APPROVAL_TIMEOUT_MINUTES = int(os.getenv('APPROVAL_TIMEOUT_MINUTES', '10'))
+
+        # Dashboard web server worker threads (waitress)
+        self.WEB_THREADS = int(os.getenv('WEB_THREADS', '4'))
+
+        # Parallel processing settings
+        self.MAX_WORKERS = int(os.getenv('MAX_WORKERS', '3'))
+        self.USER_TIMEOUT_SECONDS = int(os.getenv('USER_TIMEOUT_SECONDS', '300'))
+
+        # Lean page load: eager load strategy plus DevTools URL blocking of non-essential assets.
+        # Allow-list entries remove every deny-list pattern they match (fnmatch).
+        self.LEAN_PAGE_LOAD = os.getenv('LEAN_PAGE_LOAD', 'true').lower() == 'true'
+        self.LEAN_BLOCK_PATTERNS = self._get_list('LEAN_BLOCK_PATTERNS', [
+            '*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.svg*', '*.ico*',
+            '*.woff*', '*.ttf*', '*.otf*', '*.eot*',
+            '*fonts.googleapis.com*', '*fonts.gstatic.com*',
+            '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+            '*facebook.net*', '*hotjar.com*',
+        ])
+        self.LEAN_ALLOW_PATTERNS = self._get_list('LEAN_ALLOW_PATTERNS', [])
+
+        # Browser pool settings (one browser per worker by default)
+        self.BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', str(self.MAX_WORKERS)))
+        self.BROWSER_MAX_USES = int(os.getenv('BROWSER_MAX_USES', '20'))
         
+    @staticmethod
+    def _get_list(name: str, default: List[str]) -> List[str]:
+        """Read a comma-separated list from the environment"""
+        value = os.getenv(name)
+        if value is None:
+            return default
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    @staticmethod
+    def _get_ttls(name: str, default: Dict[str, int]) -> Dict[str, int]:
+        """Read comma-separated key=seconds pairs from the environment, overriding the defaults"""
+        ttls = dict(default)
+        for item in Config._get_list(name, []):
+            key, _, seconds = item.partition('=')
+            if key.strip() and seconds.strip():
+                ttls[key.strip()] = int(seconds)
+        return ttls
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert config to dictionary for logging"""
         return {
             'DRY_RUN_MODE': self.DRY_RUN_MODE,
             'ENABLE_CACHING': self.ENABLE_CACHING,
             'CACHE_DURATION_MINUTES': self.CACHE_DURATION_MINUTES,
+            'CACHE_BACKEND': self.CACHE_BACKEND,
+            'CACHE_MAX_MEMORY_ENTRIES': self.CACHE_MAX_MEMORY_ENTRIES,
+            'CACHE_TTLS': self.CACHE_TTLS,
+            'CACHE_STALE_SECONDS': self.CACHE_STALE_SECONDS,
+            'CACHE_NEGATIVE_TTL_SECONDS': self.CACHE_NEGATIVE_TTL_SECONDS,
             'ENABLE_SCREENSHOTS': self.ENABLE_SCREENSHOTS,
             'SCREENSHOT_DIR': self.SCREENSHOT_DIR,
+            'SCREENSHOT_FORMAT': self.SCREENSHOT_FORMAT,
+            'SCREENSHOT_MAX_FILES': self.SCREENSHOT_MAX_FILES,
+            'SCREENSHOT_MAX_MB': self.SCREENSHOT_MAX_MB,
+            'FLIGHT_RECORDER_DIR': self.FLIGHT_RECORDER_DIR,
+            'FLIGHT_RECORDER_STEPS': self.FLIGHT_RECORDER_STEPS,
             'LOG_LEVEL': self.LOG_LEVEL,
+            'LOG_JSON_FILE': self.LOG_JSON_FILE,
+            'ARCHIVE_GRACE_DAYS': self.ARCHIVE_GRACE_DAYS,
             'APPLY_TIME': self.APPLY_TIME,
-            'CHECK_INTERVAL_SECONDS': self.CHECK_INTERVAL_SECONDS
+            'CHECK_INTERVAL_SECONDS': self.CHECK_INTERVAL_SECONDS,
+            'FAST_POLL_SECONDS': self.FAST_POLL_SECONDS,
+            'IDLE_POLL_SECONDS': self.IDLE_POLL_SECONDS,
+            'SYNC_BACKEND': self.SYNC_BACKEND,
+            'ENABLE_SESSION_REUSE': self.ENABLE_SESSION_REUSE,
+            'SESSION_TTL_MINUTES': self.SESSION_TTL_MINUTES,
+            'TELEGRAM_WEBHOOK_MODE': bool(self.TELEGRAM_WEBHOOK_URL),
+            'APPROVAL_TIMEOUT_MINUTES': self.APPROVAL_TIMEOUT_MINUTES,
+            'MAX_WORKERS': self.MAX_WORKERS,
+            'USER_TIMEOUT_SECONDS': self.USER_TIMEOUT_SECONDS,
+            'LEAN_PAGE_LOAD': self.LEAN_PAGE_LOAD,
+            'BROWSER_POOL_SIZE': self.BROWSER_POOL_SIZE,
+            'BROWSER_MAX_USES': self.BROWSER_MAX_USES
         }
 
 # Global config instance
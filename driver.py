@@ -1,29 +1,80 @@
-from selenium import webdriver
 from bs4 import BeautifulSoup
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import TimeoutException, WebDriverException
+import time
 import logging
-from typing import Dict, List, Optional, Tuple
+from functools import partial, wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from config import config
 from screenshot_utils import screenshot_manager
 from cache_manager import cache_manager
+from browser_pool import browser_pool
+from ipo_feed_client import ipo_feed_client, IpoFeedError
+from meroshare_api import MeroshareClient, MeroshareApiError
+from session_store import session_store, session_expiry
+from wait_engine import wait_engine, element_present, element_clickable, toast_text
+from metrics import step_seconds, steps_total
+from flight_recorder import FlightRecorder, flight_recorder_store
 
 logger = logging.getLogger(__name__)
 
 MEROSHARE_URL = "https://meroshare.cdsc.com.np/#/{}"
 SUCCESSFUL_APPLICATION_TOAST = "Share has been applied successfully."
 
+# Reads every issue card in one WebDriver round trip instead of one `.text` call per card
+EXTRACT_OPEN_ISSUES_JS = """
+return Array.prototype.map.call(document.querySelectorAll('.company-list'), function (card, i) {
+    var lines = card.innerText.split('\\n').map(function (line) { return line.trim(); })
+                              .filter(function (line) { return line; });
+    var issuedFor = lines[2] || '';
+    var paren = issuedFor.indexOf('(');
+    var button = card.querySelector('.btn-issue');
+    return {
+        index: i + 1,
+        name: lines[0] || '',
+        issued_for: paren >= 0 ? issuedFor.slice(0, paren).trim() : issuedFor.trim(),
+        ticker: paren >= 0 ? issuedFor.slice(paren + 1).replace(')', '').trim() : '',
+        issue_type: lines[3] || '',
+        share_type: lines[4] || '',
+        mode: lines[5] || '',
+        action: button ? button.innerText.trim() : (lines[lines.length - 1] || '')
+    };
+});
+"""
+
+
+def _instrumented(step: str, succeeded: Callable[[Any], bool] = bool):
+    """Time a bot step and count its outcome per user and backend"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            result = 'error'
+            start = time.perf_counter()
+            try:
+                value = method(self, *args, **kwargs)
+                result = 'ok' if succeeded(value) else 'failed'
+                return value
+            finally:
+                # Read after the call: login sets current_user
+                labels = {'step': step, 'backend': self.backend, 'user': self.current_user or ''}
+                step_seconds.observe(time.perf_counter() - start, **labels)
+                steps_total.inc(result=result, **labels)
+        return wrapper
+    return decorator
+
+
 class EnhancedIpoBot:
     """Enhanced IPO Bot with dry run mode, caching, and screenshot capabilities"""
 
-    def __init__(self, dry_run: bool = None):
+    def __init__(self, dry_run: bool = None, read_only: bool = False):
         self.dry_run = dry_run if dry_run is not None else config.DRY_RUN_MODE
+        # Read-only dry runs (status sync) only need the issue list, which the REST API serves directly
+        self.backend = "api" if read_only and self.dry_run and config.SYNC_BACKEND == "api" else "selenium"
         self.__driver = None
-        self.open_issues_selector = None
+        self.__recorder = None
+        self.__api = None
         self.open_issues = None
         self.current_user = None
         self.current_company = None
@@ -34,161 +85,265 @@ class EnhancedIpoBot:
             logger.info("🚀 Starting IPO Bot in LIVE MODE - Applications will be processed")
             
     def _get_driver(self):
-        """Get WebDriver with enhanced options"""
-        chrome_options = Options()
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        return webdriver.Chrome(options=chrome_options)
+        """Get a warm WebDriver from the shared browser pool"""
+        return browser_pool.acquire()
 
+    @_instrumented("start_session")
     def start_session(self):
         """Start a new browser session"""
+        if self.backend == "api":
+            self.__api = MeroshareClient()
+            logger.info("API session started successfully")
+            return True
+
         try:
+            if self.__driver is not None:
+                # Session already open for this bot, hand it back before taking another
+                self.quit()
             self.__driver = self._get_driver()
+            self.__recorder = flight_recorder_store.attach(self.__driver)
             self.__driver.get(MEROSHARE_URL.format("login"))
             logger.info("Browser session started successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to start browser session: {e}")
+            if self.__driver is not None:
+                self.quit(crashed=True)
             return False
 
+    @_instrumented("login")
     def login(self, login_details: Dict, max_retry: int = 3) -> bool:
         """Enhanced login with better error handling and screenshots"""
         self.current_user = login_details.get('alias', 'Unknown')
+
+        if self._restore_session():
+            return True
+
+        if self.backend == "api":
+            return self._api_login(login_details)
         
         try:
             # Wait for login form
-            WebDriverWait(self.__driver, 30).until(
-                EC.presence_of_all_elements_located((By.NAME, "loginForm")))
+            wait_engine.until(self.__driver, "login_form", element_present(By.NAME, "loginForm"))
 
             # DP ID selection
-            self.__driver.find_element(By.ID, "selectBranch").click()
-            dp_input = self.__driver.find_element(By.CLASS_NAME, "select2-search__field")
+            wait_engine.until(self.__driver, "login_branch", element_clickable(By.ID, "selectBranch")).click()
+            dp_input = wait_engine.until(self.__driver, "login_dp_search",
+                                         element_clickable(By.CLASS_NAME, "select2-search__field"), 10)
             dp_input.click()
             dp_input.send_keys(login_details["dp_id"])
             dp_input.send_keys(Keys.ENTER)
 
             # Username
-            username_field = self.__driver.find_element(By.ID, "username")
+            username_field = wait_engine.until(self.__driver, "login_username", element_present(By.ID, "username"), 10)
             username_field.send_keys(login_details["username"])
 
             # Password
-            password_field = self.__driver.find_element(By.ID, "password")
+            password_field = wait_engine.until(self.__driver, "login_password", element_present(By.ID, "password"), 10)
             password_field.send_keys(login_details["password"])
 
             # Login button
-            login_button = self.__driver.find_element(By.XPATH, "//button[text()='Login']")
+            login_button = wait_engine.until(self.__driver, "login_button",
+                                             element_clickable(By.XPATH, "//button[text()='Login']"), 10)
             
             if self.dry_run:
-                logger.info(f"🔍 DRY RUN: Would click login button for user {self.current_user}")
+                logger.info("🔍 DRY RUN: Would click login button for user %s", self.current_user)
                 screenshot_manager.take_dry_run_screenshot(self.__driver, f"login_{self.current_user}")
             login_button.click()
 
-            # Check for errors
-            self.__driver.implicitly_wait(2)
-            if self.__driver.find_elements(By.CLASS_NAME, "toast-error"):
-                error_text = self.__driver.find_element(By.CLASS_NAME, "toast-error").text
-                logger.error(f"Login error for {self.current_user}: {error_text}")
-                screenshot_manager.take_error_screenshot(self.__driver, f"login_error_{self.current_user}")
+            # Race the error toast against the dashboard instead of checking them one after another;
+            # one slow response must not fail the login, so this keeps waiting past the adaptive timeout
+            outcome, value = wait_engine.race(self.__driver, "login_result", [
+                ("error", toast_text("toast-error")),
+                ("dashboard", element_present(By.TAG_NAME, "app-dashboard")),
+            ], patient=True)
+            if outcome == "error":
+                logger.error("Login error for %s: %s", self.current_user, value)
+                self._record_incident("login_error", value)
                 return False
 
-            # Wait for dashboard
-            WebDriverWait(self.__driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "app-dashboard")))
-
-            logger.info(f"✅ Successfully logged in for {self.current_user}")
+            logger.info("✅ Successfully logged in for %s", self.current_user)
+            self._save_session()
             return True
 
         except TimeoutException as e:
-            logger.error(f"Timeout during login for {self.current_user}: {e}")
-            screenshot_manager.take_error_screenshot(self.__driver, f"login_timeout_{self.current_user}")
+            logger.error("Timeout during login for %s: %s", self.current_user, e)
+            self._record_incident("login_timeout", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error during login for {self.current_user}: {e}")
-            screenshot_manager.take_error_screenshot(self.__driver, f"login_exception_{self.current_user}")
+            logger.error("Unexpected error during login for %s: %s", self.current_user, e)
+            self._record_incident("login_exception", e)
             return False
 
+    def _api_login(self, login_details: Dict) -> bool:
+        """Log in through the Meroshare REST API"""
+        try:
+            self.__api.login(login_details)
+            logger.info("✅ Successfully logged in via API for %s", self.current_user)
+            self._save_session()
+            return True
+        except MeroshareApiError as e:
+            logger.error("API login error for %s: %s", self.current_user, e)
+            return False
+
+    def _save_session(self) -> None:
+        """Persist the authenticated state so later sessions can skip the login form"""
+        if not session_store.enabled:
+            return
+        try:
+            if self.backend == "api":
+                state = {'token': self.__api.token}
+                tokens = [self.__api.token]
+            else:
+                state = self.__driver.execute_script(
+                    "return {local: Object.assign({}, window.localStorage),"
+                    " session: Object.assign({}, window.sessionStorage)};")
+                state['cookies'] = self.__driver.get_cookies()
+                tokens = list(state['local'].values()) + list(state['session'].values())
+            session_store.save(self.current_user, self.backend, state, session_expiry(tokens))
+        except Exception as e:
+            logger.warning("Could not save session for %s: %s", self.current_user, e)
+
+    def _restore_session(self) -> bool:
+        """Restore a saved session and confirm it with a cheap probe; False means do a full login"""
+        state = session_store.load(self.current_user, self.backend)
+        if not state:
+            return False
+
+        try:
+            if self.backend == "api":
+                self.__api.token = state['token']
+                restored = self.__api.probe()
+            else:
+                restored = self._restore_browser_state(state)
+        except Exception as e:
+            logger.warning("Error restoring saved session for %s: %s", self.current_user, e)
+            restored = False
+
+        if restored:
+            logger.info("♻️ Reused saved session for %s", self.current_user)
+            return True
+
+        logger.info("Saved session for %s was rejected, logging in again", self.current_user)
+        session_store.invalidate(self.current_user, self.backend)
+        try:
+            self._reset_to_login()
+        except Exception as e:
+            logger.warning("Error resetting session for %s: %s", self.current_user, e)
+        return False
+
+    def _restore_browser_state(self, state: Dict) -> bool:
+        """Load saved cookies and web storage into the browser, then probe for the dashboard"""
+        for cookie in state.get('cookies', []):
+            self.__driver.add_cookie(cookie)
+        self.__driver.execute_script(
+            "var s = arguments[0];"
+            "Object.keys(s.local).forEach(function(k) { window.localStorage.setItem(k, s.local[k]); });"
+            "Object.keys(s.session).forEach(function(k) { window.sessionStorage.setItem(k, s.session[k]); });",
+            state)
+        # Reload so the app boots with the restored token
+        self.__driver.get(MEROSHARE_URL.format("dashboard"))
+        self.__driver.refresh()
+        outcome, _ = wait_engine.race(self.__driver, "session_probe", [
+            ("dashboard", element_present(By.TAG_NAME, "app-dashboard")),
+            ("login", element_present(By.NAME, "loginForm")),
+        ], 10)
+        return outcome == "dashboard"
+
+    def _reset_to_login(self) -> None:
+        """Drop any restored state and return to a clean login form"""
+        if self.backend == "api":
+            self.__api.token = None
+            return
+        self.__driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        self.__driver.delete_all_cookies()
+        self.__driver.get(MEROSHARE_URL.format("login"))
+        self.__driver.refresh()
+
+    @_instrumented("navigate")
     def navigate(self, path: str) -> bool:
         """Enhanced navigation with error handling"""
+        if self.backend == "api":
+            # Nothing to navigate, the API serves every page's data directly
+            return True
+
         try:
             self.__driver.get(MEROSHARE_URL.format(path))
-            WebDriverWait(self.__driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "app-asba")))
-
-            self.__driver.implicitly_wait(3)
-            WebDriverWait(self.__driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "app-applicable-issue")))
+            wait_engine.until(self.__driver, "navigate_asba", element_present(By.TAG_NAME, "app-asba"))
+            wait_engine.until(self.__driver, "navigate_applicable_issue",
+                              element_present(By.TAG_NAME, "app-applicable-issue"))
             
-            logger.info(f"✅ Successfully navigated to {path}")
+            logger.info("✅ Successfully navigated to %s", path)
             return True
 
         except Exception as e:
-            logger.error(f"Navigation error to {path}: {e}")
-            screenshot_manager.take_error_screenshot(self.__driver, f"navigation_error_{path}")
+            logger.error("Navigation error to %s: %s", path, e)
+            self._record_incident(f"navigation_error_{path}", e)
             return False
 
+    @_instrumented("parse")
     def parse_open_issues(self, max_retries: int = 3) -> bool:
         """Enhanced issue parsing with caching"""
-        cache_key = f"open_issues_{self.current_user}"
-        
-        # Try to get from cache first
-        cached_issues = cache_manager.get(cache_key)
-        if cached_issues:
-            self.open_issues = cached_issues
-            logger.info(f"📋 Using cached open issues for {self.current_user}")
-            return True
+        # Keyed by backend: API records are numbered in JSON order, which needn't match the DOM cards
+        cache_key = f"open_issues_{self.backend}_{self.current_user}"
+
+        if self.backend == "api":
+            fetch = self.__api.get_open_issues
+        else:
+            fetch = partial(self._scrape_open_issues, max_retries)
+
+        # No stale-while-revalidate here: the refresh needs this bot's own browser or API session,
+        # and an empty list isn't cached so a newly opened issue shows up on the next call
+        try:
+            self.open_issues = cache_manager.get_or_compute(
+                cache_key, fetch, stale_while_revalidate=False, should_cache=bool
+            )
+        except Exception as e:
+            logger.error("Failed to parse open issues for %s: %s", self.current_user, e)
+            return False
 
+        if not self.open_issues:
+            logger.warning("No open issues found for %s", self.current_user)
+            return False
+
+        logger.info("📋 %s open issues for %s", len(self.open_issues), self.current_user)
+        return True
+
+    def _scrape_open_issues(self, max_retries: int) -> List[Dict]:
+        """Read the issue cards from the ASBA page, retrying on errors"""
         for attempt in range(max_retries):
             try:
-                WebDriverWait(self.__driver, 30).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "app-applicable-issue")))
-                
-                self.open_issues_selector = self.__driver.find_elements(By.CLASS_NAME, "company-list")
-                
-                if not self.open_issues_selector:
-                    logger.warning(f"No open issues found for {self.current_user}")
-                    return False
-
-                # Parse issues
-                open_issues_raw = [issue.text.split('\n') for issue in self.open_issues_selector]
-                self.open_issues = []
-                
-                for idx, issue in enumerate(open_issues_raw, start=1):
-                    if not issue or not issue[0]:
-                        continue
-                        
-                    issue_for = issue[2].split('(')[0].strip() if len(issue) > 2 else ""
-                    ticker = issue[2].split('(')[1].strip(')') if len(issue) > 2 and '(' in issue[2] else ""
-                    
-                    self.open_issues.append({
-                        "index": idx,
-                        "Issue Name": issue[0].strip(),
-                        "Issued For": issue_for,
-                        "Ticker": ticker,
-                        "Type of Issue": issue[3].strip() if len(issue) > 3 else "",
-                        "Type of Share": issue[4].strip() if len(issue) > 4 else "",
-                        "Mode": issue[5].strip() if len(issue) > 5 else "",
-                    })
-
-                # Cache the results
-                cache_manager.set(cache_key, self.open_issues)
-                logger.info(f"📋 Successfully parsed {len(self.open_issues)} open issues for {self.current_user}")
-                return True
+                wait_engine.until(self.__driver, "parse_applicable_issue",
+                                  element_present(By.TAG_NAME, "app-applicable-issue"))
+
+                # The cards render shortly after the container; an empty list just runs out the short wait
+                try:
+                    wait_engine.until(self.__driver, "parse_issue_cards",
+                                      element_present(By.CLASS_NAME, "company-list"), 5)
+                except TimeoutException:
+                    pass
+                records = self.__driver.execute_script(EXTRACT_OPEN_ISSUES_JS) or []
+
+                return [
+                    {
+                        "index": record["index"],
+                        "Issue Name": record["name"],
+                        "Issued For": record["issued_for"],
+                        "Ticker": record["ticker"],
+                        "Type of Issue": record["issue_type"],
+                        "Type of Share": record["share_type"],
+                        "Mode": record["mode"],
+                        "Action": record["action"],
+                        "Can Apply": record["action"] == "Apply",
+                    }
+                    for record in records if record["name"]
+                ]
 
             except Exception as e:
-                logger.warning(f"Attempt {attempt + 1} failed to parse issues: {e}")
+                logger.warning("Attempt %s failed to parse issues: %s", attempt + 1, e)
                 if attempt == max_retries - 1:
-                    screenshot_manager.take_error_screenshot(self.__driver, f"parse_issues_error_{self.current_user}")
-                    return False
-                continue
-
-        return False
+                    self._record_incident("parse_issues_error", e)
+                    raise
 
     def get_issue_indexes_for(self, share_type: str) -> List[int]:
         """Get issue indexes for specific share type"""
@@ -196,234 +351,231 @@ class EnhancedIpoBot:
             return []
             
         if share_type == "all":
-            return list(range(1, len(self.open_issues) + 1))
+            return [int(d["index"]) for d in self.open_issues]
         elif share_type == "first":
-            return [1] if self.open_issues else []
+            return [int(self.open_issues[0]["index"])]
         else:
             return [
                 int(d["index"]) for d in self.open_issues
                 if d["Type of Share"] == share_type
             ]
 
+    @_instrumented("apply", succeeded=lambda outcome: not outcome[1])
     def apply_ipo(self, user_details: Dict, indices: List[int], company_name: str = "") -> Tuple[List, List]:
         """Enhanced IPO application with dry run mode and screenshots"""
         self.current_company = company_name
         success = []
         failed = []
+
+        if self.backend == "api":
+            raise RuntimeError("apply_ipo needs a Selenium session, the API backend is read-only")
         
-        logger.info(f"🎯 Starting IPO application for {self.current_user} - Company: {company_name}")
-        logger.info(f"📊 Dry run mode: {self.dry_run}")
-        
+        logger.info("🎯 Starting IPO application for %s - Company: %s", self.current_user, company_name)
+        logger.info("📊 Dry run mode: %s", self.dry_run)
+        attempted = False
+
         for index in indices:
             try:
-                issue_to_apply = self.open_issues_selector[index - 1]
-                issue_name = issue_to_apply.text.split('\n')[0] if issue_to_apply.text else "Unknown"
+                issue = next((d for d in self.open_issues or [] if int(d["index"]) == index), None)
+                issue_name = issue["Issue Name"] if issue else "Unknown"
                 
-                logger.info(f"📝 Processing issue {index}: {issue_name}")
-                
-                # Check if already applied
-                if issue_to_apply.text.split('\n')[-1] != "Apply":
-                    logger.warning(f"⚠️ Already applied to issue {index}: {issue_name}")
+                logger.info("📝 Processing issue %s: %s", index, issue_name)
+
+                # Check if already applied: the cached list may say so, but it can be older than an
+                # application made since, so the live button decides
+                if issue and issue.get("Can Apply") is False:
+                    logger.warning("⚠️ Already applied to issue %s: %s", index, issue_name)
+                    continue
+
+                # Look the card up now; element handles from parse time go stale after any navigation
+                issue_card, card_lines = self._find_issue_card(index, issue["Issue Name"] if issue else None)
+                if card_lines[-1] != "Apply":
+                    logger.warning("⚠️ Already applied to issue %s: %s", index, issue_name)
                     continue
 
                 # Click apply button
                 if self.dry_run:
-                    logger.info(f"🔍 DRY RUN: Would click apply button for issue {index}: {issue_name}")
+                    logger.info("🔍 DRY RUN: Would click apply button for issue %s: %s", index, issue_name)
                     screenshot_manager.take_dry_run_screenshot(self.__driver, f"apply_{index}_{self.current_user}")
-                issue_to_apply.find_element(By.CLASS_NAME, "btn-issue").click()
+                issue_card.find_element(By.CLASS_NAME, "btn-issue").click()
+                attempted = True
 
                 # Apply individual IPO
                 if self._apply_individual_ipo(user_details, issue_name):
                     success.append([issue_name, user_details['alias']])
-                    logger.info(f"✅ Successfully applied to {issue_name}")
+                    logger.info("✅ Successfully applied to %s", issue_name)
                 else:
                     failed.append([issue_name, user_details['alias']])
-                    logger.error(f"❌ Failed to apply to {issue_name}")
+                    logger.error("❌ Failed to apply to %s", issue_name)
 
             except Exception as e:
-                logger.error(f"❌ Error processing issue {index}: {e}")
-                screenshot_manager.take_error_screenshot(self.__driver, f"apply_error_{index}_{self.current_user}")
+                logger.error("❌ Error processing issue %s: %s", index, e)
+                self._record_incident(f"apply_error_{index}", e)
                 failed.append([f"Issue {index}", user_details['alias']])
 
-        logger.info(f"📊 Application Summary for {self.current_user}:")
-        logger.info(f"   ✅ Successful: {len(success)}")
-        logger.info(f"   ❌ Failed: {len(failed)}")
+        if attempted:
+            # The button state changed (or may have), don't let the next run trust the cached list
+            cache_manager.delete(f"open_issues_{self.backend}_{self.current_user}")
+
+        logger.info("📊 Application Summary for %s:", self.current_user)
+        logger.info("   ✅ Successful: %s", len(success))
+        logger.info("   ❌ Failed: %s", len(failed))
         
         return success, failed
 
+    def _find_issue_card(self, index: int, expected_name: str = None) -> Tuple[WebElement, List[str]]:
+        """
+        Find the issue card at a 1-based position on the ASBA page, checking it shows
+        `expected_name`; returns the card and its text lines (name first, button last)
+        """
+        wait_engine.until(self.__driver, "apply_issue_cards", element_present(By.CLASS_NAME, "company-list"), 10)
+        cards = self.__driver.find_elements(By.CLASS_NAME, "company-list")
+        if index > len(cards):
+            raise IndexError(f"Issue {index} not found, only {len(cards)} issues listed")
+        card = cards[index - 1]
+        lines = [line.strip() for line in card.text.strip().split('\n')]
+        if expected_name is not None and lines[0] != expected_name.strip():
+            raise LookupError(f"Issue {index} shows '{lines[0]}', expected '{expected_name}'")
+        return card, lines
+
     def _apply_individual_ipo(self, user_details: Dict, issue_name: str) -> bool:
         """Apply individual IPO with enhanced error handling"""
         try:
-            WebDriverWait(self.__driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "app-issue")))
+            wait_engine.until(self.__driver, "apply_form", element_present(By.TAG_NAME, "app-issue"))
 
             # Select bank
-            self.__driver.find_element(By.XPATH, '//*[@id="selectBank"]/option[2]').click()
+            wait_engine.until(self.__driver, "apply_bank",
+                              element_clickable(By.XPATH, '//*[@id="selectBank"]/option[2]'), 10).click()
 
             # select account number
-            account_number_dropdown = WebDriverWait(self.__driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, '//*[@id="accountNumber"]'))
-                )
+            account_number_dropdown = wait_engine.until(
+                self.__driver, "apply_account_dropdown",
+                element_clickable(By.XPATH, '//*[@id="accountNumber"]'), 10)
             account_number_dropdown.click()
 
-            account_number_select = WebDriverWait(self.__driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, '//*[@id="accountNumber"]/option[2]'))
-            )
+            account_number_select = wait_engine.until(
+                self.__driver, "apply_account_option",
+                element_clickable(By.XPATH, '//*[@id="accountNumber"]/option[2]'), 10)
             account_number_select.click()
             
             # Units to apply
-            units_field = self.__driver.find_element(By.ID, "appliedKitta")
+            units_field = wait_engine.until(self.__driver, "apply_units", element_present(By.ID, "appliedKitta"), 10)
             if self.dry_run:
-                logger.info(f"🔍 DRY RUN: Would enter {user_details['apply_unit']} units")
+                logger.info("🔍 DRY RUN: Would enter %s units", user_details['apply_unit'])
             units_field.send_keys(user_details["apply_unit"])
 
-            self.__driver.implicitly_wait(3)
-
             # CRN number
-            crn_field = self.__driver.find_element(By.ID, "crnNumber")
+            crn_field = wait_engine.until(self.__driver, "apply_crn", element_present(By.ID, "crnNumber"), 10)
             if self.dry_run:
-                logger.info(f"🔍 DRY RUN: Would enter CRN: {user_details['crn']}")
+                logger.info("🔍 DRY RUN: Would enter CRN: %s", user_details['crn'])
             crn_field.send_keys(user_details["crn"])
 
             # Accept terms
-            disclaimer_checkbox = self.__driver.find_element(By.ID, "disclaimer")
+            disclaimer_checkbox = wait_engine.until(self.__driver, "apply_disclaimer",
+                                                    element_clickable(By.ID, "disclaimer"), 10)
             if self.dry_run:
                 logger.info("🔍 DRY RUN: Would accept terms and conditions")
             disclaimer_checkbox.click()
 
             # Proceed button
             proceed_button_xpath = '//*[@id="main"]/div/app-issue/div/wizard/div/wizard-step[1]/form/div[2]/div/div[5]/div[2]/div/button[1]'
-            WebDriverWait(self.__driver, 30).until(
-                EC.element_to_be_clickable((By.XPATH, proceed_button_xpath)))
+            proceed_button = wait_engine.until(self.__driver, "apply_proceed",
+                                               element_clickable(By.XPATH, proceed_button_xpath))
             
             if self.dry_run:
                 logger.info("🔍 DRY RUN: Would click proceed button")
                 screenshot_manager.take_dry_run_screenshot(self.__driver, f"proceed_{self.current_user}")
-            proceed_button = self.__driver.find_element(By.XPATH, proceed_button_xpath)
             proceed_button.click()
 
             # Transaction PIN
-            WebDriverWait(self.__driver, 30).until(
-                EC.presence_of_element_located((By.ID, "transactionPIN")))
-            
-            txn_pin_field = self.__driver.find_element(By.ID, "transactionPIN")
+            txn_pin_field = wait_engine.until(self.__driver, "apply_pin", element_present(By.ID, "transactionPIN"))
             if self.dry_run:
-                logger.info(f"🔍 DRY RUN: Would enter transaction PIN")
+                logger.info("🔍 DRY RUN: Would enter transaction PIN")
             txn_pin_field.send_keys(user_details["txn_pin"])
 
             # Apply button
             apply_button_xpath = '//*[@id="main"]/div/app-issue/div/wizard/div/wizard-step[2]/div[2]/div/form/div[2]/div/div/div/button[1]'
-            WebDriverWait(self.__driver, 30).until(
-                EC.element_to_be_clickable((By.XPATH, apply_button_xpath)))
+            apply_button = wait_engine.until(self.__driver, "apply_submit",
+                                             element_clickable(By.XPATH, apply_button_xpath))
             
             if self.dry_run:
                 logger.info("🔍 DRY RUN: Would click apply button")
                 screenshot_manager.take_dry_run_screenshot(self.__driver, f"apply_final_{self.current_user}")
-            else:
-                apply_button = self.__driver.find_element(By.XPATH, apply_button_xpath)
-                apply_button.click()
-
-            # Check for errors
-            self.__driver.implicitly_wait(2)
-            if self.__driver.find_elements(By.CLASS_NAME, "toast-error"):
-                error_text = self.__driver.find_element(By.CLASS_NAME, "toast-error").text
-                logger.error(f"Application error: {error_text}")
-                screenshot_manager.take_error_screenshot(self.__driver, f"apply_error_{self.current_user}")
+                # Nothing was submitted, so there is no result toast to wait for
                 self.navigate("asba")
                 return False
 
-            # Check for success
-            if self.__driver.find_elements(By.CLASS_NAME, "toast-message"):
-                toast_text = self.__driver.find_element(By.CLASS_NAME, "toast-message").text
-                if toast_text == SUCCESSFUL_APPLICATION_TOAST:
-                    logger.info(f"✅ Successfully applied IPO for {user_details['alias']}")
-                    self.navigate("asba")
-                    return True
+            apply_button.click()
 
-            logger.warning("⚠️ Could not determine application status")
-            screenshot_manager.take_debug_screenshot(self.__driver, f"unknown_status_{self.current_user}")
+            # Race the error toast against the success toast instead of checking them one after another;
+            # the application was submitted, so wait the full timeout for its outcome
+            try:
+                outcome, toast = wait_engine.race(self.__driver, "apply_result", [
+                    ("error", toast_text("toast-error")),
+                    ("success", toast_text("toast-message", SUCCESSFUL_APPLICATION_TOAST)),
+                    ("other", toast_text("toast-message")),
+                ], 10, patient=True)
+            except TimeoutException:
+                outcome, toast = None, None
+
+            if outcome == "error":
+                logger.error("Application error: %s", toast)
+                self._record_incident("apply_error", toast)
+                self.navigate("asba")
+                return False
+
+            if outcome == "success":
+                logger.info("✅ Successfully applied IPO for %s", user_details['alias'])
+                self.navigate("asba")
+                return True
+
+            logger.warning("⚠️ Could not determine application status (toast: %s)", toast)
+            self._record_incident("unknown_status", f"toast: {toast}")
             self.navigate("asba")
             return False
 
         except Exception as e:
-            logger.error(f"❌ Error in individual IPO application: {e}")
-            screenshot_manager.take_error_screenshot(self.__driver, f"individual_apply_error_{self.current_user}")
+            logger.error("❌ Error in individual IPO application: %s", e)
+            self._record_incident("individual_apply_error", e)
             return False
 
-    def quit(self):
-        """Safely quit the driver"""
+    def _record_incident(self, incident: str, error: Any = "") -> None:
+        """Write the flight recorder's recent steps and the page's current state as one incident bundle"""
+        recorder = self.__recorder or FlightRecorder(0)
+        recorder.dump(self.__driver, self.current_user or "unknown", incident, error)
+
+    def quit(self, crashed: bool = False):
+        """Return the browser to the pool, recycling it if it crashed"""
+        if self.__api:
+            self.__api.close()
+            self.__api = None
         if self.__driver:
+            flight_recorder_store.detach(self.__driver)
+            self.__recorder = None
             try:
-                self.__driver.quit()
+                browser_pool.release(self.__driver, crashed=crashed)
                 logger.info("Browser session closed successfully")
             except Exception as e:
                 logger.error(f"Error closing browser session: {e}")
+            finally:
+                self.__driver = None
 
 # Enhanced fetch function with caching
-def fetch_investment_opportunities_enhanced(category_id: int = 2) -> List[Dict]:
-    """Enhanced fetch function with caching"""
-    cache_key = "investment_opportunities"
-    
-    # Try to get from cache first
-    cached_data = cache_manager.get(cache_key)
-    if cached_data:
-        logger.info("📋 Using cached investment opportunities")
-        return cached_data
-
-    # Fetch fresh data
-    import requests
-    params = {
-        "stockSymbol": "",
-        "pageNo": 1,
-        "itemsPerPage": 30,
-        "pagePerDisplay": 20
-    }
-    
-    url = "https://www.nepalipaisa.com/api/GetIpos"
-    
+def fetch_investment_opportunities_enhanced(category_id: int = 2, allow_stale: bool = True,
+                                            use_cache: bool = True) -> List[Dict]:
+    """
+    Enhanced fetch function with caching. Concurrent callers share one feed request;
+    with `allow_stale` a recently expired list is returned at once while it refreshes
+    in the background. Without `use_cache` the feed client is asked directly: it keeps
+    the last result itself and an unchanged feed costs one 304, with nothing written.
+    """
+    # Fresh data comes from the conditional, paginated, pooled feed client
     try:
-        response = requests.get(url, params=params, timeout=30)
-        if response.status_code == 200:
-            ipo_data = response.json()["result"]["data"]
-            
-            latest_issues = []
-            
-            for ipo in ipo_data:
-                ipo_info = {
-                    "id": ipo["ipoId"],
-                    "company_name": ipo["companyName"],
-                    "stock_symbol": ipo["stockSymbol"],
-                    "sector_name": ipo["sectorName"],
-                    "share_type": ipo["shareType"],
-                    "price_per_unit": ipo["pricePerUnit"],
-                    "units": ipo["units"],
-                    "start_date": ipo["openingDateAD"],
-                    "end_date": ipo["closingDateAD"],
-                    "status": ipo["status"]
-                }
-                latest_issues.append(ipo_info)
-                
-            custom_order = {
-                'ordinary': 0,
-                'Open': 0,
-                'Nearing': 1,
-                'Closed': 2,
-            }
-            
-            sorted_ipo_data = sorted(
-                latest_issues, 
-                key=lambda x: (custom_order.get(x["share_type"], 999), custom_order.get(x["status"], 999))
-            )
-            
-            # Cache the results
-            cache_manager.set(cache_key, sorted_ipo_data)
-            logger.info(f"📊 Fetched {len(sorted_ipo_data)} investment opportunities")
-            
-            return sorted_ipo_data
-        else:
-            logger.error(f"Request failed with status code: {response.status_code}")
-            return []
-            
-    except Exception as e:
+        if not use_cache:
+            return ipo_feed_client.fetch_ipos()
+        return cache_manager.get_or_compute(
+            "investment_opportunities", ipo_feed_client.fetch_ipos, stale_while_revalidate=allow_stale
+        )
+    except (IpoFeedError, ValueError, KeyError) as e:
         logger.error(f"Error fetching investment opportunities: {e}")
-        return [] 
\ No newline at end of file
+        return []
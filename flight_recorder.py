@@ -0,0 +1,158 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from selenium.webdriver.remote.webdriver import WebDriver
+from config import config
+from wait_engine import wait_engine
+
+logger = logging.getLogger(__name__)
+
+# One round trip per step: where the page is and a bounded excerpt of the Angular view
+SNAPSHOT_JS = """
+var limit = arguments[0];
+var root = document.querySelector('#main') || document.body;
+return {
+    url: window.location.href,
+    title: document.title,
+    dom: limit > 0 && root ? root.outerHTML.slice(0, limit) : ''
+};
+"""
+
+_UNSAFE_NAME = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class FlightRecorder:
+    """
+    The last FLIGHT_RECORDER_STEPS steps of one browser session, kept in memory only.
+    dump() writes them, with the browser console and a final snapshot, as a single
+    gzip JSON bundle; nothing touches the disk while steps succeed.
+    """
+
+    def __init__(self, size: int = None):
+        self._steps = deque(maxlen=size if size is not None else config.FLIGHT_RECORDER_STEPS)
+        self.started_at = time.time()
+
+    def _snapshot(self, driver: WebDriver, dom_chars: int) -> Dict[str, Any]:
+        try:
+            return driver.execute_script(SNAPSHOT_JS, dom_chars) or {}
+        except Exception as e:
+            return {'snapshot_error': str(e)}
+
+    def record(self, driver: WebDriver, step: str, elapsed: float = None, outcome: str = "ok") -> None:
+        if self._steps.maxlen == 0:
+            return
+        self._steps.append({
+            'step': step,
+            'at': time.time(),
+            'elapsed': round(elapsed, 3) if elapsed is not None else None,
+            'outcome': outcome,
+            **self._snapshot(driver, config.FLIGHT_RECORDER_DOM_CHARS),
+        })
+
+    def steps(self) -> List[Dict[str, Any]]:
+        return list(self._steps)
+
+    def dump(self, driver: Optional[WebDriver], session: str, incident: str, error: Any = "") -> Optional[str]:
+        """Persist the buffer plus the page's current state; returns the bundle path"""
+        bundle = {
+            'session': session,
+            'incident': incident,
+            'error': str(error),
+            'created_at': datetime.now().isoformat(),
+            'session_started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'steps': self.steps(),
+        }
+        if driver is not None:
+            # The final snapshot always carries a larger DOM excerpt, even when per-step capture is off
+            bundle['final'] = self._snapshot(driver, max(config.FLIGHT_RECORDER_DOM_CHARS, 20000))
+            try:
+                bundle['console'] = driver.get_log('browser')
+            except Exception as e:
+                bundle['console_error'] = str(e)
+            if config.FLIGHT_RECORDER_SCREENSHOT:
+                try:
+                    bundle['screenshot_png_base64'] = driver.get_screenshot_as_base64()
+                except Exception as e:
+                    bundle['screenshot_error'] = str(e)
+        return flight_recorder_store.write(bundle)
+
+
+class FlightRecorderStore:
+    """Incident bundles on disk and the recorder attached to each live browser"""
+
+    def __init__(self, incident_dir: str = None):
+        self.incident_dir = incident_dir or config.FLIGHT_RECORDER_DIR
+        self._recorders: Dict[int, FlightRecorder] = {}
+        self._lock = threading.Lock()
+        self._stats = {'incidents': 0, 'write_failures': 0}
+
+    def ensure_incident_dir(self):
+        """Ensure incident directory exists"""
+        if not os.path.exists(self.incident_dir):
+            os.makedirs(self.incident_dir)
+
+    def attach(self, driver: WebDriver) -> FlightRecorder:
+        """Start a fresh recording for a browser handed to a new session"""
+        # Reading the console log empties chromedriver's buffer, so a pooled browser's
+        # incidents only show messages from this session
+        try:
+            driver.get_log('browser')
+        except Exception as e:
+            logger.debug("Could not drain browser console log: %s", e)
+        recorder = FlightRecorder()
+        with self._lock:
+            self._recorders[id(driver)] = recorder
+        return recorder
+
+    def detach(self, driver: WebDriver) -> None:
+        with self._lock:
+            self._recorders.pop(id(driver), None)
+
+    def on_wait(self, driver: WebDriver, step: str, elapsed: float, timed_out: bool) -> None:
+        """Wait engine subscriber: every named wait becomes a recorded step"""
+        recorder = self._recorders.get(id(driver))
+        if recorder is not None:
+            recorder.record(driver, step, elapsed, "timeout" if timed_out else "ok")
+
+    def write(self, bundle: Dict[str, Any]) -> Optional[str]:
+        name = _UNSAFE_NAME.sub('_', f"{bundle['session']}_{bundle['incident']}")
+        filename = f"incident_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json.gz"
+        filepath = os.path.join(self.incident_dir, filename)
+        try:
+            self.ensure_incident_dir()
+            with gzip.open(filepath + '.tmp', 'wt', encoding='utf-8') as f:
+                json.dump(bundle, f, default=str)
+            os.replace(filepath + '.tmp', filepath)
+        except OSError as e:
+            self._stats['write_failures'] += 1
+            logger.error(f"Failed to write incident bundle {filepath}: {e}")
+            return None
+        self._stats['incidents'] += 1
+        logger.info(f"🧾 Incident bundle saved: {filepath} ({len(bundle['steps'])} steps)")
+        self._prune()
+        return filepath
+
+    def _prune(self) -> None:
+        """Keep the newest FLIGHT_RECORDER_MAX_BUNDLES; only runs after an incident, so the scan is rare"""
+        bundles = [f for f in os.listdir(self.incident_dir) if f.startswith('incident_') and f.endswith('.json.gz')]
+        by_age = sorted(bundles, key=lambda f: os.path.getmtime(os.path.join(self.incident_dir, f)))
+        for filename in by_age[:max(0, len(by_age) - config.FLIGHT_RECORDER_MAX_BUNDLES)]:
+            try:
+                os.remove(os.path.join(self.incident_dir, filename))
+            except OSError as e:
+                logger.warning(f"Failed to remove old incident bundle {filename}: {e}")
+
+    def get_incident_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, 'recording_sessions': len(self._recorders)}
+
+# Global flight recorder store
+flight_recorder_store = FlightRecorderStore()
+wait_engine.subscribe(flight_recorder_store.on_wait)
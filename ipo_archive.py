@@ -0,0 +1,89 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import logging
+from typing import Dict, Iterator, List, Optional
+from config import config
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVE_FILE = re.compile(r'^ipo_status-(\d{4}-\d{2})\.jsonl\.gz$')
+
+
+class IpoArchive:
+    """
+    Append-only, gzip-compressed archive of resolved IPOs, one file per closing month.
+    Each append adds a gzip member to the month's file, so existing data is never rewritten.
+    """
+
+    def __init__(self, archive_dir: str = None):
+        self.archive_dir = archive_dir or config.ARCHIVE_DIR
+        self._lock = threading.Lock()
+
+    def ensure_archive_dir(self):
+        """Ensure archive directory exists"""
+        if not os.path.exists(self.archive_dir):
+            os.makedirs(self.archive_dir)
+
+    def _month_file(self, month: str) -> str:
+        return os.path.join(self.archive_dir, f"ipo_status-{month}.jsonl.gz")
+
+    def append(self, records: List[Dict]) -> None:
+        """
+        Archive records shaped like {'ipo_id', 'company_name', 'end_date', 'users': {alias: filled}}.
+        Raises OSError so callers keep the records in the hot store when archiving fails.
+        """
+        if not records:
+            return
+        by_month: Dict[str, List[Dict]] = {}
+        archived_at = time.time()
+        for record in records:
+            by_month.setdefault(record['end_date'][:7], []).append({**record, 'archived_at': archived_at})
+
+        with self._lock:
+            self.ensure_archive_dir()
+            for month, month_records in by_month.items():
+                lines = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in month_records)
+                with gzip.open(self._month_file(month), 'at', encoding='utf-8') as f:
+                    f.write(lines)
+        logger.info(f"📦 Archived {len(records)} closed IPOs")
+
+    def months(self) -> List[str]:
+        """Archived months (YYYY-MM), oldest first"""
+        if not os.path.exists(self.archive_dir):
+            return []
+        return sorted(match.group(1) for match in map(_ARCHIVE_FILE.match, os.listdir(self.archive_dir)) if match)
+
+    def query(self, start_date: str = None, end_date: str = None, user_alias: str = None) -> Iterator[Dict]:
+        """
+        Archived IPOs whose closing date (YYYY-MM-DD) lies within [start_date, end_date],
+        optionally only those with an entry for `user_alias`. Only the months in range are read.
+        """
+        for month in self.months():
+            if (start_date and month < start_date[:7]) or (end_date and month > end_date[:7]):
+                continue
+            with gzip.open(self._month_file(month), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    closed_on = record['end_date'][:10]
+                    if start_date and closed_on < start_date[:10]:
+                        continue
+                    if end_date and closed_on > end_date[:10]:
+                        continue
+                    if user_alias and user_alias not in record['users']:
+                        continue
+                    yield record
+
+    def find(self, ipo_id: str) -> Optional[Dict]:
+        """Most recently archived record of an IPO"""
+        found = None
+        for record in self.query():
+            if record['ipo_id'] == str(ipo_id):
+                found = record
+        return found
+
+# Global IPO archive instance
+ipo_archive = IpoArchive()
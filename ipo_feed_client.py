@@ -0,0 +1,179 @@
+import random
+import threading
+import time
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
+from config import config
+from metrics import http_request_seconds, http_responses_total
+
+logger = logging.getLogger(__name__)
+
+# Sort order used by the dashboard and eligibility checks: ordinary shares first, then by status
+CUSTOM_ORDER = {
+    'ordinary': 0,
+    'Open': 0,
+    'Nearing': 1,
+    'Closed': 2,
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class IpoFeedError(Exception):
+    """Raised when the IPO feed can't be fetched after all retries"""
+
+
+def normalize_ipo(ipo: Dict) -> Dict:
+    """Map a raw nepalipaisa record to the bot's `ipo_info` shape"""
+    return {
+        "id": ipo["ipoId"],
+        "company_name": ipo["companyName"],
+        "stock_symbol": ipo["stockSymbol"],
+        "sector_name": ipo["sectorName"],
+        "share_type": ipo["shareType"],
+        "price_per_unit": ipo["pricePerUnit"],
+        "units": ipo["units"],
+        "start_date": ipo["openingDateAD"],
+        "end_date": ipo["closingDateAD"],
+        "status": ipo["status"]
+    }
+
+
+def sort_ipos(ipos: List[Dict]) -> List[Dict]:
+    return sorted(
+        ipos,
+        key=lambda x: (CUSTOM_ORDER.get(x["share_type"], 999), CUSTOM_ORDER.get(x["status"], 999))
+    )
+
+
+class IpoFeedClient:
+    """Pooled, conditional and paginated client for the nepalipaisa IPO feed"""
+
+    def __init__(self, url: str = None, page_size: int = None, max_pages: int = None,
+                 max_retries: int = None, timeout: int = 30):
+        self.url = url or config.IPO_FEED_URL
+        self.page_size = page_size or config.IPO_FEED_PAGE_SIZE
+        self.max_pages = max_pages or config.IPO_FEED_MAX_PAGES
+        self.max_retries = max_retries if max_retries is not None else config.IPO_FEED_MAX_RETRIES
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=4))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=4))
+        # Per-page validators and raw records, reused when the server answers 304
+        self._pages: Dict[int, Dict] = {}
+        self._last_result: Optional[List[Dict]] = None
+        self._lock = threading.Lock()
+        self.last_fetch_changed = False
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Exponential backoff with full jitter, honouring Retry-After when given"""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(30.0, random.uniform(0, 2 ** attempt))
+
+    def _get_page(self, page_no: int) -> Tuple[List[Dict], Optional[Dict]]:
+        """
+        Fetch one page; returns (raw records, page entry) where the entry holds the new
+        validators and records, or is None on 304. The caller stores it in `_pages`.
+        """
+        cached_page = self._pages.get(page_no)
+        headers = {}
+        if cached_page:
+            if cached_page.get('etag'):
+                headers['If-None-Match'] = cached_page['etag']
+            if cached_page.get('last_modified'):
+                headers['If-Modified-Since'] = cached_page['last_modified']
+
+        params = {
+            "stockSymbol": "",
+            "pageNo": page_no,
+            "itemsPerPage": self.page_size,
+            "pagePerDisplay": 20
+        }
+
+        last_error = None
+        retry_after = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self._backoff(attempt, retry_after)
+                logger.warning(f"Retrying IPO feed page {page_no} in {delay:.1f}s ({last_error})")
+                time.sleep(delay)
+
+            retry_after = None
+            try:
+                with http_request_seconds.time(api='ipo_feed', endpoint='ipo'):
+                    response = self.session.get(self.url, params=params, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                http_responses_total.inc(api='ipo_feed', endpoint='ipo', status='error')
+                last_error = e
+                continue
+            http_responses_total.inc(api='ipo_feed', endpoint='ipo', status=response.status_code)
+
+            if response.status_code == 304 and cached_page:
+                return cached_page['records'], None
+
+            if response.status_code == 200:
+                records = response.json()["result"]["data"] or []
+                return records, {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'records': records,
+                }
+
+            last_error = f"status code {response.status_code}"
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                break
+            retry_after = response.headers.get('Retry-After')
+
+        raise IpoFeedError(f"IPO feed page {page_no} failed: {last_error}")
+
+    def fetch_ipos(self) -> List[Dict]:
+        """
+        Fetch every page of the feed and return normalized, sorted `ipo_info` records.
+        When every page answers 304 the previous result is returned without re-parsing,
+        and `last_fetch_changed` is False. New page validators are only kept once every
+        page was fetched, so a failed fetch can't make the next one look unchanged.
+        """
+        with self._lock:
+            raw_ipos: List[Dict] = []
+            fetched_pages: Dict[int, Dict] = {}
+            seen_ids = set()
+            page_no = 1
+
+            while page_no <= self.max_pages:
+                records, page = self._get_page(page_no)
+                if page is not None:
+                    fetched_pages[page_no] = page
+
+                # Some sources ignore pageNo and repeat the first page; stop on repeats
+                new_records = [r for r in records if r.get("ipoId") not in seen_ids]
+                seen_ids.update(r.get("ipoId") for r in new_records)
+                raw_ipos.extend(new_records)
+
+                if len(records) < self.page_size or not new_records:
+                    break
+                page_no += 1
+
+            changed = bool(fetched_pages)
+            self._pages.update(fetched_pages)
+            # A feed that shrank by whole pages is a change too
+            for stale_page in [p for p in self._pages if p > page_no]:
+                del self._pages[stale_page]
+                changed = True
+
+            self.last_fetch_changed = changed or self._last_result is None
+            if not self.last_fetch_changed:
+                logger.info("📋 IPO feed unchanged since last fetch (304)")
+                return self._last_result
+
+            self._last_result = sort_ipos([normalize_ipo(ipo) for ipo in raw_ipos])
+            logger.info(f"📊 Fetched {len(self._last_result)} IPOs across {page_no} page(s)")
+            return self._last_result
+
+# Global IPO feed client instance
+ipo_feed_client = IpoFeedClient()
@@ -0,0 +1,111 @@
+import threading
+import logging
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class IpoEventType(Enum):
+    ADDED = "added"
+    STATUS_CHANGED = "status_changed"
+    DATES_CHANGED = "dates_changed"
+    REMOVED = "removed"
+
+
+@dataclass
+class IpoEvent:
+    """A single change between two IPO feed snapshots"""
+    type: IpoEventType
+    ipo_id: str
+    ipo: Dict
+    previous: Optional[Dict] = None
+
+    def describe(self) -> str:
+        name = self.ipo.get('company_name', self.ipo_id)
+        if self.type == IpoEventType.STATUS_CHANGED:
+            return f"{name} (ID: {self.ipo_id}) status {self.previous['status']} → {self.ipo['status']}"
+        if self.type == IpoEventType.DATES_CHANGED:
+            return (f"{name} (ID: {self.ipo_id}) dates {self.previous['start_date']}..{self.previous['end_date']}"
+                    f" → {self.ipo['start_date']}..{self.ipo['end_date']}")
+        return f"{name} (ID: {self.ipo_id}) {self.type.value}"
+
+
+EventHandler = Callable[[List[IpoEvent]], None]
+SnapshotHandler = Callable[[List[Dict]], None]
+
+
+class IpoFeedTracker:
+    """Keeps the previous IPO feed snapshot keyed by id and emits typed change events"""
+
+    def __init__(self):
+        self._snapshot: Dict[str, Dict] = {}
+        self._subscribers: List[tuple] = []
+        self._snapshot_subscribers: List[SnapshotHandler] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, handler: EventHandler, event_types: Iterable[IpoEventType] = None) -> None:
+        """Call `handler(events)` after each update that produced events of the given types"""
+        types = frozenset(event_types) if event_types else None
+        self._subscribers.append((handler, types))
+
+    def subscribe_snapshot(self, handler: SnapshotHandler) -> None:
+        """Call `handler(ipo_list)` after each update whose list differs in any field or in order"""
+        self._snapshot_subscribers.append(handler)
+
+    @property
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return list(self._snapshot.values())
+
+    def diff(self, ipo_list: List[Dict]) -> List[IpoEvent]:
+        """Compare a fresh feed against the stored snapshot without updating it"""
+        current = {str(ipo['id']): ipo for ipo in ipo_list}
+        events = []
+        with self._lock:
+            previous_snapshot = self._snapshot
+
+        for ipo_id, ipo in current.items():
+            previous = previous_snapshot.get(ipo_id)
+            if previous is None:
+                events.append(IpoEvent(IpoEventType.ADDED, ipo_id, ipo))
+                continue
+            if previous['status'] != ipo['status']:
+                events.append(IpoEvent(IpoEventType.STATUS_CHANGED, ipo_id, ipo, previous))
+            if previous['start_date'] != ipo['start_date'] or previous['end_date'] != ipo['end_date']:
+                events.append(IpoEvent(IpoEventType.DATES_CHANGED, ipo_id, ipo, previous))
+
+        for ipo_id, previous in previous_snapshot.items():
+            if ipo_id not in current:
+                events.append(IpoEvent(IpoEventType.REMOVED, ipo_id, previous, previous))
+        return events
+
+    def update(self, ipo_list: List[Dict]) -> List[IpoEvent]:
+        """Diff a fresh feed against the snapshot, store it, and notify subscribers"""
+        events = self.diff(ipo_list)
+        with self._lock:
+            changed = ipo_list != list(self._snapshot.values())
+            self._snapshot = {str(ipo['id']): ipo for ipo in ipo_list}
+
+        if changed:
+            self._notify(self._snapshot_subscribers, ipo_list)
+        if not events:
+            return events
+
+        logger.info(f"🔔 IPO feed changes: {'; '.join(event.describe() for event in events)}")
+        for handler, types in self._subscribers:
+            relevant = [event for event in events if types is None or event.type in types]
+            if relevant:
+                self._notify([handler], relevant)
+        return events
+
+    def _notify(self, handlers: List[Callable], payload) -> None:
+        for handler in handlers:
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"IPO feed subscriber {getattr(handler, '__name__', handler)} failed: {e}")
+
+# Global IPO feed tracker instance
+ipo_feed_tracker = IpoFeedTracker()
@@ -0,0 +1,80 @@
+import re
+import threading
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Trailing words that Meroshare and nepalipaisa spell differently or leave out
+_NAME_SUFFIXES = {'limited', 'ltd', 'pvt', 'private', 'public', 'co', 'company'}
+_NON_WORD = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_name(name: str) -> str:
+    """
+    Canonical form of a company name for matching: lowercase, '&' as 'and', punctuation
+    and repeated whitespace removed, trailing suffixes such as 'Limited'/'Ltd.' dropped.
+    """
+    text = _NON_WORD.sub(' ', (name or '').lower().replace('&', ' and '))
+    words = _SPACES.sub(' ', text).strip().split(' ')
+    while len(words) > 1 and words[-1] in _NAME_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+class IpoIndex:
+    """Bidirectional lookup between feed IPO ids and names/tickers as Meroshare shows them"""
+
+    def __init__(self, api_ipo_list: List[Dict]):
+        self._by_id: Dict[str, Dict] = {}
+        self._by_name: Dict[str, str] = {}
+        self._by_ticker: Dict[str, str] = {}
+        for ipo in api_ipo_list:
+            ipo_id = str(ipo['id'])
+            self._by_id[ipo_id] = ipo
+            # First entry wins, matching the old linear scans
+            self._by_name.setdefault(normalize_name(ipo.get('company_name', '')), ipo_id)
+            if ipo.get('stock_symbol'):
+                self._by_ticker.setdefault(ipo['stock_symbol'].strip().upper(), ipo_id)
+
+    @property
+    def ids(self) -> Set[str]:
+        return set(self._by_id)
+
+    def id_for(self, name: str = None, ticker: str = None) -> Optional[str]:
+        """Resolve by normalized name, falling back to the ticker"""
+        ipo_id = self._by_name.get(normalize_name(name)) if name else None
+        if ipo_id is None and ticker:
+            ipo_id = self._by_ticker.get(ticker.strip().upper())
+        return ipo_id
+
+    def id_for_issue(self, issue: Dict) -> Optional[str]:
+        """Resolve a Meroshare open issue record"""
+        return self.id_for(issue.get('Issue Name'), issue.get('Ticker'))
+
+    def ids_for_issues(self, issues: Iterable[Dict]) -> Set[str]:
+        ids = {self.id_for_issue(issue) for issue in issues}
+        ids.discard(None)
+        return ids
+
+    def name_for(self, ipo_id: str) -> Optional[str]:
+        ipo = self._by_id.get(str(ipo_id))
+        return ipo['company_name'].strip() if ipo else None
+
+
+_lock = threading.Lock()
+_current: Optional[tuple] = None  # (api_ipo_list, IpoIndex)
+
+
+def ipo_index_for(api_ipo_list: List[Dict]) -> IpoIndex:
+    """
+    Index for a feed snapshot, built once per snapshot. The feed client and the cache hand out
+    the same list object until the feed changes, so the list's identity identifies the snapshot.
+    """
+    global _current
+    with _lock:
+        if _current is None or _current[0] is not api_ipo_list:
+            _current = (api_ipo_list, IpoIndex(api_ipo_list))
+            logger.debug("Built IPO index for %d IPOs", len(api_ipo_list))
+        return _current[1]
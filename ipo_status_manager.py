@@ -1,145 +1,96 @@
-import os
-import json
-import threading
 from typing import Dict, List, Optional
 import logging
 from datetime import datetime, timedelta, timezone
-
+from config import config
+from status_store import status_store
+from ipo_index import ipo_index_for
+from ipo_archive import ipo_archive
+from ipo_feed_diff import ipo_feed_tracker, IpoEventType
+from scheduler import NEPAL_TZ
+
+# Legacy JSON stores, imported into the SQLite status store on first start
 STATUS_FILE = 'ipo_status.json'
 IGNORE_FILE = 'ipo_ignore.json'
-LOCK = threading.Lock()
 logger = logging.getLogger(__name__)
 
 IGNORE_DURATION_HOURS = 24  # How long to ignore an IPO after skip/ignore command
 
-def _read_status() -> Dict:
-    if not os.path.exists(STATUS_FILE):
-        return {}
-    try:
-        with open(STATUS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to read IPO status file: {e}")
-        return {}
+status_store.migrate_json(STATUS_FILE, IGNORE_FILE)
 
-def _write_status(status: Dict):
-    try:
-        with open(STATUS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(status, f, indent=2)
-    except Exception as e:
-        logger.error(f"Failed to write IPO status file: {e}")
-
-def _read_ignore() -> Dict:
-    if not os.path.exists(IGNORE_FILE):
-        return {}
-    try:
-        with open(IGNORE_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to read IPO ignore file: {e}")
-        return {}
-
-def _write_ignore(ignore: Dict):
-    try:
-        with open(IGNORE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(ignore, f, indent=2)
-    except Exception as e:
-        logger.error(f"Failed to write IPO ignore file: {e}")
+def _remember_ipo_metadata(events):
+    """
+    Keep names and closing dates of feed IPOs so they can be archived once closed.
+    Closed IPOs without status entries are skipped: the paginated feed lists hundreds of
+    them on every start. Closed ones that do have entries (e.g. migrated from the JSON
+    store) are recorded so archive_closed_ipos can pick them up.
+    """
+    today = datetime.now(NEPAL_TZ).date().isoformat()
+    tracked = None
+    for event in events:
+        end_date = str(event.ipo['end_date'])[:10]
+        if end_date and end_date < today:
+            if tracked is None:
+                tracked = status_store.tracked_ipo_ids()
+            if event.ipo_id not in tracked:
+                continue
+        status_store.remember_ipo(event.ipo_id, event.ipo['company_name'].strip(), end_date)
+
+ipo_feed_tracker.subscribe(_remember_ipo_metadata, [IpoEventType.ADDED, IpoEventType.DATES_CHANGED])
 
 def is_ipo_filled_for_user(ipo_id: str, user_alias: str) -> bool:
-    with LOCK:
-        status = _read_status()
-        return status.get(ipo_id, {}).get(user_alias, False)
+    return status_store.is_filled(ipo_id, user_alias)
 
 def mark_ipo_filled_for_user(ipo_id: str, user_alias: str):
-    with LOCK:
-        status = _read_status()
-        if ipo_id not in status:
-            status[ipo_id] = {}
-        status[ipo_id][user_alias] = True
-        _write_status(status)
+    status_store.mark_filled(ipo_id, [user_alias])
 
 def get_unfilled_ipos_for_users(ipo_list: List[Dict], user_aliases: List[str], ignore_expired=True) -> List[Dict]:
     """
     Returns IPOs that are not filled for at least one user and not ignored.
     Each IPO dict will have an extra key 'unfilled_users' listing those users.
     """
-    with LOCK:
-        status = _read_status()
-        ignore = _read_ignore()
-        now = datetime.now(timezone.utc)
-        unfilled = []
-        for ipo in ipo_list:
-            ipo_id = str(ipo['id'])
-            # Ignore logic
-            if ignore_entry:=ignore.get(ipo_id):
-                ignore_until = datetime.fromisoformat(ignore_entry['until'])
-                if now < ignore_until:
-                    continue  # Still ignored
-                elif ignore_expired:
-                    del ignore[ipo_id]  # Clean up expired ignore
-                    _write_ignore(ignore)
-            if unfilled_users:= [alias for alias in user_aliases if not status.get(ipo_id, {}).get(alias, False)]:
-                ipo = dict(ipo)  # copy
-                ipo['unfilled_users'] = unfilled_users
-                unfilled.append(ipo)
-        return unfilled
+    if ignore_expired:
+        status_store.delete_expired_ignores()  # Clean up expired ignores
+    ignored = status_store.ignored_ids()
+    filled = status_store.filled_users([str(ipo['id']) for ipo in ipo_list])
+
+    unfilled = []
+    for ipo in ipo_list:
+        ipo_id = str(ipo['id'])
+        if ipo_id in ignored:
+            continue  # Still ignored
+        if unfilled_users:= [alias for alias in user_aliases if alias not in filled.get(ipo_id, ())]:
+            ipo = dict(ipo)  # copy
+            ipo['unfilled_users'] = unfilled_users
+            unfilled.append(ipo)
+    return unfilled
 
 def mark_ipo_filled_for_users(ipo_id: str, user_aliases: List[str]):
-    with LOCK:
-        status = _read_status()
-        if ipo_id not in status:
-            status[ipo_id] = {}
-        for alias in user_aliases:
-            status[ipo_id][alias] = True
-        _write_status(status)
+    status_store.mark_filled(ipo_id, user_aliases)
 
 def ignore_ipo(ipo_id: str, hours: int = IGNORE_DURATION_HOURS):
-    with LOCK:
-        ignore = _read_ignore()
-        until = (datetime.now(timezone.utc) + timedelta(hours=hours)).isoformat()
-        ignore[ipo_id] = {'until': until}
-        _write_ignore(ignore)
-
-def clear_expired_ignores():
-    with LOCK:
-        ignore = _read_ignore()
-        now = datetime.now(timezone.utc)
-        changed = False
-        for ipo_id in list(ignore.keys()):
-            until = datetime.fromisoformat(ignore[ipo_id]['until'])
-            if now > until:
-                del ignore[ipo_id]
-                changed = True
-        if changed:
-            _write_ignore(ignore)
+    until = datetime.now(timezone.utc) + timedelta(hours=hours)
+    status_store.ignore(ipo_id, until.timestamp())
+
+def clear_expired_ignores() -> int:
+    removed = status_store.delete_expired_ignores()
+    if removed:
+        logger.info(f"Cleared {removed} expired IPO ignores")
+    return removed
 
 def needs_status_sync(eligible_ipos: List[Dict]) -> bool:
     """
-    Check if any eligible IPOs exist in status or ignore files, indicating sync might be needed.
+    Check if any eligible IPOs exist in status or ignore records, indicating sync might be needed.
     Returns True if sync should be performed, False otherwise.
     """
-    with LOCK:
-        status = _read_status()
-        ignore = _read_ignore()
-        
-        for ipo in eligible_ipos:
-            ipo_id = str(ipo['id'])
-            # If IPO exists in status or ignore files, sync is not needed
-            if ipo_id in status or ipo_id in ignore:
-                return False
-        return True
+    # If an IPO exists in status or ignore records, sync is not needed
+    return not status_store.is_known([str(ipo['id']) for ipo in eligible_ipos])
 
 def get_ipo_id_by_name(ipo_name: str, api_ipo_list: List[Dict]) -> Optional[str]:
     """
-    Find IPO ID by name from API list.
+    Find IPO ID by (normalized) name from API list.
     Returns the IPO ID if found, None otherwise.
     """
-    ipo_name_lower = ipo_name.lower().strip()
-    for ipo in api_ipo_list:
-        if ipo['company_name'].lower().strip() == ipo_name_lower:
-            return str(ipo['id'])
-    return None
+    return ipo_index_for(api_ipo_list).id_for(ipo_name)
 
 def sync_status_with_open_issues(open_issues: List[Dict], user_aliases: List[str], api_ipo_list: List[Dict]):
     """
@@ -147,34 +98,53 @@ def sync_status_with_open_issues(open_issues: List[Dict], user_aliases: List[str
     open_issues: list of IPO dicts as returned by Meroshare for the current user.
     api_ipo_list: list of IPO dicts from API (with IDs) to map names to IDs.
     """
-    with LOCK:
-        status = _read_status()
-        # Get available IPO names from Meroshare
-        available_names = {issue['Issue Name'].strip() for issue in open_issues}
-        
-        # For each IPO in status, check if it's still available
-        for ipo_id in list(status.keys()):
-            # Find IPO name by ID from API list
-            ipo_name = None
-            for api_ipo in api_ipo_list:
-                if str(api_ipo['id']) == ipo_id:
-                    ipo_name = api_ipo['company_name'].strip()
-                    break
-            
-            if ipo_name and ipo_name not in available_names:
-                # IPO is no longer available, mark as filled for all users
-                for alias in user_aliases:
-                    status[ipo_id][alias] = True
-                logger.info(f"Marked IPO {ipo_name} (ID: {ipo_id}) as filled for all users (no longer available)")
-        
-        _write_status(status)
+    index = ipo_index_for(api_ipo_list)
+    # IPO IDs still available on Meroshare, matched by name or ticker
+    available_ids = index.ids_for_issues(open_issues)
+
+    # Only IPOs both tracked in status and present in the feed can be resolved
+    for ipo_id in status_store.tracked_ipo_ids() & index.ids:
+        if ipo_id not in available_ids:
+            # IPO is no longer available, mark as filled for all users
+            status_store.mark_filled(ipo_id, user_aliases)
+            logger.info(f"Marked IPO {index.name_for(ipo_id)} (ID: {ipo_id}) as filled for all users (no longer available)")
 
 def get_ipo_name_by_id(ipo_id: str, api_ipo_list: List[Dict]) -> Optional[str]:
     """
     Find IPO name by ID from API list.
     Returns the IPO name if found, None otherwise.
     """
-    for ipo in api_ipo_list:
-        if str(ipo['id']) == ipo_id:
-            return ipo['company_name'].strip()
-    return None 
\ No newline at end of file
+    return ipo_index_for(api_ipo_list).name_for(ipo_id)
+
+def archive_closed_ipos(user_aliases: List[str]) -> int:
+    """
+    Move IPOs whose closing date has passed out of the hot status store into the archive,
+    once every user has a status entry or ARCHIVE_GRACE_DAYS have passed since closing.
+    Returns the number of archived IPOs.
+    """
+    today = datetime.now(NEPAL_TZ).date()
+    grace_cutoff = (today - timedelta(days=config.ARCHIVE_GRACE_DAYS)).isoformat()
+    today = today.isoformat()
+
+    records = []
+    untracked = []
+    for ipo_id, meta in status_store.ipo_metadata().items():
+        if not meta['end_date'] or meta['end_date'] >= today:
+            continue
+        users = status_store.users_for(ipo_id)
+        if not users:
+            # Never applied for or synced, nothing worth archiving
+            untracked.append(ipo_id)
+        elif all(alias in users for alias in user_aliases) or meta['end_date'] < grace_cutoff:
+            records.append({'ipo_id': ipo_id, **meta, 'users': users})
+
+    status_store.drop_ipos(untracked)
+    if not records:
+        return 0
+    try:
+        ipo_archive.append(records)
+    except OSError as e:
+        logger.error(f"Failed to archive closed IPOs: {e}")
+        return 0
+    status_store.drop_ipos([record['ipo_id'] for record in records])
+    return len(records)
@@ -1,10 +1,15 @@
-from flask import Flask
-from datetime import datetime, timezone, date
+import gzip
+import hashlib
+import hmac
+import threading
+from flask import Flask, Response, request
 from flask.templating import render_template
 from threading import Thread
-import pytz
 import logging
-from driver import fetch_investment_opportunities_enhanced
+from config import config
+from ipo_feed_diff import ipo_feed_tracker
+from telegram_utils import telegram_client
+from metrics import registry
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
@@ -12,21 +17,87 @@ logger = logging.getLogger(__name__)
 app = Flask('')
 
 
+class DashboardSnapshot:
+    """The rendered dashboard with its gzip variant and ETag, rebuilt only when the IPO feed's content changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.body = b''
+        self.gzip_body = b''
+        self.etag = ''
+
+    def rebuild(self, ipos) -> None:
+        with app.app_context():
+            body = render_template('display.html', web_data=ipos).encode('utf-8')
+        gzip_body = gzip.compress(body, compresslevel=6)
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self.body, self.gzip_body, self.etag = body, gzip_body, etag
+        logger.info(f"🖥️ Rebuilt dashboard for {len(ipos)} IPOs")
+
+    def current(self):
+        with self._lock:
+            return self.body, self.gzip_body, self.etag
+
+
+dashboard = DashboardSnapshot()
+
+
+# Any change to the feed's content re-renders the page (not only the status/date events);
+# page views only ever read the snapshot
+ipo_feed_tracker.subscribe_snapshot(dashboard.rebuild)
+
+
 @app.route('/')
 def home():
-    tz = pytz.timezone('Asia/Kathmandu')
-    np_time = datetime.now(tz)
-    print("--------------------------------")
-    logger.info(np_time)
-    print("--------------------------------")
-    upcoming_ipos = fetch_investment_opportunities_enhanced()
-    return render_template('display.html', web_data=upcoming_ipos)
+    body, gzip_body, etag = dashboard.current()
+    if not etag:
+        dashboard.rebuild(ipo_feed_tracker.snapshot)  # nothing fetched yet, serve an empty table
+        body, gzip_body, etag = dashboard.current()
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    elif request.accept_encodings['gzip']:
+        response = Response(gzip_body, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route(config.TELEGRAM_WEBHOOK_PATH, methods=['POST'])
+def telegram_webhook():
+    """Receive Telegram updates in webhook mode and hand them to the bot's dispatcher"""
+    secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not config.TELEGRAM_WEBHOOK_SECRET or not hmac.compare_digest(secret, config.TELEGRAM_WEBHOOK_SECRET):
+        return '', 403
+    update = request.get_json(silent=True)
+    if not isinstance(update, dict) or 'update_id' not in update:
+        return '', 400
+    telegram_client.push_update(update)
+    return '', 200
 
 
 def run():
-    app.run(host='0.0.0.0', port=8080)
+    try:
+        from waitress import serve
+    except ImportError:
+        logger.warning("waitress not installed, falling back to Flask's threaded development server")
+        app.run(host='0.0.0.0', port=8080, threaded=True)
+        return
+    serve(app, host='0.0.0.0', port=8080, threads=config.WEB_THREADS)
 
 
 def keep_alive():
-    t = Thread(target=run)
+    # Daemon thread: the web server never keeps the bot process alive on its own
+    t = Thread(target=run, name="web-server", daemon=True)
     t.start()
@@ -1,40 +1,118 @@
+import atexit
+import contextvars
+import json
 import logging
 import logging.handlers
 import os
+import queue
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Optional
 from config import config
 
+# One id per process run, so every log line of a run can be grouped
+RUN_ID = uuid.uuid4().hex[:12]
+
+# Correlation fields (user, ipo_id, iteration) of the code currently running
+_log_context: contextvars.ContextVar = contextvars.ContextVar('log_context', default={})
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_log_context(**fields) -> contextvars.Token:
+    """Add correlation fields for the current thread/task; undo with reset_log_context(token)"""
+    return _log_context.set({**_log_context.get(), **{key: str(value) for key, value in fields.items()}})
+
+def reset_log_context(token: contextvars.Token) -> None:
+    _log_context.reset(token)
+
+@contextmanager
+def log_context(**fields):
+    """Tag every log line inside the block with the given correlation fields"""
+    token = bind_log_context(**fields)
+    try:
+        yield
+    finally:
+        reset_log_context(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the run id and correlation fields onto the record, on the thread that logged it"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        fields = _log_context.get()
+        record.run_id = RUN_ID
+        record.log_context = fields
+        record.context = ' '.join(f"{key}={value}" for key, value in fields.items()) or '-'
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Only merges the message arguments on the calling thread (they may change afterwards);
+    timestamps, formatting, tracebacks and file I/O are left to the listener thread
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line for the structured log sink"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'run_id': getattr(record, 'run_id', RUN_ID),
+            **getattr(record, 'log_context', {}),
+            'thread': record.threadName,
+            'func': record.funcName,
+            'line': record.lineno,
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
 def setup_logger():
     """Setup enhanced logging configuration"""
-    
+    global _listener
+
     # Create logs directory if it doesn't exist
     log_dir = "logs"
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-        
+
     # Configure root logger
     logger = logging.getLogger()
     logger.setLevel(getattr(logging, config.LOG_LEVEL))
-    
+
     # Clear existing handlers
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
-        
+    if _listener is not None:
+        _listener.stop()
+
     # Create formatters
     detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
+        '%(asctime)s - %(name)s - %(levelname)s - [%(context)s] - %(funcName)s:%(lineno)d - %(message)s'
     )
-    
+
     simple_formatter = logging.Formatter(
         '%(asctime)s - %(levelname)s - %(message)s'
     )
-    
+
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
-    
+
     # File handler with rotation
     log_file = os.path.join(log_dir, config.LOG_FILE)
     file_handler = logging.handlers.RotatingFileHandler(
@@ -44,8 +122,7 @@ def setup_logger():
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(detailed_formatter)
-    logger.addHandler(file_handler)
-    
+
     # Error file handler
     error_log_file = os.path.join(log_dir, "ipo_bot_errors.log")
     error_handler = logging.handlers.RotatingFileHandler(
@@ -55,17 +132,46 @@ def setup_logger():
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(detailed_formatter)
-    logger.addHandler(error_handler)
-    
+    handlers = [console_handler, file_handler, error_handler]
+
+    # Optional structured sink
+    if config.LOG_JSON_FILE:
+        json_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(log_dir, config.LOG_JSON_FILE),
+            maxBytes=10*1024*1024,  # 10MB
+            backupCount=5,encoding='utf-8'
+        )
+        json_handler.setLevel(logging.DEBUG)
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    # Callers only enqueue; the listener thread formats and writes to every handler
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
     # Log configuration
     logger.info("=" * 50)
     logger.info("IPO Bot Starting")
     logger.info("=" * 50)
+    logger.info(f"Run ID: {RUN_ID}")
     logger.info(f"Configuration: {config.to_dict()}")
     logger.info("=" * 50)
-    
+
     return logger
 
+def stop_logger():
+    """Drain queued log records to the handlers and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logger)
+
 def get_logger(name: str) -> logging.Logger:
     """Get a logger instance with the given name"""
-    return logging.getLogger(name) 
\ No newline at end of file
+    return logging.getLogger(name)
@@ -7,14 +7,22 @@ import time
 import logging
 import pytz
 from config import config
-from logger_setup import setup_logger
+from logger_setup import setup_logger, bind_log_context, reset_log_context, log_context, stop_logger
 from cache_manager import cache_manager
 from screenshot_utils import screenshot_manager
+from flight_recorder import flight_recorder_store
+from browser_pool import browser_pool
+from parallel_runner import run_for_users
+from wait_engine import wait_engine
+from ipo_feed_diff import ipo_feed_tracker
+from scheduler import scheduler, next_fetch_delay
+from status_store import status_store
 from ipo_status_manager import (
     get_unfilled_ipos_for_users, mark_ipo_filled_for_user, sync_status_with_open_issues,
-    ignore_ipo, clear_expired_ignores, needs_status_sync
+    ignore_ipo, clear_expired_ignores, needs_status_sync, archive_closed_ipos
 )
-from telegram_utils import send_telegram_message, poll_telegram_reply
+from telegram_utils import telegram_client, send_telegram_message
+from approval_manager import approval_manager, ApprovalState
 
 # Setup enhanced logging
 setup_logger()
@@ -40,7 +48,7 @@ def check_ipo_eligibility(ipo_data):
         logger.info(f"✅ Eligible IPO found: {company_name} ({share_type})")
         return True
     else:
-        logger.debug(f"⏭️ Skipping non-eligible IPO: {company_name} ({share_type})")
+        logger.debug("⏭️ Skipping non-eligible IPO: %s (%s)", company_name, share_type)
         return False
 
 def check_timing_conditions(ipo_data):
@@ -56,7 +64,7 @@ def check_timing_conditions(ipo_data):
     
     # Check if IPO is open
     if not start_date <= current_date <= end_date:
-        logger.debug(f"⏭️ IPO {company_name} not open today ({start_date} to {end_date}, now {current_date})")
+        logger.debug("⏭️ IPO %s not open today (%s to %s, now %s)", company_name, start_date, end_date, current_date)
         return False
     
     # Optionally, check time window here
@@ -67,6 +75,8 @@ def check_timing_conditions(ipo_data):
 def process_user_application(user, company_name, bot, ipo_id, open_issues_for_user, api_ipo_list):
     """Process IPO application for a single user and update status"""
     logger.info(f"👤 Processing application for user: {user['alias']}")
+    # Work on a copy so the shared user record isn't re-prefixed every cycle
+    user = dict(user)
     try:
         # Format user data
         user['username'] = f'00{user["username"]}'
@@ -118,61 +128,85 @@ def process_user_application(user, company_name, bot, ipo_id, open_issues_for_us
     finally:
         bot.quit()
 
+def sync_user_status(user, api_ipo_list):
+    """Refresh IPO status for a single user from their Meroshare open issues (dry run)"""
+    bot = EnhancedIpoBot(dry_run=True, read_only=True)  # dry_run to avoid side effects
+    try:
+        if not bot.start_session():
+            return False, "Browser session failed"
+        if not bot.login(user):
+            return False, "Login failed"
+        if not bot.navigate("asba"):
+            return False, "Navigation failed"
+        if not bot.parse_open_issues():
+            return False, "Parse issues failed"
+        sync_status_with_open_issues(bot.open_issues, [user['alias']], api_ipo_list)
+        return True, f"Synced {len(bot.open_issues)} open issues"
+    finally:
+        bot.quit()
 
-logger.info("🚀 Starting Enhanced IPO Bot with Telegram approval, status sync, and ignore support")
-logger.info(f"📊 Configuration: {config.to_dict()}")
-user_details = get_user_details_safe()
-if not user_details:
-    logger.error("❌ No user details available. Exiting.")
-    exit()
-user_aliases = [u['alias'] for u in user_details]
-keep_alive()
-iteration = 0
-last_update_id = None
-while True:
+
+def run_status_sync(latest_issues):
+    """Refresh every user's IPO status from Meroshare across the worker pool"""
+    logger.info("🔄 Status sync needed - running dry run mode for all users")
+    screenshot_manager.cleanup_dry_run_screenshots()  # Clean up before new dry runs
+    sync_start_time = time.time()
+    
+    sync_summary = run_for_users(
+        user_details,
+        lambda user: sync_user_status(user, latest_issues),
+        label="status sync",
+    )
+    
+    sync_duration = time.time() - sync_start_time
+    logger.info(f"✅ Status sync completed in {sync_duration:.2f} seconds")
+    status_store.flush()
+    if sync_summary['failed']:
+        logger.warning(f"⚠️ Status sync failed for: {sync_summary['failed']}")
+
+def get_eligible_ipos(latest_issues):
+    """Filter IPOs that are open to the public today"""
+    return [ipo for ipo in latest_issues if check_ipo_eligibility(ipo) and check_timing_conditions(ipo)]
+
+def check_ipos():
+    """Scheduled job: fetch the IPO feed, react to changes, alert and apply"""
+    global iteration, last_pass_date, force_full_pass, last_fetch_ok
     iteration += 1
+    context_token = bind_log_context(iteration=iteration)
     logger.info(f"🔄 Starting iteration {iteration}")
     
     try:
-        clear_expired_ignores()  # Clean up old ignores
-        latest_issues = fetch_investment_opportunities_enhanced()
+        # The scheduler already paces this job (down to FAST_POLL_SECONDS), so skip the cache:
+        # an unchanged feed costs one 304 and isn't rewritten to disk on every poll
+        latest_issues = fetch_investment_opportunities_enhanced(use_cache=False)
+        last_fetch_ok = bool(latest_issues)
         if not latest_issues:
             logger.warning("⚠️ No investment opportunities found")
-            time.sleep(config.CHECK_INTERVAL_SECONDS)
-            continue
+            return
         
         logger.info(f"📊 Found {len(latest_issues)} investment opportunities")
         
-        # Log current time
         log_tz = pytz.timezone('Asia/Kathmandu')
-        log_np_time = datetime.now(log_tz).strftime("%H:%M")
+
+        # An ignore running out makes its IPO alertable again even though the feed didn't change
+        if clear_expired_ignores():
+            force_full_pass = True
+
+        # Only react to deltas; a new day re-runs everything since timing conditions depend on the date
+        feed_events = ipo_feed_tracker.update(latest_issues)
+        today = datetime.now(log_tz).date()
+        if not feed_events and not force_full_pass and today == last_pass_date:
+            logger.info("⏭️ IPO feed unchanged - skipping eligibility, sync and alerts")
+            return
+        force_full_pass = False
+        last_pass_date = today
+
         # Filter eligible IPOs
-        eligible_ipos = [ipo for ipo in latest_issues if check_ipo_eligibility(ipo) and check_timing_conditions(ipo)]
+        eligible_ipos = get_eligible_ipos(latest_issues)
         
         # Only run status sync if there are eligible IPOs that might need updates
         if eligible_ipos and needs_status_sync(eligible_ipos):
-            logger.info("🔄 Status sync needed - running dry run mode for all users")
-            screenshot_manager.cleanup_dry_run_screenshots()  # Clean up before new dry runs
-            sync_start_time = time.time()
-            
-            for user in user_details:
-                bot = EnhancedIpoBot(dry_run=True)  # dry_run to avoid side effects
-                if not bot.start_session():
-                    continue
-                if not bot.login(user):
-                    bot.quit()
-                    continue
-                if not bot.navigate("asba"):
-                    bot.quit()
-                    continue
-                if not bot.parse_open_issues():
-                    bot.quit()
-                    continue
-                sync_status_with_open_issues(bot.open_issues, [user['alias']], latest_issues)
-                bot.quit()
-            
-            sync_duration = time.time() - sync_start_time
-            logger.info(f"✅ Status sync completed in {sync_duration:.2f} seconds")
+            run_status_sync(latest_issues)
         else:
             logger.info("⏭️ No status sync needed - skipping dry run mode")
         
@@ -180,85 +214,171 @@ while True:
         unfilled_ipos = get_unfilled_ipos_for_users(eligible_ipos, user_aliases)
         if not unfilled_ipos:
             logger.info("No unfilled IPOs for any user. Waiting...")
-            time.sleep(config.CHECK_INTERVAL_SECONDS)
-            continue
-        # Send Telegram alert
+            return
+        # Alert only about IPOs that aren't already awaiting a decision; replies are handled as they arrive
+        new_requests = approval_manager.request(unfilled_ipos)
+        if not new_requests:
+            logger.info(f"⏳ {len(approval_manager.pending())} IPO(s) awaiting approval")
+            return
         alert_lines = ["*IPO Alert!* The following IPOs are available and not filled for all users:"]
         
-        alert_lines.extend(f"- {ipo['company_name']} (ID: {ipo['id']}) | Unfilled users: {', '.join(ipo['unfilled_users'])}" for ipo in unfilled_ipos)
+        alert_lines.extend(f"- {request.ipo['company_name']} (ID: {request.ipo_id}) | Unfilled users: {', '.join(request.ipo['unfilled_users'])}" for request in new_requests)
         alert_lines.append("\nReply with the IPO name or ID to proceed, or 'ignore <id>' to skip for 24h.")
         send_telegram_message('\n'.join(alert_lines))
-        # Wait for reply
         logger.info("Waiting for Telegram reply with IPO name/ID or ignore command...")
-        reply, last_update_id = poll_telegram_reply(last_update_id=last_update_id, timeout=600)
-        if not reply:
-            logger.info("No Telegram reply received. Skipping this round.")
-            time.sleep(config.CHECK_INTERVAL_SECONDS)
-            continue
-        reply = reply.strip().lower()
-        # Handle ignore/skip command
-        if reply.startswith('ignore ') or reply.startswith('skip '):
-            _, ignore_id = reply.split(maxsplit=1)
-            for ipo in unfilled_ipos:
-                if ignore_id in str(ipo['id']).lower() or ignore_id in ipo['company_name'].lower():
-                    ignore_ipo(str(ipo['id']))
-                    send_telegram_message(f"IPO {ipo['company_name']} (ID: {ipo['id']}) will be ignored for 24 hours.")
-                    break
-            time.sleep(config.CHECK_INTERVAL_SECONDS)
-            continue
-        # Find IPO by name or ID
-        selected_ipo = None
-        for ipo in unfilled_ipos:
-            if reply in str(ipo['id']).lower() or reply in ipo['company_name'].lower():
-                selected_ipo = ipo
-                break
-        if not selected_ipo:
-            logger.warning(f"No matching IPO found for reply: {reply}")
-            send_telegram_message(f"No matching IPO found for '{reply}'. Please try again.")
-            time.sleep(config.CHECK_INTERVAL_SECONDS)
-            continue
-        # Apply for selected IPO for all unfilled users
-        applied_users = []
-        failed_users = []
-        for user in user_details:
-            if user['alias'] not in selected_ipo['unfilled_users']:
-                continue
-            bot = EnhancedIpoBot()
-            # Fetch open issues for this user for sync
-            open_issues_for_user = []
-            if bot.start_session() and bot.login(user) and bot.navigate("asba") and bot.parse_open_issues():
-                open_issues_for_user = bot.open_issues
-            success, message = process_user_application(user, selected_ipo['company_name'], bot, selected_ipo['id'], open_issues_for_user, latest_issues)
-            if success:
-                applied_users.append(user['alias'])
-            else:
-                failed_users.append(f"{user['alias']}: {message}")
-        # If any failures, alert only for failed users for this IPO
-        if failed_users:
-            fail_msg = f"Failed to apply for IPO {selected_ipo['company_name']} (ID: {selected_ipo['id']}) for: {failed_users}"
-            send_telegram_message(fail_msg)
-        # Send email and Telegram notification
-        summary = f"""
-IPO Application Summary:\nCompany Name: {selected_ipo['company_name']}\nDate: {date.today()}\nTime: {log_np_time}\n\nSuccessfully applied: {applied_users}\nFailed applications: {failed_users}\n\nConfiguration:\n- Dry Run Mode: {config.DRY_RUN_MODE}\n- Caching Enabled: {config.ENABLE_CACHING}\n- Screenshots Enabled: {config.ENABLE_SCREENSHOTS}\n"""
+    except Exception:
+        # The snapshot already moved on, make sure the interrupted work is redone
+        force_full_pass = True
+        raise
+    finally:
+        # Persist this cycle's status changes in one journal write
+        status_store.flush()
+        reset_log_context(context_token)
+
+def handle_telegram_reply(text, update):
+    """Telegram handler: resolve a reply against the IPOs awaiting approval"""
+    if not approval_manager.pending():
+        return False
+    resolution = approval_manager.resolve_reply(text)
+    if resolution is None:
+        logger.warning(f"No matching IPO found for reply: {text}")
+        send_telegram_message(f"No matching IPO found for '{text.strip()}'. Please try again.")
+        return True
+    state, request = resolution
+    if state == ApprovalState.IGNORED:
+        ignore_ipo(request.ipo_id)
+        send_telegram_message(f"IPO {request.ipo['company_name']} (ID: {request.ipo_id}) will be ignored for 24 hours.")
+    else:
+        scheduler.run_now("apply")
+    return True
+
+def apply_approved_ipos():
+    """Scheduled job (also woken by approvals): apply approved IPOs and drop unanswered requests"""
+    global force_full_pass
+    if approval_manager.expire():
+        logger.info("No Telegram reply received in time. Alerting again on the next check.")
+        force_full_pass = True
+
+    for request in approval_manager.take_approved():
         try:
-            send_mail(summary)
-            send_telegram_message(summary)
-            logger.info("📧 Email and Telegram notification sent")
-        except Exception as e:
-            logger.error(f"❌ Failed to send notification: {e}")
-        screenshot_manager.cleanup_old_screenshots()
-        cache_stats = cache_manager.get_cache_stats()
-        logger.info(f"📊 Cache stats: {cache_stats}")
-        screenshot_stats = screenshot_manager.get_screenshot_stats()
-        logger.info(f"📸 Screenshot stats: {screenshot_stats}")
-    except KeyboardInterrupt:
-        logger.info("🛑 Received interrupt signal. Shutting down gracefully...")
-        break
+            with log_context(ipo_id=request.ipo_id):
+                apply_for_unfilled_users(request.ipo)
+        finally:
+            approval_manager.finish(request)
+            status_store.flush()
+
+def apply_for_unfilled_users(selected_ipo):
+    """Apply one approved IPO for every user that still hasn't filled it, then report"""
+    global force_full_pass
+    latest_issues = ipo_feed_tracker.snapshot
+    log_np_time = datetime.now(pytz.timezone('Asia/Kathmandu')).strftime("%H:%M")
+    still_unfilled = get_unfilled_ipos_for_users([selected_ipo], user_aliases, ignore_expired=False)
+    if not still_unfilled:
+        logger.info(f"IPO {selected_ipo['company_name']} is already filled for every user")
+        return
+    selected_ipo = still_unfilled[0]
+    # Apply for selected IPO for all unfilled users
+    users_to_apply = [user for user in user_details if user['alias'] in selected_ipo['unfilled_users']]
+    apply_summary = run_for_users(
+        users_to_apply,
+        # process_user_application opens its own session and parses open issues itself
+        lambda user: process_user_application(user, selected_ipo['company_name'], EnhancedIpoBot(), selected_ipo['id'], [], latest_issues),
+        label="IPO application",
+    )
+    applied_users = list(apply_summary['succeeded'].keys())
+    failed_users = [f"{alias}: {message}" for alias, message in apply_summary['failed'].items()]
+    # If any failures, alert only for failed users for this IPO
+    if failed_users:
+        # Alert about the failed users again on the next check instead of waiting for a feed change
+        force_full_pass = True
+        fail_msg = f"Failed to apply for IPO {selected_ipo['company_name']} (ID: {selected_ipo['id']}) for: {failed_users}"
+        send_telegram_message(fail_msg)
+    # Send email and Telegram notification
+    summary = f"""
+IPO Application Summary:\nCompany Name: {selected_ipo['company_name']}\nDate: {date.today()}\nTime: {log_np_time}\n\nSuccessfully applied: {applied_users}\nFailed applications: {failed_users}\n\nConfiguration:\n- Dry Run Mode: {config.DRY_RUN_MODE}\n- Caching Enabled: {config.ENABLE_CACHING}\n- Screenshots Enabled: {config.ENABLE_SCREENSHOTS}\n"""
+    try:
+        send_mail(summary)
+        send_telegram_message(summary)
+        logger.info("📧 Email and Telegram notification sent")
     except Exception as e:
-        logger.error(f"❌ Unexpected error in main loop: {e}")
-        time.sleep(config.CHECK_INTERVAL_SECONDS)
-        continue
-    
-    # Wait before next iteration
-    logger.info(f"⏳ Waiting {config.CHECK_INTERVAL_SECONDS} seconds before next check...")
-    time.sleep(config.CHECK_INTERVAL_SECONDS)
+        logger.error(f"❌ Failed to send notification: {e}")
+
+def fetch_interval():
+    """Seconds until the next feed check; failed fetches retry at the regular interval"""
+    if not last_fetch_ok:
+        return config.CHECK_INTERVAL_SECONDS
+    return next_fetch_delay(ipo_feed_tracker.snapshot)
+
+def sync_statuses():
+    """Scheduled job: periodic status sync while eligible IPOs are open"""
+    latest_issues = ipo_feed_tracker.snapshot
+    if not get_eligible_ipos(latest_issues):
+        logger.info("⏭️ No open eligible IPOs - skipping periodic status sync")
+        return
+    run_status_sync(latest_issues)
+
+def cleanup():
+    """Scheduled job: drop expired ignores, archive closed IPOs, compact the status journal and drop old screenshots"""
+    global force_full_pass
+    if clear_expired_ignores():
+        force_full_pass = True
+    archive_closed_ipos(user_aliases)
+    status_store.compact()
+    screenshot_manager.cleanup_old_screenshots()
+
+def log_stats():
+    """Scheduled job: log runtime statistics"""
+    cache_stats = cache_manager.get_cache_stats()
+    logger.info(f"📊 Cache stats: {cache_stats}")
+    screenshot_stats = screenshot_manager.get_screenshot_stats()
+    logger.info(f"📸 Screenshot stats: {screenshot_stats}")
+    incident_stats = flight_recorder_store.get_incident_stats()
+    logger.info(f"🧾 Incident stats: {incident_stats}")
+    pool_stats = browser_pool.get_pool_stats()
+    logger.info(f"🌐 Browser pool stats: {pool_stats}")
+    wait_stats = wait_engine.get_wait_stats()
+    logger.info(f"⏱️ Wait step stats: {wait_stats}")
+    approval_stats = approval_manager.get_approval_stats()
+    logger.info(f"🗳️ Approval stats: {approval_stats}")
+    telegram_stats = telegram_client.get_telegram_stats()
+    logger.info(f"💬 Telegram stats: {telegram_stats}")
+    status_stats = status_store.get_store_stats()
+    logger.info(f"🗄️ Status store stats: {status_stats}")
+    job_stats = scheduler.get_job_stats()
+    logger.info(f"🗓️ Job stats: {job_stats}")
+
+
+logger.info("🚀 Starting Enhanced IPO Bot with Telegram approval, status sync, and ignore support")
+logger.info(f"📊 Configuration: {config.to_dict()}")
+user_details = get_user_details_safe()
+if not user_details:
+    logger.error("❌ No user details available. Exiting.")
+    exit()
+user_aliases = [u['alias'] for u in user_details]
+keep_alive()
+telegram_client.add_handler(handle_telegram_reply)
+telegram_client.start()
+browser_pool.warm(min(len(user_details), browser_pool.size))
+iteration = 0
+last_pass_date = None
+force_full_pass = False
+last_fetch_ok = False
+
+# Poll the feed fast around openings/closings and back off when nothing is open
+scheduler.add_job("fetch", check_ipos, fetch_interval)
+# Approvals wake this job through scheduler.run_now; the interval only expires unanswered requests
+scheduler.add_job("apply", apply_approved_ipos, config.CHECK_INTERVAL_SECONDS, run_immediately=False)
+scheduler.add_job("sync", sync_statuses, config.SYNC_INTERVAL_MINUTES * 60, run_immediately=False)
+scheduler.add_job("cleanup", cleanup, config.CLEANUP_INTERVAL_MINUTES * 60)
+scheduler.add_job("status_flush", status_store.flush, config.STATUS_FLUSH_SECONDS, run_immediately=False)
+scheduler.add_job("stats", log_stats, config.STATS_INTERVAL_MINUTES * 60, run_immediately=False)
+
+try:
+    scheduler.run_forever()
+except KeyboardInterrupt:
+    logger.info("🛑 Received interrupt signal. Shutting down gracefully...")
+finally:
+    browser_pool.shutdown()
+    status_store.close()
+    screenshot_manager.close()
+    stop_logger()
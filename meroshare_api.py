@@ -0,0 +1,146 @@
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Any
+from config import config
+from cache_manager import cache_manager
+from metrics import http_request_seconds, http_responses_total
+
+logger = logging.getLogger(__name__)
+
+APPLICABLE_ISSUE_PAYLOAD = {
+    "filterFieldParams": [
+        {"key": "companyIssue.companyISIN.script", "alias": "Scrip"},
+        {"key": "companyIssue.companyISIN.company.name", "alias": "Company Name"},
+        {"key": "companyIssue.assignedToClient.name", "value": "", "alias": "Issue Manager"},
+    ],
+    "page": 1,
+    "size": 50,
+    "searchRoleViewConstants": "VIEW_APPLICABLE_SHARE",
+    "filterDateParams": [
+        {"key": "minIssueOpenDate", "condition": "", "alias": "", "value": ""},
+        {"key": "maxIssueCloseDate", "condition": "", "alias": "", "value": ""},
+    ],
+}
+
+# One connection pool shared by every client so keep-alive connections survive across users
+_shared_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(config.MAX_WORKERS, 1))
+
+
+class MeroshareApiError(Exception):
+    """Raised when the Meroshare backend rejects or fails a request"""
+
+
+class MeroshareClient:
+    """Lightweight HTTP client for the JSON API behind the Meroshare web app"""
+
+    def __init__(self, base_url: str = None, timeout: int = 15):
+        self.base_url = (base_url or config.MEROSHARE_API_URL).rstrip('/') + '/'
+        self.timeout = timeout
+        self.token = None
+        # Separate session per client keeps cookies and auth isolated between users
+        self.session = requests.Session()
+        self.session.mount("http://", _shared_adapter)
+        self.session.mount("https://", _shared_adapter)
+        self.session.headers.update({
+            "Accept": "application/json, text/plain, */*",
+            "Content-Type": "application/json",
+            "Origin": "https://meroshare.cdsc.com.np",
+            "Referer": "https://meroshare.cdsc.com.np/",
+        })
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a request to the backend, attaching the auth token when logged in"""
+        headers = kwargs.pop('headers', {})
+        if self.token:
+            headers['Authorization'] = self.token
+        endpoint = path.rstrip('/')
+        try:
+            with http_request_seconds.time(api='meroshare', endpoint=endpoint):
+                response = self.session.request(method, self.base_url + path, headers=headers,
+                                                timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            http_responses_total.inc(api='meroshare', endpoint=endpoint, status='error')
+            raise MeroshareApiError(f"{method} {path} failed: {e}") from e
+        http_responses_total.inc(api='meroshare', endpoint=endpoint, status=response.status_code)
+        if response.status_code not in (200, 201):
+            raise MeroshareApiError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+        return response
+
+    def get_capitals(self) -> List[Dict]:
+        """Get the list of depository participants (cached, it rarely changes)"""
+        cached = cache_manager.get("meroshare_capitals")
+        if cached:
+            return cached
+        capitals = self._request("GET", "capital/").json()
+        cache_manager.set("meroshare_capitals", capitals)
+        return capitals
+
+    def _resolve_client_id(self, dp_id: Any) -> Optional[int]:
+        """Map the DP value typed into the login form to the backend's client id"""
+        dp_value = str(dp_id).strip().lower()
+        for capital in self.get_capitals():
+            if str(capital.get('code', '')).lower() == dp_value:
+                return capital['id']
+        for capital in self.get_capitals():
+            if dp_value in str(capital.get('name', '')).lower():
+                return capital['id']
+        return None
+
+    def login(self, login_details: Dict) -> bool:
+        """Authenticate a user and keep the returned token for later calls"""
+        client_id = self._resolve_client_id(login_details["dp_id"])
+        if client_id is None:
+            raise MeroshareApiError(f"Unknown DP: {login_details['dp_id']}")
+
+        response = self._request("POST", "auth/", json={
+            "clientId": client_id,
+            "username": str(login_details["username"]),
+            "password": str(login_details["password"]),
+        })
+        self.token = response.headers.get("Authorization")
+        if not self.token:
+            raise MeroshareApiError("Login response did not include an Authorization token")
+        return True
+
+    def probe(self) -> bool:
+        """Cheap check that the current token is still accepted"""
+        if not self.token:
+            return False
+        try:
+            self._request("GET", "ownDetail/")
+            return True
+        except MeroshareApiError as e:
+            logger.debug("Session probe failed: %s", e)
+            return False
+
+    def fetch_applicable_issues(self) -> List[Dict]:
+        """Fetch the raw applicable-issue records shown on the ASBA page"""
+        if not self.token:
+            raise MeroshareApiError("Not logged in")
+        data = self._request("POST", "companyShare/applicableIssue/", json=APPLICABLE_ISSUE_PAYLOAD).json()
+        return data.get("object", [])
+
+    def get_open_issues(self) -> List[Dict]:
+        """Get applicable issues in the same shape EnhancedIpoBot.parse_open_issues builds"""
+        open_issues = []
+        for idx, issue in enumerate(self.fetch_applicable_issues(), start=1):
+            # The backend only sets `action` (edit, reapply, inProcess) once the user has applied
+            action = (issue.get("action") or "").strip()
+            open_issues.append({
+                "index": idx,
+                "Issue Name": (issue.get("companyName") or "").strip(),
+                "Issued For": (issue.get("subGroup") or "").strip(),
+                "Ticker": (issue.get("scrip") or "").strip(),
+                "Type of Issue": (issue.get("shareTypeName") or "").strip(),
+                "Type of Share": (issue.get("shareGroupName") or "").strip(),
+                "Mode": (issue.get("statusName") or "").strip(),
+                "Action": action.title() if action else "Apply",
+                "Can Apply": not action,
+            })
+        return open_issues
+
+    def close(self) -> None:
+        """Forget the auth token; the shared connection pool stays open for other clients"""
+        self.token = None
+        self.session.cookies.clear()
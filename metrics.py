@@ -0,0 +1,179 @@
+import bisect
+from abc import ABC, abstractmethod
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) shared by every latency histogram: from cache-speed to a slow Chrome start
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Sample = Tuple[str, str, float]  # (metric name with suffix, rendered labels, value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _render_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class _Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterator[Sample]:
+        """(name, labels, value) for every series of this metric"""
+
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, _render_labels(self.labelnames, key), value
+
+
+class Histogram(_Metric):
+    """Latency histogram; observe() is a bisect and three additions under a per-metric lock"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts with a trailing +Inf bucket, then sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        bucket_names = self.labelnames + ('le',)
+        bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f'{self.name}_bucket', _render_labels(bucket_names, key + (bound,)), cumulative
+            yield f'{self.name}_sum', _render_labels(self.labelnames, key), total
+            yield f'{self.name}_count', _render_labels(self.labelnames, key), cumulative
+
+
+class CollectedMetric(_Metric):
+    """Series read from an existing stats dict at scrape time, so the hot path pays nothing"""
+
+    def __init__(self, name: str, documentation: str, labelname: str,
+                 collect: Callable[[], Dict[str, float]], kind: str = 'counter'):
+        super().__init__(name, documentation, (labelname,))
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> Iterator[Sample]:
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.error(f"Failed to collect metric {self.name}: {e}")
+            return
+        for label, value in values.items():
+            yield self.name, _render_labels(self.labelnames, (str(label),)), float(value)
+
+
+class MetricsRegistry:
+    """All metrics of the process, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, name: str, documentation: str, labelname: str,
+                  collect: Callable[[], Dict[str, float]], kind: str = 'counter') -> CollectedMetric:
+        return self.register(CollectedMetric(name, documentation, labelname, collect, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+# Global metrics registry
+registry = MetricsRegistry()
+
+# Bot pipeline metrics
+browser_launch_seconds = registry.histogram(
+    'ipo_bot_browser_launch_seconds', 'Chrome cold start time of pooled browsers')
+browser_launches_total = registry.counter(
+    'ipo_bot_browser_launches_total', 'Chrome launches by result', ('result',))
+step_seconds = registry.histogram(
+    'ipo_bot_step_seconds', 'Duration of session start, login, navigate, parse and apply per user',
+    ('step', 'backend', 'user'))
+steps_total = registry.counter(
+    'ipo_bot_steps_total', 'Bot steps by result (ok, failed or error when it raised)',
+    ('step', 'backend', 'user', 'result'))
+http_request_seconds = registry.histogram(
+    'ipo_bot_http_request_seconds', 'Outbound API request latency', ('api', 'endpoint'))
+http_responses_total = registry.counter(
+    'ipo_bot_http_responses_total', 'Outbound API responses by status code, "error" for transport failures',
+    ('api', 'endpoint', 'status'))
+status_store_io_seconds = registry.histogram(
+    'ipo_bot_status_store_io_seconds', 'Status store journal writes and compactions', ('op',))
@@ -0,0 +1,79 @@
+"""
+Compare the lean page-load profile against the full profile on the Meroshare login page.
+
+Usage: python page_load_benchmark.py [runs]
+
+For each profile a fresh browser loads the login page `runs` times and reports the
+time until the login form is usable and the bytes transferred over the network.
+"""
+import json
+import sys
+import time
+import logging
+from statistics import median
+from typing import Dict, List
+from selenium.webdriver.common.by import By
+from browser_pool import create_chrome_driver, lean_blocked_url_patterns
+from wait_engine import wait_engine, element_present
+from driver import MEROSHARE_URL
+
+logger = logging.getLogger(__name__)
+
+
+def _bytes_transferred(driver) -> int:
+    """Sum encoded bytes of every finished request from the DevTools performance log"""
+    total = 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message.get('method') == 'Network.loadingFinished':
+            total += int(message['params'].get('encodedDataLength', 0))
+    return total
+
+
+def measure_profile(lean: bool, runs: int = 3) -> Dict[str, float]:
+    """Load the login page `runs` times with one profile and collect page-ready time and bytes"""
+    driver = create_chrome_driver(lean=lean, capture_network=True)
+    ready_times: List[float] = []
+    byte_counts: List[int] = []
+    try:
+        for _ in range(runs):
+            driver.get("about:blank")
+            driver.get_log('performance')  # drop entries from the previous run
+            driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+
+            start = time.monotonic()
+            driver.get(MEROSHARE_URL.format("login"))
+            wait_engine.until(driver, "benchmark_login_form", element_present(By.NAME, "loginForm"))
+            ready_times.append(time.monotonic() - start)
+
+            # Give trailing asset requests a moment to settle before counting bytes
+            time.sleep(2)
+            byte_counts.append(_bytes_transferred(driver))
+    finally:
+        driver.quit()
+
+    return {
+        'page_ready_s': round(median(ready_times), 3),
+        'bytes_transferred': int(median(byte_counts)),
+    }
+
+
+def main(runs: int = 3):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logger.info(f"Blocked URL patterns in lean mode: {lean_blocked_url_patterns()}")
+
+    full = measure_profile(lean=False, runs=runs)
+    lean = measure_profile(lean=True, runs=runs)
+
+    logger.info(f"{'profile':<10}{'page ready (s)':>16}{'bytes':>14}")
+    logger.info(f"{'full':<10}{full['page_ready_s']:>16}{full['bytes_transferred']:>14}")
+    logger.info(f"{'lean':<10}{lean['page_ready_s']:>16}{lean['bytes_transferred']:>14}")
+    if full['page_ready_s'] and full['bytes_transferred']:
+        logger.info(
+            f"lean vs full: {100 * (1 - lean['page_ready_s'] / full['page_ready_s']):.1f}% faster, "
+            f"{100 * (1 - lean['bytes_transferred'] / full['bytes_transferred']):.1f}% fewer bytes"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
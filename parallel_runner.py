@@ -0,0 +1,86 @@
+import contextvars
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Tuple, Any
+from config import config
+from logger_setup import log_context
+
+logger = logging.getLogger(__name__)
+
+
+def run_for_users(users: List[Dict], task: Callable[[Dict], Tuple[bool, str]],
+                  max_workers: int = None, timeout: float = None,
+                  label: str = "user pipeline") -> Dict[str, Any]:
+    """
+    Run `task(user)` for every user across a bounded pool of worker threads.
+    Each task must build its own EnhancedIpoBot and return (success, message).
+    A user whose task runs longer than `timeout` seconds is reported as timed out;
+    its thread is left to finish on its own and the late result is discarded.
+    Returns a merged summary of successes, failures and timeouts keyed by alias.
+    """
+    max_workers = max(1, min(max_workers or config.MAX_WORKERS, len(users) or 1))
+    timeout = timeout if timeout is not None else config.USER_TIMEOUT_SECONDS
+
+    summary = {
+        'succeeded': {},
+        'failed': {},
+        'timed_out': [],
+        'workers': max_workers,
+        'duration': 0.0,
+    }
+    if not users:
+        return summary
+
+    started_at: Dict[str, float] = {}
+    started_lock = threading.Lock()
+
+    def _run(user: Dict) -> Tuple[bool, str]:
+        with started_lock:
+            started_at[user['alias']] = time.time()
+        with log_context(user=user['alias']):
+            return task(user)
+
+    logger.info(f"⚙️ Running {label} for {len(users)} users with {max_workers} workers")
+    run_start = time.time()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ipo-worker")
+    # Each task runs in a copy of the caller's context so its log lines keep the iteration / IPO id
+    pending = {executor.submit(contextvars.copy_context().run, _run, user): user['alias'] for user in users}
+
+    try:
+        while pending:
+            done, _ = wait(list(pending), timeout=1.0, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                alias = pending.pop(future)
+                try:
+                    success, message = future.result()
+                except Exception as e:
+                    success, message = False, f"Unexpected error: {e}"
+                if success:
+                    summary['succeeded'][alias] = message
+                else:
+                    summary['failed'][alias] = message
+
+            now = time.time()
+            for future, alias in list(pending.items()):
+                with started_lock:
+                    started = started_at.get(alias)
+                if started is not None and now - started > timeout:
+                    logger.error(f"⏱️ {label} for {alias} timed out after {timeout}s")
+                    future.cancel()
+                    pending.pop(future)
+                    summary['timed_out'].append(alias)
+                    summary['failed'][alias] = f"Timed out after {timeout}s"
+    finally:
+        # Don't block on timed-out workers; they finish in the background
+        executor.shutdown(wait=False)
+
+    summary['duration'] = round(time.time() - run_start, 2)
+    logger.info(
+        f"📊 {label} finished in {summary['duration']}s: "
+        f"{len(summary['succeeded'])} succeeded, {len(summary['failed'])} failed "
+        f"({len(summary['timed_out'])} timed out)"
+    )
+    return summary
@@ -0,0 +1,164 @@
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Union
+import pytz
+from config import config
+
+logger = logging.getLogger(__name__)
+
+NEPAL_TZ = pytz.timezone('Asia/Kathmandu')
+
+Interval = Union[float, Callable[[], float]]
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    """Parse a feed date (YYYY-MM-DD, optionally followed by a time) as a Nepal-time midnight"""
+    try:
+        return NEPAL_TZ.localize(datetime.strptime(str(value)[:10], "%Y-%m-%d"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _at(day: datetime, hhmm: str) -> datetime:
+    hour, minute = (int(part) for part in hhmm.split(':'))
+    return NEPAL_TZ.localize(day.replace(tzinfo=None, hour=hour, minute=minute, second=0, microsecond=0))
+
+
+def interesting_instants(ipos: List[Dict]) -> List[datetime]:
+    """
+    Moments worth polling around: each IPO's opening (MARKET_OPEN_TIME on its start date),
+    APPLY_TIME on every day it is open, and its closing (IPO_CLOSE_TIME on its end date).
+    """
+    instants = []
+    for ipo in ipos:
+        start = _parse_date(ipo.get('start_date'))
+        end = _parse_date(ipo.get('end_date'))
+        if not start or not end or end < start:
+            continue
+        instants.append(_at(start, config.MARKET_OPEN_TIME))
+        instants.append(_at(end, config.IPO_CLOSE_TIME))
+        day = start
+        while day <= end:
+            instants.append(_at(day, config.APPLY_TIME))
+            day += timedelta(days=1)
+    return instants
+
+
+def next_fetch_delay(ipos: List[Dict], now: datetime = None) -> float:
+    """
+    Seconds until the IPO feed should be checked again: FAST_POLL_SECONDS within
+    FAST_POLL_WINDOW_MINUTES of an interesting instant, CHECK_INTERVAL_SECONDS while an
+    IPO is open, IDLE_POLL_SECONDS otherwise, but never sleeping past the start of the
+    next fast-poll window.
+    """
+    now = now or datetime.now(NEPAL_TZ)
+    window = timedelta(minutes=config.FAST_POLL_WINDOW_MINUTES)
+    instants = interesting_instants(ipos)
+
+    if any(abs(instant - now) <= window for instant in instants):
+        return config.FAST_POLL_SECONDS
+
+    today = now.strftime("%Y-%m-%d")
+    any_open = any(
+        ipo.get('status', '').lower() == 'open' and str(ipo.get('start_date', ''))[:10] <= today <= str(ipo.get('end_date', ''))[:10]
+        for ipo in ipos
+    )
+    delay = config.CHECK_INTERVAL_SECONDS if any_open else config.IDLE_POLL_SECONDS
+
+    upcoming = [instant - window for instant in instants if instant - window > now]
+    if upcoming:
+        delay = min(delay, (min(upcoming) - now).total_seconds())
+    return max(config.FAST_POLL_SECONDS, delay)
+
+
+class ScheduledJob:
+    """A named task with its own cadence; `interval` may be a number or a callable"""
+
+    def __init__(self, name: str, func: Callable[[], None], interval: Interval, run_immediately: bool = True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = time.monotonic() if run_immediately else time.monotonic() + self.current_interval()
+        self.runs = 0
+        self.failures = 0
+        self.last_duration = 0.0
+
+    def current_interval(self) -> float:
+        return float(self.interval() if callable(self.interval) else self.interval)
+
+
+class Scheduler:
+    """Runs registered jobs on the main thread, sleeping until the next one is due"""
+
+    def __init__(self):
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._wake = threading.Event()
+        self._stopped = False
+
+    def add_job(self, name: str, func: Callable[[], None], interval: Interval, run_immediately: bool = True) -> None:
+        self._jobs[name] = ScheduledJob(name, func, interval, run_immediately)
+        logger.info(f"🗓️ Registered job '{name}'")
+
+    def run_now(self, name: str) -> None:
+        """Make a job due immediately and wake the scheduler"""
+        self._jobs[name].next_run = time.monotonic()
+        self._wake.set()
+
+    def wake(self) -> None:
+        """Interrupt the current sleep so due jobs are re-evaluated"""
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wake.set()
+
+    def run_pending(self) -> None:
+        """Run every job that is due, in registration order"""
+        for job in list(self._jobs.values()):
+            if job.next_run > time.monotonic():
+                continue
+            start = time.monotonic()
+            try:
+                job.func()
+            except Exception as e:
+                job.failures += 1
+                logger.error(f"❌ Job '{job.name}' failed: {e}")
+            job.runs += 1
+            job.last_duration = time.monotonic() - start
+
+            try:
+                interval = job.current_interval()
+            except Exception as e:
+                logger.error(f"❌ Could not compute next run for job '{job.name}': {e}")
+                interval = config.CHECK_INTERVAL_SECONDS
+            job.next_run = time.monotonic() + interval
+            logger.debug("Job '%s' took %.2fs, next run in %.0fs", job.name, job.last_duration, interval)
+
+    def run_forever(self) -> None:
+        """Loop until stop() is called, sleeping until the earliest next run"""
+        while not self._stopped:
+            self.run_pending()
+            if not self._jobs:
+                break
+            sleep_for = max(0.0, min(job.next_run for job in self._jobs.values()) - time.monotonic())
+            if sleep_for:
+                logger.info(f"⏳ Next job due in {sleep_for:.0f} seconds")
+            self._wake.wait(sleep_for)
+            self._wake.clear()
+
+    def get_job_stats(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        return {
+            name: {
+                'runs': job.runs,
+                'failures': job.failures,
+                'last_duration': round(job.last_duration, 2),
+                'next_run_in': round(max(0.0, job.next_run - now), 1),
+            }
+            for name, job in self._jobs.items()
+        }
+
+# Global scheduler instance
+scheduler = Scheduler()
@@ -1,109 +1,229 @@
+import base64
+import io
 import os
+import queue
+import threading
+import time
 import logging
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Optional, Tuple
 from selenium.webdriver.remote.webdriver import WebDriver
 from config import config
 
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, screenshots are then kept as Chrome's full-size PNGs
+    Image = None
+
 logger = logging.getLogger(__name__)
 
+SCREENSHOT_EXTENSIONS = ('.png', '.webp', '.jpg')
+PIL_FORMATS = {'webp': ('WEBP', '.webp'), 'jpeg': ('JPEG', '.jpg'), 'jpg': ('JPEG', '.jpg')}
+
+
 class ScreenshotManager:
-    """Manages screenshot capture for debugging purposes"""
-    
+    """
+    Manages screenshot capture for debugging purposes. The calling thread only grabs the
+    PNG as base64; a background writer downsizes and re-encodes it, writes it and keeps
+    the directory within SCREENSHOT_MAX_FILES / SCREENSHOT_MAX_MB, evicting oldest first.
+    An in-memory index built once at startup serves stats and cleanup without rescanning.
+    """
+
     def __init__(self, screenshot_dir: str = None):
         self.screenshot_dir = screenshot_dir or config.SCREENSHOT_DIR
         self.ensure_screenshot_dir()
-        
+        self._index: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()  # filename -> (size, created), oldest first
+        self._total_size = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Callable[[], None]]]" = queue.Queue(maxsize=config.SCREENSHOT_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self._stats = {'captured': 0, 'written': 0, 'dropped': 0, 'evicted': 0, 'write_failures': 0}
+        self._load_index()
+
     def ensure_screenshot_dir(self):
         """Ensure screenshot directory exists"""
         if not os.path.exists(self.screenshot_dir):
             os.makedirs(self.screenshot_dir)
             logger.info(f"Created screenshot directory: {self.screenshot_dir}")
-            
+
+    def _load_index(self) -> None:
+        """The only directory scan: pick up screenshots left by earlier runs"""
+        entries = []
+        with os.scandir(self.screenshot_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(SCREENSHOT_EXTENSIONS):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for created, filename, size in sorted(entries):
+            self._index[filename] = (size, created)
+            self._total_size += size
+
+    def _start_writer(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="screenshot-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                task()
+            except Exception as e:
+                logger.error(f"Screenshot writer task failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _encode(self, png: bytes) -> Tuple[bytes, str]:
+        """Downsize to SCREENSHOT_MAX_WIDTH and re-encode; returns (image bytes, file extension)"""
+        if Image is None or config.SCREENSHOT_FORMAT not in PIL_FORMATS:
+            return png, '.png'
+        pil_format, extension = PIL_FORMATS[config.SCREENSHOT_FORMAT]
+        with Image.open(io.BytesIO(png)) as image:
+            image = image.convert('RGB')
+            if image.width > config.SCREENSHOT_MAX_WIDTH:
+                height = round(image.height * config.SCREENSHOT_MAX_WIDTH / image.width)
+                image = image.resize((config.SCREENSHOT_MAX_WIDTH, height), Image.BILINEAR)
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, quality=config.SCREENSHOT_QUALITY)
+        return buffer.getvalue(), extension
+
+    def _write(self, basename: str, png_base64: str, created: float) -> None:
+        """Writer thread: decode, re-encode, write atomically, index and enforce the budget"""
+        data, extension = self._encode(base64.b64decode(png_base64))
+        filename = basename + extension
+        filepath = os.path.join(self.screenshot_dir, filename)
+        tmp_path = filepath + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, filepath)
+        except OSError as e:
+            self._stats['write_failures'] += 1
+            logger.error(f"Failed to write screenshot {filepath}: {e}")
+            return
+
+        with self._lock:
+            previous = self._index.pop(filename, None)
+            if previous:
+                self._total_size -= previous[0]
+            self._index[filename] = (len(data), created)
+            self._total_size += len(data)
+            self._stats['written'] += 1
+        logger.info(f"Screenshot saved: {filepath}")
+        self._enforce_budget()
+
+    def _enforce_budget(self) -> None:
+        max_bytes = config.SCREENSHOT_MAX_MB * 1024 * 1024
+        evicted = []
+        with self._lock:
+            while self._index and (len(self._index) > config.SCREENSHOT_MAX_FILES or self._total_size > max_bytes):
+                filename, (size, _) = self._index.popitem(last=False)
+                self._total_size -= size
+                evicted.append(filename)
+            self._stats['evicted'] += len(evicted)
+        self._remove_files(evicted)
+        if evicted:
+            logger.debug("Evicted %d screenshots to stay within budget", len(evicted))
+
+    def _remove_files(self, filenames) -> int:
+        removed = 0
+        for filename in filenames:
+            filepath = os.path.join(self.screenshot_dir, filename)
+            try:
+                os.remove(filepath)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove screenshot {filepath}: {e}")
+        return removed
+
+    def _remove_where(self, predicate: Callable[[str, float], bool]) -> int:
+        """Drop indexed screenshots matching predicate(filename, created)"""
+        with self._lock:
+            matching = [filename for filename, (_, created) in self._index.items() if predicate(filename, created)]
+            for filename in matching:
+                self._total_size -= self._index.pop(filename)[0]
+        return self._remove_files(matching)
+
     def take_screenshot(self, driver: WebDriver, context: str, error_type: str = "error") -> Optional[str]:
-        """Take a screenshot and save it with descriptive filename"""
+        """
+        Grab the page as base64 and queue it for the writer; returns the file's base name
+        (the extension depends on the encoder). Drops the shot when the writer is backed up.
+        """
         if not config.ENABLE_SCREENSHOTS:
             return None
-            
+
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{error_type}_{context}_{timestamp}.png"
-            filepath = os.path.join(self.screenshot_dir, filename)
-            
-            driver.save_screenshot(filepath)
-            logger.info(f"Screenshot saved: {filepath}")
-            return filepath
-            
+            png_base64 = driver.get_screenshot_as_base64()
         except Exception as e:
             logger.error(f"Failed to take screenshot: {e}")
             return None
-            
+
+        now = time.time()
+        basename = f"{error_type}_{context}_{datetime.fromtimestamp(now).strftime('%Y%m%d_%H%M%S_%f')[:-3]}"
+        self._start_writer()
+        try:
+            self._queue.put_nowait(lambda: self._write(basename, png_base64, now))
+        except queue.Full:
+            self._stats['dropped'] += 1
+            logger.warning(f"Screenshot writer is backed up, dropped {basename}")
+            return None
+        self._stats['captured'] += 1
+        return os.path.join(self.screenshot_dir, basename)
+
     def take_error_screenshot(self, driver: WebDriver, context: str, error_message: str = "") -> Optional[str]:
         """Take a screenshot specifically for error conditions"""
         return self.take_screenshot(driver, context, "error")
-        
+
     def take_debug_screenshot(self, driver: WebDriver, context: str) -> Optional[str]:
         """Take a screenshot for debugging purposes"""
         return self.take_screenshot(driver, context, "debug")
-        
+
     def take_dry_run_screenshot(self, driver: WebDriver, context: str) -> Optional[str]:
         """Take a screenshot during dry run mode"""
         return self.take_screenshot(driver, context, "dry_run")
-        
+
     def cleanup_dry_run_screenshots(self):
-        """Clean up all dry run screenshots"""
-        if not os.path.exists(self.screenshot_dir):
-            return
-            
-        files_removed = 0
-        for filename in os.listdir(self.screenshot_dir):
-            if filename.startswith('dry_run_') and filename.endswith('.png'):
-                filepath = os.path.join(self.screenshot_dir, filename)
-                try:
-                    os.remove(filepath)
-                    files_removed += 1
-                except Exception as e:
-                    logger.warning(f"Failed to remove dry run screenshot {filepath}: {e}")
-                    
+        """Clean up all dry run screenshots, including any still queued"""
+        self.flush()
+        files_removed = self._remove_where(lambda filename, created: filename.startswith('dry_run_'))
         if files_removed > 0:
             logger.info(f"Cleaned up {files_removed} dry run screenshots")
-        
+
     def cleanup_old_screenshots(self, days_to_keep: int = 7):
         """Clean up screenshots older than specified days"""
-        if not os.path.exists(self.screenshot_dir):
-            return
-            
-        current_time = datetime.now()
-        files_removed = 0
-        
-        for filename in os.listdir(self.screenshot_dir):
-            if filename.endswith('.png'):
-                filepath = os.path.join(self.screenshot_dir, filename)
-                file_time = datetime.fromtimestamp(os.path.getctime(filepath))
-                
-                if (current_time - file_time).days > days_to_keep:
-                    try:
-                        os.remove(filepath)
-                        files_removed += 1
-                    except Exception as e:
-                        logger.warning(f"Failed to remove old screenshot {filepath}: {e}")
-                        
+        cutoff = time.time() - (days_to_keep + 1) * 86400
+        files_removed = self._remove_where(lambda filename, created: created < cutoff)
         if files_removed > 0:
             logger.info(f"Cleaned up {files_removed} old screenshots")
-            
+
+    def flush(self) -> None:
+        """Wait until every queued screenshot is written"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Write what is queued and stop the writer"""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(timeout=30)
+            self._writer = None
+
     def get_screenshot_stats(self) -> dict:
         """Get statistics about screenshots"""
-        if not os.path.exists(self.screenshot_dir):
-            return {'total_files': 0, 'total_size': 0}
-            
-        files = [f for f in os.listdir(self.screenshot_dir) if f.endswith('.png')]
-        total_size = sum(os.path.getsize(os.path.join(self.screenshot_dir, f)) for f in files)
-        
-        return {
-            'total_files': len(files),
-            'total_size': total_size,
-            'screenshot_dir': self.screenshot_dir
-        }
+        with self._lock:
+            return {
+                'total_files': len(self._index),
+                'total_size': self._total_size,
+                'screenshot_dir': self.screenshot_dir,
+                'queued': self._queue.qsize(),
+                **self._stats,
+            }
 
 # Global screenshot manager instance
-screenshot_manager = ScreenshotManager() 
\ No newline at end of file
+screenshot_manager = ScreenshotManager()
@@ -0,0 +1,123 @@
+import base64
+import hashlib
+import json
+import os
+import time
+import logging
+from typing import Dict, Optional, Any, List
+from cryptography.fernet import Fernet, InvalidToken
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """Read the `exp` claim from a JWT-style token, or None if it isn't one"""
+    if not token or token.count('.') != 2:
+        return None
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims['exp']) if 'exp' in claims else None
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def session_expiry(tokens: List[str]) -> float:
+    """
+    Work out when a saved session stops being usable: the earliest server-side
+    token expiry, falling back to SESSION_TTL_MINUTES from now for opaque tokens.
+    """
+    candidates = [exp for exp in (token_expiry(token) for token in tokens) if exp]
+    if candidates:
+        return min(candidates)
+    return time.time() + config.SESSION_TTL_MINUTES * 60
+
+
+class SessionStore:
+    """Encrypted on-disk store of authenticated Meroshare sessions, one entry per user and backend"""
+
+    def __init__(self, store_dir: str = None, key: str = None):
+        self.store_dir = store_dir or config.SESSION_STORE_DIR
+        key = key if key is not None else config.SESSION_STORE_KEY
+        self._fernet = None
+
+        if not config.ENABLE_SESSION_REUSE:
+            return
+        if not key:
+            logger.info("SESSION_STORE_KEY not set, authenticated sessions will not be reused")
+            return
+        try:
+            self._fernet = Fernet(key.encode() if isinstance(key, str) else key)
+        except ValueError as e:
+            logger.error(f"Invalid SESSION_STORE_KEY, session reuse disabled: {e}")
+            return
+        self.ensure_store_dir()
+
+    @property
+    def enabled(self) -> bool:
+        return self._fernet is not None
+
+    def ensure_store_dir(self):
+        """Ensure session store directory exists"""
+        if not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+
+    def _get_session_file_path(self, alias: str, backend: str) -> str:
+        """Hash the alias so user names never appear on disk"""
+        digest = hashlib.sha256(f"{backend}:{alias}".encode('utf-8')).hexdigest()
+        return os.path.join(self.store_dir, f"{digest}.session")
+
+    def save(self, alias: str, backend: str, state: Dict[str, Any], expires_at: float) -> None:
+        """Encrypt and persist a user's authenticated state until `expires_at` (epoch seconds)"""
+        if not self.enabled:
+            return
+        if expires_at <= time.time():
+            logger.debug("Not saving already expired session for %s", alias)
+            return
+
+        path = self._get_session_file_path(alias, backend)
+        payload = json.dumps({'state': state, 'expires_at': expires_at, 'saved_at': time.time()})
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(self._fernet.encrypt(payload.encode('utf-8')))
+            os.replace(tmp_path, path)
+            logger.info(f"🔐 Saved {backend} session for {alias} (valid for {int(expires_at - time.time())}s)")
+        except OSError as e:
+            logger.error(f"Error saving session for {alias}: {e}")
+
+    def load(self, alias: str, backend: str) -> Optional[Dict[str, Any]]:
+        """Return a user's saved state, or None if missing, expired or unreadable"""
+        if not self.enabled:
+            return None
+
+        path = self._get_session_file_path(alias, backend)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                entry = json.loads(self._fernet.decrypt(f.read()))
+        except (OSError, InvalidToken, ValueError) as e:
+            logger.warning(f"Error reading saved session for {alias}: {e}")
+            self.invalidate(alias, backend)
+            return None
+
+        # Leave a little headroom so the token doesn't expire mid-run
+        if entry['expires_at'] - 60 <= time.time():
+            logger.info(f"Saved session expired for {alias}")
+            self.invalidate(alias, backend)
+            return None
+        return entry['state']
+
+    def invalidate(self, alias: str, backend: str) -> None:
+        """Delete a user's saved session"""
+        path = self._get_session_file_path(alias, backend)
+        if os.path.exists(path):
+            os.remove(path)
+            logger.info(f"Deleted saved {backend} session for {alias}")
+
+# Global session store instance
+session_store = SessionStore()
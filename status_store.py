@@ -0,0 +1,355 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Set
+from config import config
+from metrics import registry, status_store_io_seconds
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ipo_status (
+    ipo_id TEXT NOT NULL,
+    user_alias TEXT NOT NULL,
+    filled INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ipo_id, user_alias)
+);
+CREATE TABLE IF NOT EXISTS ipo_ignore (
+    ipo_id TEXT PRIMARY KEY,
+    until REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ipo_ignore_until ON ipo_ignore (until);
+CREATE TABLE IF NOT EXISTS ipo_meta (
+    ipo_id TEXT PRIMARY KEY,
+    company_name TEXT NOT NULL,
+    end_date TEXT NOT NULL
+);
+"""
+
+
+class StatusStore:
+    """
+    Per-user IPO filled flags and IPO ignore windows.
+
+    The in-memory state is authoritative and every read is served from it. Mutations are
+    buffered and appended to a write-ahead journal in batches (flush), and the journal is
+    periodically applied to the SQLite snapshot and truncated (compact). On start the
+    snapshot is loaded and the journal replayed on top of it.
+    """
+
+    def __init__(self, db_path: str = None, journal_path: str = None):
+        self.db_path = db_path or config.STATUS_DB_FILE
+        self.journal_path = journal_path or config.STATUS_JOURNAL_FILE
+        self._lock = threading.RLock()
+        self._status: Dict[str, Dict[str, bool]] = {}
+        self._ignore: Dict[str, float] = {}
+        self._meta: Dict[str, Dict[str, str]] = {}
+        self._pending: List[list] = []    # ops not yet in the journal
+        self._journal_ops = 0             # ops in the journal but not yet in the snapshot
+        self._journal_torn = False        # a failed append may have left a line without its newline
+        self._stats = {'mutations': 0, 'flushes': 0, 'compactions': 0}
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._load()
+
+    def _load(self) -> None:
+        """Load the snapshot, replay the journal over it and fold the journal in"""
+        for ipo_id, alias, filled in self._conn.execute("SELECT ipo_id, user_alias, filled FROM ipo_status"):
+            self._status.setdefault(ipo_id, {})[alias] = bool(filled)
+        for ipo_id, until in self._conn.execute("SELECT ipo_id, until FROM ipo_ignore"):
+            self._ignore[ipo_id] = until
+        for ipo_id, company_name, end_date in self._conn.execute("SELECT ipo_id, company_name, end_date FROM ipo_meta"):
+            self._meta[ipo_id] = {'company_name': company_name, 'end_date': end_date}
+
+        if not os.path.exists(self.journal_path):
+            return
+        complete_bytes = 0
+        torn = False
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Crashed mid-append: cut it off so the next append starts on its own line
+                    logger.warning("Dropping torn IPO status journal entry")
+                    torn = True
+                    break
+                complete_bytes += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping corrupt IPO status journal entry")
+                    continue
+                self._apply(op)
+                self._journal_ops += 1
+        if torn:
+            os.truncate(self.journal_path, complete_bytes)
+        if self._journal_ops:
+            logger.info(f"🗄️ Replayed {self._journal_ops} IPO status journal entries")
+        if self._journal_ops or torn:
+            self.compact()
+
+    def _apply(self, op: list) -> None:
+        """Apply one journal op to the in-memory state"""
+        kind = op[0]
+        if kind == 'fill':
+            _, ipo_id, aliases, filled = op
+            users = self._status.setdefault(ipo_id, {})
+            for alias in aliases:
+                users[alias] = filled
+        elif kind == 'ignore':
+            _, ipo_id, until = op
+            self._ignore[ipo_id] = until
+        elif kind == 'expire_ignores':
+            _, now = op
+            for ipo_id in [ipo_id for ipo_id, until in self._ignore.items() if until <= now]:
+                del self._ignore[ipo_id]
+        elif kind == 'meta':
+            _, ipo_id, company_name, end_date = op
+            self._meta[ipo_id] = {'company_name': company_name, 'end_date': end_date}
+        elif kind == 'drop':
+            for ipo_id in op[1]:
+                self._status.pop(ipo_id, None)
+                self._ignore.pop(ipo_id, None)
+                self._meta.pop(ipo_id, None)
+
+    @staticmethod
+    def _statements(op: list, now: float) -> List[tuple]:
+        """SQL that applies one journal op to the snapshot"""
+        kind = op[0]
+        if kind == 'fill':
+            _, ipo_id, aliases, filled = op
+            return [("INSERT OR REPLACE INTO ipo_status (ipo_id, user_alias, filled, updated_at) VALUES (?, ?, ?, ?)",
+                     (ipo_id, alias, int(filled), now)) for alias in aliases]
+        if kind == 'ignore':
+            _, ipo_id, until = op
+            return [("INSERT OR REPLACE INTO ipo_ignore (ipo_id, until) VALUES (?, ?)", (ipo_id, until))]
+        if kind == 'expire_ignores':
+            return [("DELETE FROM ipo_ignore WHERE until <= ?", (op[1],))]
+        if kind == 'meta':
+            _, ipo_id, company_name, end_date = op
+            return [("INSERT OR REPLACE INTO ipo_meta (ipo_id, company_name, end_date) VALUES (?, ?, ?)",
+                     (ipo_id, company_name, end_date))]
+        if kind == 'drop':
+            return [(f"DELETE FROM {table} WHERE ipo_id = ?", (ipo_id,))
+                    for ipo_id in op[1] for table in ('ipo_status', 'ipo_ignore', 'ipo_meta')]
+        return []
+
+    def _record(self, op: list) -> None:
+        """Apply a mutation in memory and queue it for the journal"""
+        with self._lock:
+            self._apply(op)
+            self._pending.append(op)
+            self._stats['mutations'] += 1
+            should_flush = len(self._pending) >= config.STATUS_FLUSH_BATCH
+        if should_flush:
+            self.flush()
+
+    def _write_pending(self) -> None:
+        """Append buffered mutations to the journal in one write; raises OSError"""
+        if not self._pending:
+            return
+        lines = ''.join(json.dumps(op, separators=(',', ':')) + '\n' for op in self._pending)
+        if self._journal_torn:
+            lines = '\n' + lines
+        try:
+            with status_store_io_seconds.time(op='journal_write'), \
+                    open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            self._journal_torn = True
+            raise
+        self._journal_torn = False
+        self._journal_ops += len(self._pending)
+        self._pending.clear()
+        self._stats['flushes'] += 1
+
+    def flush(self) -> None:
+        """Write buffered mutations to the journal, compacting when it has grown large"""
+        with self._lock:
+            try:
+                self._write_pending()
+            except OSError as e:
+                logger.error(f"Failed to write IPO status journal: {e}")
+                return
+            should_compact = self._journal_ops >= config.STATUS_COMPACT_OPS
+        if should_compact:
+            self.compact()
+
+    def compact(self) -> None:
+        """Apply the journal to the SQLite snapshot in one transaction and truncate it"""
+        with self._lock:
+            try:
+                self._write_pending()
+            except OSError as e:
+                logger.error(f"Failed to write IPO status journal: {e}")
+                return
+            if not os.path.exists(self.journal_path):
+                return
+            start = time.perf_counter()
+            ops = []
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        ops.append(json.loads(line))
+                    except ValueError:
+                        continue
+
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for op in ops:
+                    for sql, params in self._statements(op, now):
+                        self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._conn.execute("ROLLBACK")
+                logger.error(f"Failed to compact IPO status journal: {e}")
+                return
+
+            # Replaying ops that already reached the snapshot is harmless, so a crash here loses nothing
+            os.remove(self.journal_path)
+            self._journal_ops = 0
+            self._stats['compactions'] += 1
+            status_store_io_seconds.observe(time.perf_counter() - start, op='compact')
+            logger.debug("Compacted %d IPO status journal entries into %s", len(ops), self.db_path)
+
+    def is_filled(self, ipo_id: str, user_alias: str) -> bool:
+        with self._lock:
+            return self._status.get(ipo_id, {}).get(user_alias, False)
+
+    def mark_filled(self, ipo_id: str, user_aliases: Iterable[str]) -> None:
+        self._record(['fill', ipo_id, list(user_aliases), True])
+
+    def filled_users(self, ipo_ids: List[str]) -> Dict[str, Set[str]]:
+        """Users marked filled for each of the given IPOs"""
+        with self._lock:
+            return {
+                ipo_id: {alias for alias, filled in self._status[ipo_id].items() if filled}
+                for ipo_id in ipo_ids if ipo_id in self._status
+            }
+
+    def tracked_ipo_ids(self) -> Set[str]:
+        """Every IPO that has at least one status entry"""
+        with self._lock:
+            return set(self._status)
+
+    def is_known(self, ipo_ids: List[str]) -> bool:
+        """True if any of the IPOs has a status entry or an ignore entry"""
+        with self._lock:
+            return any(ipo_id in self._status or ipo_id in self._ignore for ipo_id in ipo_ids)
+
+    def ignore(self, ipo_id: str, until: float) -> None:
+        self._record(['ignore', ipo_id, until])
+
+    def ignored_ids(self, now: float = None) -> Set[str]:
+        """IPOs whose ignore window hasn't ended yet"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            return {ipo_id for ipo_id, until in self._ignore.items() if until > now}
+
+    def delete_expired_ignores(self, now: float = None) -> int:
+        now = now if now is not None else time.time()
+        with self._lock:
+            expired = sum(1 for until in self._ignore.values() if until <= now)
+            if expired:
+                self._record(['expire_ignores', now])
+            return expired
+
+    def remember_ipo(self, ipo_id: str, company_name: str, end_date: str) -> None:
+        """Keep the name and closing date of an IPO for retention; unchanged values aren't journaled"""
+        with self._lock:
+            if self._meta.get(ipo_id) == {'company_name': company_name, 'end_date': end_date}:
+                return
+            self._record(['meta', ipo_id, company_name, end_date])
+
+    def ipo_metadata(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            return {ipo_id: dict(meta) for ipo_id, meta in self._meta.items()}
+
+    def users_for(self, ipo_id: str) -> Dict[str, bool]:
+        """Every user status entry of an IPO"""
+        with self._lock:
+            return dict(self._status.get(ipo_id, {}))
+
+    def drop_ipos(self, ipo_ids: List[str]) -> None:
+        """Forget IPOs entirely: status, ignore and metadata"""
+        if ipo_ids:
+            self._record(['drop', list(ipo_ids)])
+
+    def migrate_json(self, status_file: str, ignore_file: str) -> None:
+        """Import the legacy JSON files once, renaming each to `<name>.migrated` afterwards"""
+        migrated = []
+
+        if os.path.exists(status_file):
+            try:
+                with open(status_file, 'r', encoding='utf-8') as f:
+                    status = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to read IPO status file for migration: {e}")
+                status = None
+            if status is not None:
+                for ipo_id, users in status.items():
+                    for alias, filled in users.items():
+                        self._record(['fill', str(ipo_id), [alias], bool(filled)])
+                migrated.append(status_file)
+
+        if os.path.exists(ignore_file):
+            try:
+                with open(ignore_file, 'r', encoding='utf-8') as f:
+                    ignore = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to read IPO ignore file for migration: {e}")
+                ignore = None
+            if ignore is not None:
+                for ipo_id, entry in ignore.items():
+                    self._record(['ignore', str(ipo_id), datetime.fromisoformat(entry['until']).timestamp()])
+                migrated.append(ignore_file)
+
+        if not migrated:
+            return
+        self.compact()
+        for path in migrated:
+            os.replace(path, f"{path}.migrated")
+        logger.info(f"🗄️ Migrated {', '.join(migrated)} into {self.db_path}")
+
+    def get_store_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                'ipos': len(self._status),
+                'ignores': len(self._ignore),
+                'ipo_metadata': len(self._meta),
+                'pending': len(self._pending),
+                'journal_ops': self._journal_ops,
+            }
+
+    def close(self) -> None:
+        """Flush and compact everything, then close the snapshot"""
+        self.compact()
+        with self._lock:
+            self._conn.close()
+
+# Global status store instance
+status_store = StatusStore()
+
+
+def _store_metrics(events: bool) -> Dict[str, int]:
+    """Split get_store_stats() into event counters and current sizes"""
+    return {name: value for name, value in status_store.get_store_stats().items()
+            if (name in status_store._stats) == events}
+
+registry.collector('ipo_bot_status_store_events_total', 'Status store mutations, journal flushes and compactions',
+                   'event', lambda: _store_metrics(True))
+registry.collector('ipo_bot_status_store_size', 'Status store rows, pending mutations and journal length',
+                   'kind', lambda: _store_metrics(False), kind='gauge')
@@ -1,67 +1,310 @@
 import os
+import queue
+import threading
 import requests
 import time
 import logging
+from concurrent.futures import Future
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, List, Optional, Tuple
+from config import config
+from metrics import http_request_seconds, http_responses_total
 
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')  # Set this in environment
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')      # Set this in environment 
+TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')      # Set this in environment
 
 logger = logging.getLogger(__name__)
 
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}" if TELEGRAM_BOT_TOKEN else None
+TELEGRAM_API_URL = f"{config.TELEGRAM_API_BASE.rstrip('/')}/bot{TELEGRAM_BOT_TOKEN}" if TELEGRAM_BOT_TOKEN else None
 
+# Telegram rejects longer messages; queued messages are merged up to this size
+MAX_MESSAGE_LENGTH = 4096
 
-def send_telegram_message(message: str) -> bool:
-    """Send a message to the configured Telegram chat."""
-    if not TELEGRAM_API_URL or not TELEGRAM_CHAT_ID:
-        logger.error("Telegram bot token or chat ID not set.")
-        return False
-    try:
-        url = f"{TELEGRAM_API_URL}/sendMessage"
-        payload = {
-            'chat_id': TELEGRAM_CHAT_ID,
-            'text': message,
-            'parse_mode': 'Markdown',
-        }
-        response = requests.post(url, data=payload, timeout=10)
-        if response.status_code == 200:
-            logger.info("Telegram message sent successfully.")
-            return True
+# Unhandled messages kept for poll_telegram_reply; older ones are dropped when nobody is waiting
+MAX_PENDING_REPLIES = 20
+
+# handler(text, update) -> True when it consumed the message
+UpdateHandler = Callable[[str, Dict], bool]
+
+
+class TelegramClient:
+    """
+    Telegram bot client running on daemon threads: a sender that drains an outbound queue,
+    merging queued messages, spacing requests and retrying on 429 after `retry_after`, and a
+    dispatcher that hands incoming chat messages to handlers. Updates reach the dispatcher's
+    queue either from a long-polling receiver thread or, in webhook mode, from push_update
+    called by the Flask webhook route.
+    """
+
+    def __init__(self, api_url: str = None, chat_id: str = None):
+        self.api_url = api_url
+        self.chat_id = chat_id
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=2))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=2))
+        self.last_update_id: Optional[int] = None
+        self._outbox: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._carry_over: Optional[Tuple[str, Future]] = None  # didn't fit the last batch, goes first in the next
+        self._incoming: "queue.Queue[Dict]" = queue.Queue()
+        self._replies: "queue.Queue[Tuple[str, int, str]]" = queue.Queue(maxsize=MAX_PENDING_REPLIES)
+        self._handlers: List[UpdateHandler] = []
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+        self._last_send = 0.0
+        self.webhook_mode = False
+        self._stats = {'sent': 0, 'merged': 0, 'send_failures': 0, 'rate_limited': 0, 'updates': 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_url and self.chat_id)
+
+    def start(self) -> None:
+        """
+        Start the sender and dispatcher, then either register the webhook (TELEGRAM_WEBHOOK_URL)
+        or start the long-polling receiver
+        """
+        with self._lock:
+            if self._threads or not self.configured:
+                return
+            targets = [("telegram-sender", self._send_loop), ("telegram-dispatcher", self._dispatch_loop)]
+            if config.TELEGRAM_WEBHOOK_URL and not config.TELEGRAM_WEBHOOK_SECRET:
+                logger.error("TELEGRAM_WEBHOOK_SECRET is required for webhook mode, falling back to polling")
+            self.webhook_mode = bool(config.TELEGRAM_WEBHOOK_URL and config.TELEGRAM_WEBHOOK_SECRET
+                                     and self.set_webhook(config.TELEGRAM_WEBHOOK_URL, config.TELEGRAM_WEBHOOK_SECRET))
+            if not self.webhook_mode:
+                targets.append(("telegram-poller", self._poll_loop))
+            for name, target in targets:
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def set_webhook(self, url: str, secret: str) -> bool:
+        """Ask Telegram to push updates to `url`, signed with `secret` in X-Telegram-Bot-Api-Secret-Token"""
+        try:
+            response = self.session.post(f"{self.api_url}/setWebhook", data={
+                'url': url, 'secret_token': secret, 'allowed_updates': '["message"]',
+            }, timeout=10)
+        except requests.RequestException as e:
+            logger.error(f"Exception setting Telegram webhook: {e}")
+            return False
+        if response.status_code != 200:
+            logger.error(f"Failed to set Telegram webhook: {response.text}")
+            return False
+        logger.info("💬 Receiving Telegram updates through the webhook")
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def add_handler(self, handler: UpdateHandler) -> None:
+        """Register a handler for incoming chat messages; handlers run on the receiver thread"""
+        self._handlers.append(handler)
+
+    def send(self, text: str) -> Future:
+        """Queue a message; the future resolves to True once Telegram accepted it"""
+        future: Future = Future()
+        self._outbox.put((text, future))
+        return future
+
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        """Block for one message, then take whatever else is queued that fits in one Telegram message"""
+        if self._carry_over is not None:
+            batch = [self._carry_over]
+            self._carry_over = None
         else:
+            batch = [self._outbox.get()]
+        length = len(batch[0][0])
+        while True:
+            try:
+                text, future = self._outbox.get_nowait()
+            except queue.Empty:
+                return batch
+            if length + len(text) + 2 > MAX_MESSAGE_LENGTH:
+                # Keep it for the next batch rather than re-queueing it behind later messages
+                self._carry_over = (text, future)
+                return batch
+            batch.append((text, future))
+            length += len(text) + 2
+
+    def _send_loop(self) -> None:
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if len(batch) > 1:
+                self._stats['merged'] += len(batch) - 1
+            status = self._send_now('\n\n'.join(text for text, _ in batch))
+            if status == 400 and len(batch) > 1:
+                # One message's Markdown can break the merged text; don't let it sink the others
+                logger.warning(f"Merged Telegram message rejected, sending its {len(batch)} parts one by one")
+                for text, future in batch:
+                    future.set_result(self._send_now(text) == 200)
+                continue
+            for _, future in batch:
+                future.set_result(status == 200)
+
+    def _send_now(self, text: str) -> Optional[int]:
+        """
+        POST sendMessage, keeping TELEGRAM_MIN_SEND_INTERVAL between requests and honouring 429
+        retry_after; returns the final HTTP status (None when Telegram could not be reached)
+        """
+        status = None
+        payload = {'chat_id': self.chat_id, 'text': text, 'parse_mode': 'Markdown'}
+        for attempt in range(config.TELEGRAM_MAX_SEND_RETRIES + 1):
+            wait = self._last_send + config.TELEGRAM_MIN_SEND_INTERVAL - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_send = time.monotonic()
+            try:
+                with http_request_seconds.time(api='telegram', endpoint='sendMessage'):
+                    response = self.session.post(f"{self.api_url}/sendMessage", data=payload, timeout=10)
+            except requests.RequestException as e:
+                http_responses_total.inc(api='telegram', endpoint='sendMessage', status='error')
+                logger.error(f"Exception sending Telegram message: {e}")
+                status = None
+                time.sleep(min(30, 2 ** attempt))
+                continue
+            status = response.status_code
+            http_responses_total.inc(api='telegram', endpoint='sendMessage', status=status)
+
+            if status == 200:
+                self._stats['sent'] += 1
+                logger.info("Telegram message sent successfully.")
+                return status
+            if status == 429:
+                self._stats['rate_limited'] += 1
+                try:
+                    retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                except ValueError:
+                    retry_after = 1
+                logger.warning(f"Telegram rate limit hit, retrying in {retry_after}s")
+                time.sleep(float(retry_after))
+                continue
             logger.error(f"Failed to send Telegram message: {response.text}")
-            return False
-    except Exception as e:
-        logger.error(f"Exception sending Telegram message: {e}")
+            break
+
+        self._stats['send_failures'] += 1
+        return status
+
+    def _poll_loop(self) -> None:
+        """Long-poll getUpdates; the request itself waits for new messages, so there is no sleep between polls"""
+        # getUpdates is refused while a webhook is registered, e.g. from an earlier webhook-mode run
+        try:
+            self.session.post(f"{self.api_url}/deleteWebhook", timeout=10)
+        except requests.RequestException as e:
+            logger.warning(f"Could not delete Telegram webhook: {e}")
+        while not self._stopped.is_set():
+            params = {'timeout': config.TELEGRAM_LONG_POLL_SECONDS, 'allowed_updates': '["message"]'}
+            if self.last_update_id is not None:
+                params['offset'] = self.last_update_id + 1
+            try:
+                # Includes the long-poll wait, so an idle chat shows up as ~TELEGRAM_LONG_POLL_SECONDS
+                with http_request_seconds.time(api='telegram', endpoint='getUpdates'):
+                    response = self.session.get(f"{self.api_url}/getUpdates", params=params,
+                                                timeout=config.TELEGRAM_LONG_POLL_SECONDS + 10)
+                http_responses_total.inc(api='telegram', endpoint='getUpdates', status=response.status_code)
+                if response.status_code != 200:
+                    logger.error(f"Telegram getUpdates failed: {response.status_code} {response.text}")
+                    time.sleep(5)
+                    continue
+                for update in response.json().get('result', []):
+                    self.push_update(update)
+            except (requests.RequestException, ValueError) as e:
+                if isinstance(e, requests.RequestException):
+                    http_responses_total.inc(api='telegram', endpoint='getUpdates', status='error')
+                logger.error(f"Exception polling Telegram: {e}")
+                time.sleep(5)
+
+    def push_update(self, update: Dict) -> None:
+        """Queue one Telegram update for the dispatcher; safe to call from any thread"""
+        self._incoming.put(update)
+
+    def _dispatch_loop(self) -> None:
+        while not self._stopped.is_set():
+            update = self._incoming.get()
+            try:
+                self._dispatch(update)
+            except (KeyError, TypeError, AttributeError) as e:
+                logger.error(f"Malformed Telegram update {update!r}: {e}")
+
+    def _dispatch(self, update: Dict) -> None:
+        """Hand one update's chat message to the handlers, dropping duplicates and other chats"""
+        update_id = update['update_id']
+        if self.last_update_id is not None and update_id <= self.last_update_id:
+            return
+        self.last_update_id = update_id
+        self._stats['updates'] += 1
+
+        message = update.get('message', {})
+        chat_id = str(message.get('chat', {}).get('id'))
+        user_id = str(message.get('from', {}).get('id'))
+        text = message.get('text')
+        if chat_id != self.chat_id or not text:
+            return
+
+        logger.info(f"Received Telegram reply: {text}")
+        for handler in self._handlers:
+            try:
+                if handler(text, update):
+                    return
+            except Exception as e:
+                logger.error(f"Telegram handler {getattr(handler, '__name__', handler)} failed: {e}")
+        # Nobody consumed it, keep it for poll_telegram_reply
+        while True:
+            try:
+                self._replies.put_nowait((text, update_id, user_id))
+                return
+            except queue.Full:
+                try:
+                    dropped = self._replies.get_nowait()
+                    logger.debug("Dropping unclaimed Telegram message %s", dropped[1])
+                except queue.Empty:
+                    pass
+
+    def wait_for_reply(self, timeout: float, after_update_id: int = None,
+                       allowed_user_id: str = None) -> Tuple[Optional[str], Optional[int]]:
+        """Block until an unhandled message arrives; returns (text, update_id) or (None, last_update_id)"""
+        end_time = time.monotonic() + timeout
+        while True:
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                return None, self.last_update_id
+            try:
+                text, update_id, user_id = self._replies.get(timeout=remaining)
+            except queue.Empty:
+                return None, self.last_update_id
+            if after_update_id is not None and update_id <= after_update_id:
+                continue
+            if allowed_user_id is None or user_id == allowed_user_id:
+                return text, update_id
+
+    def get_telegram_stats(self) -> Dict[str, int]:
+        queued = self._outbox.qsize() + (self._carry_over is not None)
+        return {**self._stats, 'queued': queued, 'webhook_mode': self.webhook_mode}
+
+# Global Telegram client instance
+telegram_client = TelegramClient(TELEGRAM_API_URL, TELEGRAM_CHAT_ID)
+
+
+def send_telegram_message(message: str, wait: bool = False) -> bool:
+    """
+    Queue a message for the configured Telegram chat. With `wait` block until it was
+    delivered and return whether it was; otherwise return True once queued.
+    """
+    if not telegram_client.configured:
+        logger.error("Telegram bot token or chat ID not set.")
         return False
+    telegram_client.start()
+    future = telegram_client.send(message)
+    return future.result() if wait else True
 
 def poll_telegram_reply(last_update_id=None, timeout=60, allowed_user_id=None) -> str:
-    """Poll for a reply from the owner. Returns the text of the first new message from the allowed user."""
-    if not TELEGRAM_API_URL or not TELEGRAM_CHAT_ID:
+    """Wait for a reply from the owner. Returns the text of the first new message from the allowed user."""
+    if not telegram_client.configured:
         logger.error("Telegram bot token or chat ID not set.")
-        return None
-    end_time = time.time() + timeout
-    while time.time() < end_time:
-        try:
-            url = f"{TELEGRAM_API_URL}/getUpdates"
-            params = {'timeout': 10, 'offset': last_update_id + 1 if last_update_id else None}
-            response = requests.get(url, params=params, timeout=15)
-            if response.status_code == 200:
-                data = response.json()
-                for update in data.get('result', []):
-                    update_id = update['update_id']
-                    message = update.get('message', {})
-                    chat_id = str(message.get('chat', {}).get('id'))
-                    user_id = str(message.get('from', {}).get('id'))
-                    text = message.get('text')
-                    if chat_id == TELEGRAM_CHAT_ID and text \
-                        and (allowed_user_id is None or user_id == allowed_user_id):
-                            logger.info(f"Received Telegram reply: {text}")
-                            return text, update_id
-                if data.get('result'):
-                    last_update_id = data['result'][-1]['update_id']
-            time.sleep(2)
-        except Exception as e:
-            logger.error(f"Exception polling Telegram: {e}")
-            time.sleep(5)
-    logger.warning("No Telegram reply received in time window.")
-    return None, last_update_id 
\ No newline at end of file
+        return None, last_update_id
+    telegram_client.start()
+    reply, update_id = telegram_client.wait_for_reply(timeout, last_update_id, allowed_user_id)
+    if reply is None:
+        logger.warning("No Telegram reply received in time window.")
+        return None, update_id if update_id is not None else last_update_id
+    return reply, update_id
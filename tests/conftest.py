@@ -0,0 +1,95 @@
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The bot's modules create cache/, screenshots/, sessions/ ... in the working directory on import
+WORK_DIR = tempfile.mkdtemp(prefix="ipo-bot-tests-")
+os.chdir(WORK_DIR)
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ['ENABLE_SESSION_REUSE'] = 'false'
+
+# handler(request) -> (status, json body, extra headers)
+Route = Callable[[Dict], Tuple[int, object, Dict[str, str]]]
+
+
+class StubServer:
+    """Local stand-in for a JSON HTTP API: routes by (method, path) and records every request"""
+
+    def __init__(self, routes: Dict[Tuple[str, str], Route]):
+        self.routes = routes
+        self.requests: List[Dict] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                url = urlsplit(self.path)
+                raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                content_type = self.headers.get('Content-Type', '')
+                if 'json' in content_type and raw:
+                    body = json.loads(raw)
+                elif 'form' in content_type:
+                    body = {key: values[0] for key, values in parse_qs(raw.decode()).items()}
+                else:
+                    body = raw
+                request = {
+                    'method': self.command,
+                    'path': url.path,
+                    'query': {key: values[0] for key, values in parse_qs(url.query).items()},
+                    'headers': dict(self.headers),
+                    'body': body,
+                }
+                stub.requests.append(request)
+
+                route = stub.routes.get((self.command, url.path))
+                status, payload, headers = route(request) if route else (404, {'error': 'not found'}, {})
+                data = b'' if status == 304 else json.dumps(payload).encode()
+                self.send_response(status)
+                if data:
+                    self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def calls(self, method: str, path: str) -> List[Dict]:
+        return [r for r in self.requests if r['method'] == method and r['path'] == path]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """Factory: stub_server(routes) starts a StubServer that is shut down after the test"""
+    servers = []
+
+    def start(routes: Dict[Tuple[str, str], Route]) -> StubServer:
+        server = StubServer(routes)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
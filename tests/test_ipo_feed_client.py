@@ -0,0 +1,97 @@
+import hashlib
+import json
+
+import pytest
+
+from ipo_feed_client import IpoFeedClient, IpoFeedError
+
+PAGE_SIZE = 2
+
+
+def _record(ipo_id, name, share_type='ordinary', status='Open'):
+    return {
+        'ipoId': ipo_id, 'companyName': name, 'stockSymbol': name.upper(), 'sectorName': 'Hydro',
+        'shareType': share_type, 'pricePerUnit': 100, 'units': 1000,
+        'openingDateAD': '2026-10-15', 'closingDateAD': '2026-10-19', 'status': status,
+    }
+
+
+class Feed:
+    """Paginated feed that answers 304 for a page whose ETag the client already has"""
+
+    def __init__(self, records):
+        self.records = records
+        self.fail_pages = set()
+
+    def __call__(self, request):
+        page_no = int(request['query']['pageNo'])
+        if page_no in self.fail_pages:
+            self.fail_pages.discard(page_no)
+            return 404, {'error': 'gone'}, {}
+        start = (page_no - 1) * PAGE_SIZE
+        page = self.records[start:start + PAGE_SIZE]
+        etag = '"%s"' % hashlib.sha1(json.dumps(page).encode()).hexdigest()
+        if request['headers'].get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        return 200, {'result': {'data': page}}, {'ETag': etag}
+
+
+@pytest.fixture
+def feed(stub_server):
+    feed = Feed([_record(1, 'C1'), _record(2, 'C2'), _record(3, 'C3')])
+    server = stub_server({('GET', '/api/GetIpos'): feed})
+    client = IpoFeedClient(url=server.url + '/api/GetIpos', page_size=PAGE_SIZE, max_retries=0)
+    return feed, server, client
+
+
+def _names(ipos):
+    return sorted(ipo['company_name'] for ipo in ipos)
+
+
+def test_fetches_every_page(feed):
+    _, server, client = feed
+    ipos = client.fetch_ipos()
+    assert _names(ipos) == ['C1', 'C2', 'C3']
+    assert client.last_fetch_changed
+    assert [call['query']['pageNo'] for call in server.requests] == ['1', '2']
+    assert set(ipos[0]) == {'id', 'company_name', 'stock_symbol', 'sector_name', 'share_type',
+                            'price_per_unit', 'units', 'start_date', 'end_date', 'status'}
+
+
+def test_unchanged_feed_reuses_previous_result(feed):
+    _, server, client = feed
+    first = client.fetch_ipos()
+    second = client.fetch_ipos()
+    assert second is first
+    assert not client.last_fetch_changed
+    assert all(call['headers'].get('If-None-Match') for call in server.requests[2:])
+
+
+def test_changed_page_is_refetched(feed):
+    feed_, _, client = feed
+    client.fetch_ipos()
+    feed_.records[2] = _record(3, 'C3 Renamed')
+    assert _names(client.fetch_ipos()) == ['C1', 'C2', 'C3 Renamed']
+    assert client.last_fetch_changed
+
+
+def test_failed_fetch_does_not_hide_a_change(feed):
+    feed_, _, client = feed
+    client.fetch_ipos()
+
+    feed_.records[0] = _record(1, 'C1 Renamed')
+    feed_.fail_pages.add(2)
+    with pytest.raises(IpoFeedError):
+        client.fetch_ipos()
+
+    # Page 1's new ETag from the failed fetch must not turn the retry into a 304
+    assert _names(client.fetch_ipos()) == ['C1 Renamed', 'C2', 'C3']
+    assert client.last_fetch_changed
+
+
+def test_shrinking_feed_is_a_change(feed):
+    feed_, _, client = feed
+    client.fetch_ipos()
+    del feed_.records[2]
+    assert _names(client.fetch_ipos()) == ['C1', 'C2']
+    assert client.last_fetch_changed
@@ -0,0 +1,33 @@
+from ipo_feed_diff import IpoEventType, IpoFeedTracker
+
+
+def _ipo(ipo_id, **fields):
+    return {'id': ipo_id, 'company_name': f"Company {ipo_id}", 'status': 'Open',
+            'start_date': '2026-10-15', 'end_date': '2026-10-19', 'units': '1,000,000', **fields}
+
+
+def test_snapshot_subscribers_see_every_content_change():
+    tracker = IpoFeedTracker()
+    events, snapshots = [], []
+    tracker.subscribe(events.append)
+    tracker.subscribe_snapshot(snapshots.append)
+
+    feed = [_ipo(1), _ipo(2)]
+    tracker.update(feed)
+    assert [event.type for event in events[-1]] == [IpoEventType.ADDED] * 2
+    assert snapshots == [feed]
+
+    # Unchanged feed: nothing to rebuild
+    tracker.update([_ipo(1), _ipo(2)])
+    assert len(events) == 1 and len(snapshots) == 1
+
+    # Fields outside status/dates produce no events but still change what the dashboard shows
+    changed = [_ipo(1, units='1,200,000'), _ipo(2)]
+    assert tracker.update(changed) == []
+    assert len(events) == 1
+    assert snapshots[-1] == changed
+
+    reordered = [_ipo(2), _ipo(1, units='1,200,000')]
+    tracker.update(reordered)
+    assert snapshots[-1] == reordered
+    assert tracker.snapshot == reordered
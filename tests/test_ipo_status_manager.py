@@ -0,0 +1,117 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import ipo_status_manager
+from ipo_feed_diff import IpoEvent, IpoEventType
+from status_store import StatusStore
+
+
+class ArchiveStub:
+    def __init__(self):
+        self.records = []
+
+    def append(self, records):
+        self.records.extend(records)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = StatusStore(str(tmp_path / 'status.sqlite3'), str(tmp_path / 'status.journal'))
+    monkeypatch.setattr(ipo_status_manager, 'status_store', store)
+    return store
+
+
+@pytest.fixture
+def archive(monkeypatch):
+    archive = ArchiveStub()
+    monkeypatch.setattr(ipo_status_manager, 'ipo_archive', archive)
+    return archive
+
+
+def _added(ipo_id, end_date, name=None):
+    ipo = {'id': ipo_id, 'company_name': f" {name or 'Company ' + ipo_id} ", 'end_date': end_date}
+    return IpoEvent(IpoEventType.ADDED, ipo_id, ipo)
+
+
+def test_closed_ipos_are_remembered_only_when_tracked(store):
+    store.mark_filled('1', ['alice'])
+    ipo_status_manager._remember_ipo_metadata([
+        _added('1', '2020-01-05'),   # closed, has status entries (e.g. migrated from JSON)
+        _added('2', '2020-01-05'),   # closed, never tracked
+        _added('3', '2999-01-05'),   # still open
+    ])
+    assert store.ipo_metadata() == {
+        '1': {'company_name': 'Company 1', 'end_date': '2020-01-05'},
+        '3': {'company_name': 'Company 3', 'end_date': '2999-01-05'},
+    }
+
+
+def test_closed_tracked_ipo_gets_archived(store, archive):
+    store.mark_filled('1', ['alice', 'bob'])
+    ipo_status_manager._remember_ipo_metadata([_added('1', '2020-01-05')])
+
+    assert ipo_status_manager.archive_closed_ipos(['alice', 'bob']) == 1
+    assert archive.records == [{'ipo_id': '1', 'company_name': 'Company 1', 'end_date': '2020-01-05',
+                                'users': {'alice': True, 'bob': True}}]
+    assert store.tracked_ipo_ids() == set()
+    assert store.ipo_metadata() == {}
+
+
+# The JSON-file implementation the status store replaced, for comparing results
+def _legacy_unfilled(status, ignore, ipo_list, user_aliases):
+    now = datetime.now(timezone.utc)
+    unfilled = []
+    for ipo in ipo_list:
+        ipo_id = str(ipo['id'])
+        if ipo_id in ignore and now < datetime.fromisoformat(ignore[ipo_id]['until']):
+            continue
+        if unfilled_users := [alias for alias in user_aliases if not status.get(ipo_id, {}).get(alias, False)]:
+            unfilled.append({**ipo, 'unfilled_users': unfilled_users})
+    return unfilled
+
+
+def _legacy_needs_sync(status, ignore, eligible_ipos):
+    return not any(str(ipo['id']) in status or str(ipo['id']) in ignore for ipo in eligible_ipos)
+
+
+LEGACY_STATUS = {'1': {'alice': True, 'bob': True}, '2': {'alice': True, 'bob': False}, '3': {'alice': True}}
+HOUR = timedelta(hours=1)
+LEGACY_IGNORE_UNTIL = {'4': HOUR, '5': -HOUR, '2': HOUR}
+FEED = [{'id': ipo_id, 'company_name': f"Company {ipo_id}"} for ipo_id in (1, 2, 3, 4, 5, 6)]
+USERS = ['alice', 'bob', 'carol']
+
+
+@pytest.fixture
+def migrated(store, tmp_path):
+    now = datetime.now(timezone.utc)
+    ignore = {ipo_id: {'until': (now + offset).isoformat()} for ipo_id, offset in LEGACY_IGNORE_UNTIL.items()}
+    (tmp_path / 'ipo_status.json').write_text(json.dumps(LEGACY_STATUS), encoding='utf-8')
+    (tmp_path / 'ipo_ignore.json').write_text(json.dumps(ignore), encoding='utf-8')
+    store.migrate_json(str(tmp_path / 'ipo_status.json'), str(tmp_path / 'ipo_ignore.json'))
+    return LEGACY_STATUS, ignore
+
+
+@pytest.mark.parametrize('users', [USERS, ['alice'], ['bob'], []])
+@pytest.mark.parametrize('ignore_expired', [True, False])
+def test_unfilled_ipos_match_legacy(migrated, users, ignore_expired):
+    status, ignore = migrated
+    expected = _legacy_unfilled(status, ignore, FEED, users)
+    assert ipo_status_manager.get_unfilled_ipos_for_users(FEED, users, ignore_expired) == expected
+    # Repeat calls (after expired ignores were cleaned up) give the same answer
+    assert ipo_status_manager.get_unfilled_ipos_for_users(FEED, users, ignore_expired) == expected
+
+
+def test_unfilled_ipos_for_default_users(migrated):
+    unfilled = ipo_status_manager.get_unfilled_ipos_for_users(FEED, USERS)
+    assert {ipo['id']: ipo['unfilled_users'] for ipo in unfilled} == {
+        1: ['carol'], 3: ['bob', 'carol'], 5: USERS, 6: USERS,
+    }
+
+
+@pytest.mark.parametrize('ipo_ids', [[1], [4], [5], [6], [6, 2], [], [7, 8]])
+def test_needs_status_sync_matches_legacy(migrated, ipo_ids):
+    status, ignore = migrated
+    eligible = [{'id': ipo_id} for ipo_id in ipo_ids]
+    assert ipo_status_manager.needs_status_sync(eligible) == _legacy_needs_sync(status, ignore, eligible)
@@ -0,0 +1,122 @@
+import pytest
+
+from cache_manager import cache_manager
+from config import config
+from driver import EnhancedIpoBot
+from meroshare_api import MeroshareClient, MeroshareApiError
+
+TOKEN = "Bearer test-token"
+USER = {'alias': 'alice', 'dp_id': '13200', 'username': '00123', 'password': 'secret'}
+
+APPLICABLE_ISSUES = [
+    {"companyName": "Already Applied Ltd.", "subGroup": "For General Public", "scrip": "AAL",
+     "shareTypeName": "IPO", "shareGroupName": "Ordinary Shares", "statusName": "CREATE_APPROVE",
+     "action": "edit"},
+    {"companyName": " Fresh Hydropower Ltd. ", "subGroup": "For General Public", "scrip": "FHL",
+     "shareTypeName": "IPO", "shareGroupName": "Ordinary Shares", "statusName": "CREATE_APPROVE"},
+]
+
+
+def _authorized(request):
+    return request['headers'].get('Authorization') == TOKEN
+
+
+def _auth(request):
+    body = request['body']
+    if body == {'clientId': 128, 'username': USER['username'], 'password': USER['password']}:
+        return 200, {'statusCode': 200}, {'Authorization': TOKEN}
+    return 401, {'message': 'Invalid credentials'}, {}
+
+
+@pytest.fixture
+def meroshare(stub_server, monkeypatch):
+    server = stub_server({
+        ('GET', '/api/capital/'): lambda r: (200, [{'id': 7, 'code': '11000', 'name': 'Other Capital'},
+                                                   {'id': 128, 'code': '13200', 'name': 'Test Capital'}], {}),
+        ('POST', '/api/auth/'): _auth,
+        ('GET', '/api/ownDetail/'): lambda r: (200, {'name': 'Alice'}, {}) if _authorized(r) else (401, {}, {}),
+        ('POST', '/api/companyShare/applicableIssue/'):
+            lambda r: (200, {'object': APPLICABLE_ISSUES}, {}) if _authorized(r) else (401, {}, {}),
+    })
+    monkeypatch.setattr(config, 'MEROSHARE_API_URL', server.url + '/api/')
+    cache_manager.clear_all()
+    yield server
+    cache_manager.clear_all()
+
+
+def test_login_resolves_dp_and_keeps_token(meroshare):
+    client = MeroshareClient()
+    assert client.login(USER)
+    assert client.token == TOKEN
+    assert meroshare.calls('POST', '/api/auth/')[0]['body']['clientId'] == 128
+
+    client.fetch_applicable_issues()
+    assert meroshare.calls('POST', '/api/companyShare/applicableIssue/')[0]['headers']['Authorization'] == TOKEN
+
+
+def test_login_rejected(meroshare):
+    client = MeroshareClient()
+    with pytest.raises(MeroshareApiError):
+        client.login({**USER, 'password': 'wrong'})
+    assert client.token is None
+
+
+def test_unknown_dp(meroshare):
+    with pytest.raises(MeroshareApiError):
+        MeroshareClient().login({**USER, 'dp_id': '99999'})
+
+
+def test_probe(meroshare):
+    client = MeroshareClient()
+    assert not client.probe()
+    assert not meroshare.calls('GET', '/api/ownDetail/')
+
+    client.token = "Bearer expired"
+    assert not client.probe()
+
+    client.login(USER)
+    assert client.probe()
+
+
+def test_fetch_requires_login(meroshare):
+    with pytest.raises(MeroshareApiError):
+        MeroshareClient().get_open_issues()
+
+
+def test_parse_open_issues_shape(meroshare, monkeypatch):
+    monkeypatch.setattr(config, 'SYNC_BACKEND', 'api')
+    bot = EnhancedIpoBot(dry_run=True, read_only=True)
+    assert bot.backend == "api"
+    try:
+        assert bot.start_session()
+        assert bot.login(USER)
+        assert bot.navigate("asba")
+        assert bot.parse_open_issues()
+    finally:
+        bot.quit()
+
+    assert bot.open_issues == [
+        {
+            "index": 1,
+            "Issue Name": "Already Applied Ltd.",
+            "Issued For": "For General Public",
+            "Ticker": "AAL",
+            "Type of Issue": "IPO",
+            "Type of Share": "Ordinary Shares",
+            "Mode": "CREATE_APPROVE",
+            "Action": "Edit",
+            "Can Apply": False,
+        },
+        {
+            "index": 2,
+            "Issue Name": "Fresh Hydropower Ltd.",
+            "Issued For": "For General Public",
+            "Ticker": "FHL",
+            "Type of Issue": "IPO",
+            "Type of Share": "Ordinary Shares",
+            "Mode": "CREATE_APPROVE",
+            "Action": "Apply",
+            "Can Apply": True,
+        },
+    ]
+    assert bot.get_issue_indexes_for("Ordinary Shares") == [1, 2]
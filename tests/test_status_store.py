@@ -0,0 +1,108 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from config import config
+from status_store import StatusStore
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'status.sqlite3'), str(tmp_path / 'status.journal')
+
+
+def _crash(store):
+    """Simulate the process dying: nothing is flushed or compacted on the way out"""
+    store._conn.close()
+
+
+def test_torn_journal_tail_does_not_swallow_later_ops(paths):
+    db_path, journal_path = paths
+    store = StatusStore(db_path, journal_path)
+    store.mark_filled('1', ['a'])
+    store.compact()
+    # Process died while appending the next batch, before its newline
+    with open(journal_path, 'w', encoding='utf-8') as f:
+        f.write('["fill","9",["z"]')
+    _crash(store)
+
+    store = StatusStore(db_path, journal_path)
+    assert not store.is_filled('9', 'z')
+    store.mark_filled('2', ['b'])
+    store.flush()
+    _crash(store)
+
+    store = StatusStore(db_path, journal_path)
+    assert store.is_filled('1', 'a')
+    assert store.is_filled('2', 'b')
+    store.close()
+
+
+def test_journal_replay_and_compaction(paths, monkeypatch):
+    db_path, journal_path = paths
+    monkeypatch.setattr(config, 'STATUS_FLUSH_BATCH', 1)
+    monkeypatch.setattr(config, 'STATUS_COMPACT_OPS', 1000)
+    store = StatusStore(db_path, journal_path)
+    store.mark_filled('1', ['a', 'b'])
+    store.ignore('2', time.time() + 3600)
+    store.remember_ipo('1', 'Company 1', '2026-10-19')
+    store.drop_ipos(['3'])
+    with open(journal_path, encoding='utf-8') as f:
+        assert [json.loads(line)[0] for line in f] == ['fill', 'ignore', 'meta', 'drop']
+    _crash(store)
+
+    store = StatusStore(db_path, journal_path)
+    # Replayed and folded into the snapshot on load
+    assert not os.path.exists(journal_path)
+    assert store.filled_users(['1']) == {'1': {'a', 'b'}}
+    assert store.ignored_ids() == {'2'}
+    assert store.ipo_metadata() == {'1': {'company_name': 'Company 1', 'end_date': '2026-10-19'}}
+    assert sorted(store._conn.execute("SELECT ipo_id, user_alias, filled FROM ipo_status")) == [
+        ('1', 'a', 1), ('1', 'b', 1)]
+    store.close()
+
+
+def test_compacts_once_the_journal_is_long(paths, monkeypatch):
+    db_path, journal_path = paths
+    monkeypatch.setattr(config, 'STATUS_FLUSH_BATCH', 2)
+    monkeypatch.setattr(config, 'STATUS_COMPACT_OPS', 4)
+    store = StatusStore(db_path, journal_path)
+    store.mark_filled('1', ['a'])
+    assert store.get_store_stats()['pending'] == 1
+    store.mark_filled('2', ['a'])
+    assert store.get_store_stats()['journal_ops'] == 2
+    store.mark_filled('3', ['a'])
+    store.mark_filled('4', ['a'])
+
+    stats = store.get_store_stats()
+    assert (stats['flushes'], stats['compactions'], stats['journal_ops']) == (2, 1, 0)
+    assert not os.path.exists(journal_path)
+    assert store._conn.execute("SELECT COUNT(*) FROM ipo_status").fetchone() == (4,)
+    store.close()
+
+
+def test_migrates_legacy_json_once(paths, tmp_path):
+    db_path, journal_path = paths
+    status_file, ignore_file = tmp_path / 'ipo_status.json', tmp_path / 'ipo_ignore.json'
+    status_file.write_text(json.dumps({'1': {'a': True, 'b': False}, '2': {'a': True}}), encoding='utf-8')
+    until = datetime.now(timezone.utc) + timedelta(hours=5)
+    ignore_file.write_text(json.dumps({'3': {'until': until.isoformat()}}), encoding='utf-8')
+
+    store = StatusStore(db_path, journal_path)
+    store.migrate_json(str(status_file), str(ignore_file))
+    assert not status_file.exists() and not ignore_file.exists()
+    assert (tmp_path / 'ipo_status.json.migrated').exists()
+    assert (tmp_path / 'ipo_ignore.json.migrated').exists()
+    store.close()
+
+    store = StatusStore(db_path, journal_path)
+    store.migrate_json(str(status_file), str(ignore_file))  # nothing left to import
+    assert store.users_for('1') == {'a': True, 'b': False}
+    assert store.filled_users(['1', '2']) == {'1': {'a'}, '2': {'a'}}
+    assert store._ignore['3'] == pytest.approx(until.timestamp())
+    assert store.ignored_ids() == {'3'}
+    assert store.get_store_stats()['mutations'] == 0
+    store.close()
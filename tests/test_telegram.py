@@ -0,0 +1,201 @@
+import threading
+import time
+
+import pytest
+
+import keep_alive
+from config import config
+from telegram_utils import MAX_PENDING_REPLIES, TelegramClient
+
+TOKEN = "123:test"
+CHAT_ID = "42"
+OWNER_ID = "7"
+SECRET = "webhook-secret"
+
+
+def _update(update_id, text, chat_id=CHAT_ID):
+    return {
+        'update_id': update_id,
+        'message': {'message_id': update_id, 'chat': {'id': int(chat_id)}, 'from': {'id': int(OWNER_ID)}, 'text': text},
+    }
+
+
+def _ok(result=True):
+    return lambda request: (200, {'ok': True, 'result': result}, {})
+
+
+@pytest.fixture(autouse=True)
+def fast_telegram(monkeypatch):
+    monkeypatch.setattr(config, 'TELEGRAM_MIN_SEND_INTERVAL', 0)
+    monkeypatch.setattr(config, 'TELEGRAM_WEBHOOK_URL', None)
+    monkeypatch.setattr(config, 'TELEGRAM_WEBHOOK_SECRET', None)
+
+
+@pytest.fixture
+def fake_telegram(stub_server):
+    """Starts a fake Bot API; `routes` overrides or extends the default methods"""
+    clients = []
+
+    def start(routes=None):
+        server = stub_server({
+            ('POST', f'/bot{TOKEN}/sendMessage'): _ok({'message_id': 1}),
+            ('POST', f'/bot{TOKEN}/setWebhook'): _ok(),
+            ('POST', f'/bot{TOKEN}/deleteWebhook'): _ok(),
+            **(routes or {}),
+        })
+        client = TelegramClient(f"{server.url}/bot{TOKEN}", CHAT_ID)
+        clients.append(client)
+        return server, client
+
+    yield start
+    for client in clients:
+        client.stop()
+
+
+def _wait_for(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def webhook(fake_telegram, monkeypatch):
+    monkeypatch.setattr(config, 'TELEGRAM_WEBHOOK_URL', 'https://bot.example.com/telegram/webhook')
+    monkeypatch.setattr(config, 'TELEGRAM_WEBHOOK_SECRET', SECRET)
+    server, client = fake_telegram()
+    received = []
+    client.add_handler(lambda text, update: received.append(text) or True)
+    client.start()
+    monkeypatch.setattr(keep_alive, 'telegram_client', client)
+    return server, client, received, keep_alive.app.test_client()
+
+
+def test_webhook_registration(webhook):
+    server, client, _, _ = webhook
+    assert client.webhook_mode
+    (call,) = server.calls('POST', f'/bot{TOKEN}/setWebhook')
+    assert call['body']['url'] == config.TELEGRAM_WEBHOOK_URL
+    assert call['body']['secret_token'] == SECRET
+    assert not server.calls('POST', f'/bot{TOKEN}/deleteWebhook')
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Telegram-Bot-Api-Secret-Token': 'wrong'}])
+def test_webhook_rejects_bad_secret(webhook, headers):
+    _, client, received, http = webhook
+    response = http.post(config.TELEGRAM_WEBHOOK_PATH, json=_update(1, 'yes'), headers=headers)
+    assert response.status_code == 403
+    assert client._incoming.empty()
+
+
+@pytest.mark.parametrize('body', ['not json', '[1, 2]', '{"message": {}}'])
+def test_webhook_rejects_malformed_body(webhook, body):
+    _, client, _, http = webhook
+    response = http.post(config.TELEGRAM_WEBHOOK_PATH, data=body, content_type='application/json',
+                         headers={'X-Telegram-Bot-Api-Secret-Token': SECRET})
+    assert response.status_code == 400
+    assert client._incoming.empty()
+
+
+def test_webhook_update_reaches_handler(webhook):
+    _, client, received, http = webhook
+    headers = {'X-Telegram-Bot-Api-Secret-Token': SECRET}
+    assert http.post(config.TELEGRAM_WEBHOOK_PATH, json=_update(10, 'yes'), headers=headers).status_code == 200
+    # Redelivered and foreign-chat updates are dropped by the dispatcher
+    http.post(config.TELEGRAM_WEBHOOK_PATH, json=_update(10, 'yes'), headers=headers)
+    http.post(config.TELEGRAM_WEBHOOK_PATH, json=_update(11, 'hi', chat_id='99'), headers=headers)
+    http.post(config.TELEGRAM_WEBHOOK_PATH, json=_update(12, 'no'), headers=headers)
+    assert _wait_for(lambda: client.last_update_id == 12)
+    assert _wait_for(lambda: received == ['yes', 'no'])
+
+
+def test_polling_deletes_webhook_first(fake_telegram):
+    delivered = threading.Event()
+
+    def get_updates(request):
+        if delivered.is_set():
+            time.sleep(0.2)
+            return 200, {'ok': True, 'result': []}, {}
+        delivered.set()
+        return 200, {'ok': True, 'result': [_update(5, 'yes')]}, {}
+
+    server, client = fake_telegram({('GET', f'/bot{TOKEN}/getUpdates'): get_updates})
+    received = []
+    client.add_handler(lambda text, update: received.append(text) or True)
+    client.start()
+    assert not client.webhook_mode
+    assert _wait_for(lambda: received == ['yes'])
+
+    first, *_ = [r['path'].rsplit('/', 1)[1] for r in server.requests]
+    assert first == 'deleteWebhook'
+    assert not server.calls('POST', f'/bot{TOKEN}/setWebhook')
+    assert _wait_for(lambda: any(r['query'].get('offset') == '6' for r in server.calls('GET', f'/bot{TOKEN}/getUpdates')))
+
+
+def test_send_retries_after_429(fake_telegram):
+    attempts = []
+
+    def send_message(request):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            return 429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0.3}}, {}
+        return 200, {'ok': True, 'result': {'message_id': 1}}, {}
+
+    server, client = fake_telegram({('POST', f'/bot{TOKEN}/sendMessage'): send_message})
+    client.start()
+    assert client.send('IPO open').result(timeout=5)
+
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.3
+    assert [call['body']['text'] for call in server.calls('POST', f'/bot{TOKEN}/sendMessage')] == ['IPO open'] * 2
+    assert client.get_telegram_stats()['rate_limited'] == 1
+
+
+def test_send_gives_up_after_retries(fake_telegram, monkeypatch):
+    monkeypatch.setattr(config, 'TELEGRAM_MAX_SEND_RETRIES', 2)
+    server, client = fake_telegram({
+        ('POST', f'/bot{TOKEN}/sendMessage'): lambda r: (429, {'ok': False, 'parameters': {'retry_after': 0}}, {}),
+    })
+    client.start()
+    assert client.send('IPO open').result(timeout=5) is False
+    assert len(server.calls('POST', f'/bot{TOKEN}/sendMessage')) == 3
+
+
+def test_unhandled_messages_are_bounded(fake_telegram):
+    _, client = fake_telegram()
+    for update_id in range(1, MAX_PENDING_REPLIES + 6):
+        client._dispatch(_update(update_id, f"msg {update_id}"))
+
+    assert client._replies.qsize() == MAX_PENDING_REPLIES
+    assert client.wait_for_reply(timeout=1) == ("msg 6", 6)
+
+
+def test_rejected_merged_message_is_sent_part_by_part(fake_telegram):
+    def send_message(request):
+        # Stand-in for Telegram's "can't parse entities": an unclosed Markdown bold
+        if request['body']['text'].count('*') % 2:
+            return 400, {'ok': False, 'error_code': 400, 'description': "Bad Request: can't parse entities"}, {}
+        return 200, {'ok': True, 'result': {'message_id': 1}}, {}
+
+    server, client = fake_telegram({('POST', f'/bot{TOKEN}/sendMessage'): send_message})
+    # Queued before the sender starts, so they are merged into one request
+    futures = [client.send(text) for text in ('*Ace Hydro* is open', 'snake_case *broken', 'Closing today')]
+    client.start()
+
+    assert [future.result(timeout=5) for future in futures] == [True, False, True]
+    texts = [call['body']['text'] for call in server.calls('POST', f'/bot{TOKEN}/sendMessage')]
+    assert texts == ['*Ace Hydro* is open\n\nsnake_case *broken\n\nClosing today',
+                     '*Ace Hydro* is open', 'snake_case *broken', 'Closing today']
+
+
+def test_oversized_batches_keep_queue_order(fake_telegram):
+    server, client = fake_telegram()
+    texts = ['a' * 3000, 'b' * 3000, 'c' * 10, 'd' * 10]
+    futures = [client.send(text) for text in texts]
+    client.start()
+
+    assert all(future.result(timeout=5) for future in futures)
+    sent = [call['body']['text'] for call in server.calls('POST', f'/bot{TOKEN}/sendMessage')]
+    assert sent == [texts[0], '\n\n'.join(texts[1:])]
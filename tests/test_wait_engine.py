@@ -0,0 +1,55 @@
+import time
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from wait_engine import WaitEngine
+
+
+class FakeDriver:
+    pass
+
+
+def _ready_after(seconds):
+    start = time.monotonic()
+    return lambda driver: time.monotonic() - start >= seconds and "ready"
+
+
+@pytest.fixture
+def engine():
+    engine = WaitEngine()
+    engine.poll_interval = 0.01
+    engine.min_timeout = 0.1
+    engine.multiplier = 2
+    engine.min_samples = 3
+    # Learned p95 of 0.05s -> adaptive timeout 0.1s
+    for _ in range(3):
+        engine._record(FakeDriver(), "result", 0.05, timed_out=False)
+    assert engine.timeout_for("result", 5) == pytest.approx(0.1)
+    return engine
+
+
+def test_adaptive_timeout_fails_fast(engine):
+    with pytest.raises(TimeoutException):
+        engine.until(FakeDriver(), "result", _ready_after(0.3), max_timeout=5)
+    assert engine.get_wait_stats()["result"]["timeouts"] == 1
+    # The next run gets the full timeout again
+    assert engine.timeout_for("result", 5) == 5
+
+
+def test_patient_wait_outlives_adaptive_timeout(engine):
+    assert engine.until(FakeDriver(), "result", _ready_after(0.3), max_timeout=5, patient=True) == "ready"
+    stats = engine.get_wait_stats()["result"]
+    assert stats["timeouts"] == 0
+    assert stats["slow"] == 1
+    assert stats["count"] == 4
+    # The slow sample widens the learned timeout
+    assert engine.timeout_for("result", 5) > 0.5
+
+
+def test_patient_wait_still_stops_at_max_timeout(engine):
+    start = time.monotonic()
+    with pytest.raises(TimeoutException, match="after 0.4s"):
+        engine.race(FakeDriver(), "result", [("never", lambda d: False)], max_timeout=0.4, patient=True)
+    assert 0.35 <= time.monotonic() - start < 1.0
+    assert engine.get_wait_stats()["result"]["timeouts"] == 1
@@ -0,0 +1,204 @@
+import bisect
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import (
+    NoSuchElementException, StaleElementReferenceException, TimeoutException
+)
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0]
+BUCKET_LABELS = [f"le_{bound}" for bound in HISTOGRAM_BUCKETS] + ["inf"]
+SAMPLE_WINDOW = 200
+
+Condition = Callable[[WebDriver], Any]
+# subscriber(driver, step, elapsed, timed_out), called after every wait
+WaitSubscriber = Callable[[WebDriver, str, float, bool], None]
+
+
+class _StepStats:
+    """Latency samples and histogram for a single named wait step"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.timeouts = 0
+        self.slow = 0
+        self.last_timed_out = False
+
+    def record(self, elapsed: float, timed_out: bool, slow: bool = False) -> None:
+        self.samples.append(elapsed)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.last_timed_out = timed_out
+        if timed_out:
+            self.timeouts += 1
+        if slow:
+            self.slow += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class WaitEngine:
+    """Explicit, condition-based waits with per-step latency tracking and adaptive timeouts"""
+
+    def __init__(self):
+        self.poll_interval = config.WAIT_POLL_INTERVAL
+        self.min_timeout = config.WAIT_MIN_TIMEOUT
+        self.multiplier = config.WAIT_TIMEOUT_MULTIPLIER
+        self.min_samples = config.WAIT_MIN_SAMPLES
+        self._steps: Dict[str, _StepStats] = {}
+        self._subscribers: List[WaitSubscriber] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscriber: WaitSubscriber) -> None:
+        self._subscribers.append(subscriber)
+
+    def _stats_for(self, step: str) -> _StepStats:
+        stats = self._steps.get(step)
+        if stats is None:
+            with self._lock:
+                stats = self._steps.setdefault(step, _StepStats())
+        return stats
+
+    def timeout_for(self, step: str, max_timeout: float) -> float:
+        """
+        Timeout for a step: the full `max_timeout` until enough samples exist,
+        then a multiple of the observed p95, never below WAIT_MIN_TIMEOUT.
+        A step that just timed out gets the full timeout again on its next run.
+        """
+        stats = self._stats_for(step)
+        with self._lock:
+            if stats.last_timed_out or len(stats.samples) < self.min_samples:
+                return max_timeout
+            p95 = stats.percentile(0.95)
+        return min(max_timeout, max(self.min_timeout, p95 * self.multiplier))
+
+    def _record(self, driver: WebDriver, step: str, elapsed: float, timed_out: bool, slow: bool = False) -> None:
+        stats = self._stats_for(step)
+        with self._lock:
+            stats.record(elapsed, timed_out, slow)
+        for subscriber in self._subscribers:
+            try:
+                subscriber(driver, step, elapsed, timed_out)
+            except Exception as e:
+                logger.warning(f"Wait subscriber failed after step {step}: {e}")
+
+    def _wait(self, driver: WebDriver, condition: Condition, timeout: float) -> Any:
+        return WebDriverWait(
+            driver, timeout, poll_frequency=self.poll_interval,
+            ignored_exceptions=(NoSuchElementException, StaleElementReferenceException),
+        ).until(condition)
+
+    def _timed_out(self, driver: WebDriver, step: str, start: float, timeout: float) -> TimeoutException:
+        elapsed = time.monotonic() - start
+        self._record(driver, step, elapsed, timed_out=True)
+        logger.debug("Wait step %s timed out after %.2fs", step, elapsed)
+        return TimeoutException(f"Step '{step}' timed out after {timeout:.1f}s")
+
+    def until(self, driver: WebDriver, step: str, condition: Condition, max_timeout: float = 30,
+              patient: bool = False) -> Any:
+        """
+        Wait for `condition` to return a truthy value; raises TimeoutException.
+        A `patient` wait that outlives its adaptive timeout keeps going up to `max_timeout`
+        and is recorded as a slow sample, for outcomes that must not be given up on early.
+        """
+        timeout = self.timeout_for(step, max_timeout)
+        start = time.monotonic()
+        slow = False
+        try:
+            result = self._wait(driver, condition, timeout)
+        except TimeoutException:
+            if not patient or timeout >= max_timeout:
+                raise self._timed_out(driver, step, start, timeout)
+            slow = True
+            logger.info(f"⏳ Step {step} slower than its {timeout:.1f}s adaptive timeout, waiting up to {max_timeout:.0f}s")
+            try:
+                result = self._wait(driver, condition, max(0.0, max_timeout - (time.monotonic() - start)))
+            except TimeoutException:
+                raise self._timed_out(driver, step, start, max_timeout)
+        self._record(driver, step, time.monotonic() - start, timed_out=False, slow=slow)
+        return result
+
+    def race(self, driver: WebDriver, step: str, conditions: List[Tuple[str, Condition]],
+             max_timeout: float = 30, patient: bool = False) -> Tuple[str, Any]:
+        """
+        Wait for the first of several conditions, checked in order on each poll.
+        Returns (name, value) of the winner; raises TimeoutException if none match.
+        """
+        def _first_match(d: WebDriver):
+            for name, condition in conditions:
+                try:
+                    value = condition(d)
+                except (NoSuchElementException, StaleElementReferenceException):
+                    value = None
+                if value:
+                    return name, value
+            return False
+
+        return self.until(driver, step, _first_match, max_timeout, patient)
+
+    def get_wait_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-step latency histograms, percentiles and timeout counts"""
+        stats = {}
+        with self._lock:
+            steps = list(self._steps.items())
+        for step, step_stats in steps:
+            with self._lock:
+                p50 = step_stats.percentile(0.5)
+                p95 = step_stats.percentile(0.95)
+                histogram = dict(zip(BUCKET_LABELS, step_stats.buckets))
+                stats[step] = {
+                    'count': step_stats.count,
+                    'timeouts': step_stats.timeouts,
+                    'slow': step_stats.slow,
+                    'p50': round(p50, 3) if p50 is not None else None,
+                    'p95': round(p95, 3) if p95 is not None else None,
+                    'histogram': histogram,
+                }
+        return stats
+
+
+def element_present(by: str, value: str) -> Condition:
+    """Condition returning the first matching element, without any implicit wait"""
+    def _condition(driver: WebDriver):
+        elements = driver.find_elements(by, value)
+        return elements[0] if elements else False
+    return _condition
+
+
+def element_clickable(by: str, value: str) -> Condition:
+    """Condition returning the first matching element once it is displayed and enabled"""
+    def _condition(driver: WebDriver):
+        for element in driver.find_elements(by, value):
+            if element.is_displayed() and element.is_enabled():
+                return element
+        return False
+    return _condition
+
+
+def toast_text(class_name: str, expected_text: str = None) -> Condition:
+    """Condition returning the text of a toast, optionally only when it matches `expected_text`"""
+    def _condition(driver: WebDriver):
+        for element in driver.find_elements(By.CLASS_NAME, class_name):
+            text = element.text.strip()
+            if text and (expected_text is None or text == expected_text):
+                return text
+        return False
+    return _condition
+
+# Global wait engine instance
+wait_engine = WaitEngine()